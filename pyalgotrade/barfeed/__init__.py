@@ -188,6 +188,9 @@ class OptimizerBarFeed(BaseBarFeed):
             ret = self.__bars[self.__nextPos].getDateTime()
         return ret
 
+    def peekDateTimes(self):
+        return [bars.getDateTime() for bars in self.__bars[self.__nextPos:]]
+
     def getNextBars(self):
         ret = None
         if self.__nextPos < len(self.__bars):
@@ -0,0 +1,234 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import json
+import os
+import zipfile
+
+import numpy as np
+import pytz
+import six
+
+from pyalgotrade import dataseries
+from pyalgotrade.barfeed import columnarbf
+from pyalgotrade.utils import csvutils
+
+# Bump this if the cache file layout changes.
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".barcache.npz"
+
+COLUMNS = ["open", "high", "low", "close", "volume", "adj_close"]
+
+
+def get_cache_path(path):
+    """Returns the path to the cache file for a given CSV file."""
+    return path + CACHE_SUFFIX
+
+
+def build_header(path, parserKey, skipMalformedBars):
+    """Returns a dict that identifies both the CSV file contents and the parser settings."""
+    stat = os.stat(path)
+    return {
+        "version": CACHE_VERSION,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "parser": parserKey,
+        "skipMalformedBars": skipMalformedBars,
+    }
+
+
+def get_timezone_name(bars):
+    # Returns "" for naive datetimes, or None if bars can't be cached because of their timezones.
+    names = set()
+    for bar_ in bars:
+        tzinfo = bar_.getDateTime().tzinfo
+        if tzinfo is None:
+            names.add("")
+        else:
+            names.add(getattr(tzinfo, "zone", None))
+    if len(names) > 1 or None in names:
+        return None
+    return names.pop() if len(names) else ""
+
+
+def get_frequency(bars):
+    frequencies = set(bar_.getFrequency() for bar_ in bars)
+    if len(frequencies) > 1:
+        return None
+    return frequencies.pop() if len(frequencies) else 0
+
+
+def to_cached_value(value):
+    # Extra column values are stored as strings and converted back with csvutils.float_or_string when loading.
+    if isinstance(value, float):
+        return repr(value)
+    return six.text_type(value)
+
+
+def bars_to_columns(bars):
+    """Converts a sequence of :class:`pyalgotrade.bar.BasicBar` to a dict of numpy arrays, one per column, plus a dict
+    with the timezone, frequency and extra column names. Returns None if that is not possible, for example if bars
+    have different timezones."""
+
+    timezoneName = get_timezone_name(bars)
+    frequency = get_frequency(bars)
+    extraColumns = sorted(bars[0].getExtraColumns().keys()) if len(bars) else []
+    if timezoneName is None or frequency is None:
+        return None
+    if any(sorted(bar_.getExtraColumns().keys()) != extraColumns for bar_ in bars):
+        return None
+
+    meta = {"timezone": timezoneName, "frequency": frequency, "extra": extraColumns}
+    columns = {
+        "datetime": np.array(
+            [dataseries.datetime_to_nanoseconds(bar_.getDateTime()) for bar_ in bars], dtype=np.int64
+        ),
+        "open": np.array([bar_.getOpen() for bar_ in bars], dtype=np.float64),
+        "high": np.array([bar_.getHigh() for bar_ in bars], dtype=np.float64),
+        "low": np.array([bar_.getLow() for bar_ in bars], dtype=np.float64),
+        "close": np.array([bar_.getClose() for bar_ in bars], dtype=np.float64),
+        "volume": np.array([bar_.getVolume() for bar_ in bars], dtype=np.float64),
+        "adj_close": np.array([
+            np.nan if bar_.getAdjClose() is None else bar_.getAdjClose() for bar_ in bars
+        ], dtype=np.float64),
+    }
+    for i, name in enumerate(extraColumns):
+        columns["extra_%d" % i] = np.array(
+            [to_cached_value(bar_.getExtraColumns()[name]) for bar_ in bars], dtype=six.text_type
+        )
+    return columns, meta
+
+
+def save_columns(cachePath, header, columns, meta):
+    """Saves columns returned by :func:`bars_to_columns`. Returns False if the cache file couldn't be written."""
+
+    header = dict(header)
+    header.update(meta)
+    arrays = dict(columns)
+    arrays["header"] = np.array(json.dumps(header, sort_keys=True))
+
+    # Write to a temporary file first so a partially written cache file is never loaded.
+    tmpPath = "%s.%d.tmp" % (cachePath, os.getpid())
+    try:
+        with open(tmpPath, "wb") as f:
+            np.savez(f, **arrays)
+        if os.name == "nt" and os.path.exists(cachePath):
+            os.remove(cachePath)
+        os.rename(tmpPath, cachePath)
+    except (IOError, OSError):
+        # The cache is just an optimization, so failing to write it is not an error.
+        return False
+    finally:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+    return True
+
+
+def save_bars(cachePath, header, bars):
+    """Saves bars parsed from a CSV file. Returns False if the bars can't be cached."""
+
+    converted = bars_to_columns(bars)
+    if converted is None:
+        return False
+    return save_columns(cachePath, header, converted[0], converted[1])
+
+
+def to_datetimes(nanoseconds, tzinfo):
+    # Same as calling dataseries.nanoseconds_to_datetime for every value, but faster.
+    utcDateTimes = nanoseconds.view("datetime64[ns]").astype("datetime64[us]").tolist()
+    if tzinfo is None:
+        return utcDateTimes
+
+    # Timezone transitions are rare, so the UTC offset is calculated once per day unless it changes during that day.
+    nanosPerDay = 24 * 60 * 60 * 1000000000
+    days, inverse = np.unique(nanoseconds // nanosPerDay, return_inverse=True)
+    dayStarts = [dataseries.nanoseconds_to_datetime(day * nanosPerDay, tzinfo) for day in days.tolist()]
+    dayEnds = [dataseries.nanoseconds_to_datetime((day + 1) * nanosPerDay, tzinfo) for day in days.tolist()]
+
+    ret = []
+    for i, day in enumerate(inverse.reshape(-1).tolist()):
+        dayStart = dayStarts[day]
+        if dayStart.tzinfo is dayEnds[day].tzinfo:
+            ret.append((utcDateTimes[i] + dayStart.utcoffset()).replace(tzinfo=dayStart.tzinfo))
+        else:
+            ret.append(dataseries.nanoseconds_to_datetime(nanoseconds[i], tzinfo))
+    return ret
+
+
+def load_header(cachePath):
+    """Returns the header stored in a cache file."""
+    with np.load(cachePath, allow_pickle=False) as data:
+        return json.loads(six.text_type(data["header"]))
+
+
+def load_columns(cachePath, header):
+    """Loads columns from a cache file. Returns None if there is no cache file or if it doesn't match the header.
+    Check :func:`bars_to_columns`."""
+
+    if not os.path.exists(cachePath):
+        return None
+
+    try:
+        with np.load(cachePath, allow_pickle=False) as data:
+            cachedHeader = json.loads(six.text_type(data["header"]))
+            for key, value in six.iteritems(header):
+                if cachedHeader.get(key) != value:
+                    return None
+            meta = dict((key, cachedHeader[key]) for key in ["timezone", "frequency", "extra"])
+            names = ["datetime"] + COLUMNS + ["extra_%d" % i for i in range(len(meta["extra"]))]
+            columns = dict((name, data[name]) for name in names)
+    except (IOError, OSError, ValueError, KeyError, zipfile.BadZipfile):
+        return None
+    return columns, meta
+
+
+def columns_to_bars(columns, meta):
+    """Converts columns returned by :func:`bars_to_columns` back to :class:`pyalgotrade.bar.BasicBar` instances."""
+
+    tzinfo = None
+    if meta["timezone"]:
+        tzinfo = pytz.timezone(meta["timezone"])
+    frequency = meta["frequency"]
+    extraColumns = meta["extra"]
+    extraValues = [columns["extra_%d" % i].tolist() for i in range(len(extraColumns))]
+
+    ret = []
+    dateTimes = to_datetimes(columns["datetime"], tzinfo)
+    values = [columns[name].tolist() for name in COLUMNS]
+    for i, dateTime in enumerate(dateTimes):
+        open_, high, low, close, volume, adjClose = [column[i] for column in values]
+        if adjClose != adjClose:
+            adjClose = None
+        extra = None
+        if len(extraColumns):
+            extra = dict(
+                (name, csvutils.float_or_string(extraValues[j][i])) for j, name in enumerate(extraColumns)
+            )
+        ret.append(columnarbf.build_bar(dateTime, open_, high, low, close, volume, adjClose, frequency, extra))
+    return ret
+
+
+def load_bars(cachePath, header):
+    """Loads bars from a cache file. Returns None if there is no cache file or if it doesn't match the header."""
+
+    ret = load_columns(cachePath, header)
+    if ret is not None:
+        ret = columns_to_bars(ret[0], ret[1])
+    return ret
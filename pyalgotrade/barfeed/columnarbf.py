@@ -0,0 +1,544 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import numpy as np
+
+from pyalgotrade import bar
+from pyalgotrade import barfeed
+from pyalgotrade import dataseries
+from pyalgotrade.dataseries import bards
+from pyalgotrade.utils import collections
+from pyalgotrade.utils import dt
+
+# The position of each value in the columns kept for each instrument. Datetimes go first.
+COLUMNS = ["open", "high", "low", "close", "volume", "adjClose"]
+
+
+def build_bar(dateTime, open_, high, low, close, volume, adjClose, frequency, extra=None):
+    # Builds a bar.BasicBar skipping the OHLC checks, since those are done for whole columns when loading.
+    ret = bar.BasicBar.__new__(bar.BasicBar)
+    ret.__setstate__((dateTime, open_, close, high, low, volume, adjClose, frequency, False, extra or {}))
+    return ret
+
+
+def get_ohlc_checks(open_, high, low, close):
+    return [
+        (high < low, "high < low on %s"),
+        (high < open_, "high < open on %s"),
+        (high < close, "high < close on %s"),
+        (low > open_, "low > open on %s"),
+        (low > close, "low > close on %s"),
+    ]
+
+
+def get_invalid_ohlc(open_, high, low, close):
+    """Returns a numpy.array of booleans set to True for invalid bars."""
+    ret = np.zeros(len(open_), dtype=bool)
+    for failed, _ in get_ohlc_checks(open_, high, low, close):
+        ret |= failed
+    return ret
+
+
+def check_ohlc(dateTimes, open_, high, low, close, timezone=None):
+    """Vectorized version of the checks done by :class:`pyalgotrade.bar.BasicBar`.
+    dateTimes should be a numpy.array with int64 nanoseconds since the epoch."""
+
+    checks = get_ohlc_checks(open_, high, low, close)
+    invalid = np.zeros(len(dateTimes), dtype=bool)
+    for failed, _ in checks:
+        invalid |= failed
+
+    if invalid.any():
+        # Report the first invalid bar, just like BasicBar would.
+        pos = np.flatnonzero(invalid)[0]
+        for failed, msg in checks:
+            if failed[pos]:
+                raise Exception(msg % dataseries.nanoseconds_to_datetime(dateTimes[pos], timezone))
+
+
+class BarsView(bar.Bars):
+    """A :class:`pyalgotrade.bar.Bars` view over one row of columnar bars.
+    :class:`pyalgotrade.bar.Bar` instances are built the first time they are accessed.
+
+    :param dateTime: The datetime for the bars.
+    :type dateTime: :class:`datetime.datetime`.
+    :param instrumentToRef: Maps each instrument to whatever buildBar needs to build its bar.
+    :type instrumentToRef: dict.
+    :param buildBar: A function that receives a ref and returns a :class:`pyalgotrade.bar.Bar`.
+    """
+
+    def __init__(self, dateTime, instrumentToRef, buildBar):
+        # Not calling bar.Bars.__init__ on purpose, since bars are in sync by construction.
+        self.__dateTime = dateTime
+        self.__instrumentToRef = instrumentToRef
+        self.__buildBar = buildBar
+        self.__bars = {}
+
+    def __getitem__(self, instrument):
+        ret = self.__bars.get(instrument)
+        if ret is None:
+            ret = self.__buildBar(self.__instrumentToRef[instrument])
+            self.__bars[instrument] = ret
+        return ret
+
+    def __contains__(self, instrument):
+        return instrument in self.__instrumentToRef
+
+    def items(self):
+        return [(instrument, self[instrument]) for instrument in self.__instrumentToRef]
+
+    def keys(self):
+        return list(self.__instrumentToRef.keys())
+
+    def getInstruments(self):
+        return list(self.__instrumentToRef.keys())
+
+    def getDateTime(self):
+        return self.__dateTime
+
+    def getBar(self, instrument):
+        ret = None
+        if instrument in self.__instrumentToRef:
+            ret = self[instrument]
+        return ret
+
+    def getRef(self, instrument):
+        return self.__instrumentToRef.get(instrument)
+
+
+class BarDataSeries(bards.BarDataSeries):
+    """A :class:`pyalgotrade.dataseries.bards.BarDataSeries` for a columnar bar feed. It holds positions into the
+    columns for an instrument, and :class:`pyalgotrade.bar.Bar` instances are built when accessed.
+
+    .. note::
+        * This class should not be instantiated directly.
+        * The dataseries for each column are filled in from the columns, without building bars.
+    """
+
+    def __init__(self, getBar, getColumn, maxLen=None):
+        super(BarDataSeries, self).__init__(maxLen)
+        maxLen = dataseries.get_checked_max_len(maxLen)
+        self.__getBar = getBar
+        self.__getColumn = getColumn
+        self.__dateTimes = collections.ListDeque(maxLen)
+        self.__positions = collections.NumPyDeque(maxLen, dtype=np.int64)
+        self.__columnDS = {}
+        self.__extraDS = {}
+        self.__useAdjustedValues = False
+        # Bars are only built for new value events once someone asked for the event.
+        self.__observed = False
+
+    def __len__(self):
+        return len(self.__positions)
+
+    def __getitem__(self, key):
+        return dataseries.DataSeries.__getitem__(self, key)
+
+    def getValueAbsolute(self, pos):
+        ret = None
+        if pos >= 0 and pos < len(self.__positions):
+            ret = self.__getBar(self.__positions[pos].item())
+        return ret
+
+    def setMaxLen(self, maxLen):
+        self.__dateTimes.resize(maxLen)
+        self.__positions.resize(maxLen)
+        for ds in self.__columnDS.values():
+            ds.setMaxLen(maxLen)
+
+    def getMaxLen(self):
+        return self.__positions.getMaxLen()
+
+    def getDateTimes(self):
+        return self.__dateTimes.data()
+
+    def getNewValueEvent(self):
+        self.__observed = True
+        return super(BarDataSeries, self).getNewValueEvent()
+
+    def setUseAdjustedValues(self, useAdjusted):
+        super(BarDataSeries, self).setUseAdjustedValues(useAdjusted)
+        self.__useAdjustedValues = useAdjusted
+
+    def appendWithDateTime(self, dateTime, bar):
+        raise Exception("Bars can't be appended to a columnar bar dataseries")
+
+    def appendPosition(self, dateTime, pos):
+        # Appends the bar at a given position in the columns.
+        if len(self.__dateTimes) != 0 and self.__dateTimes[-1] >= dateTime:
+            raise Exception("Invalid datetime. It must be bigger than that last one")
+
+        self.__dateTimes.append(dateTime)
+        self.__positions.append(pos)
+        for name, ds in self.__columnDS.items():
+            ds.appendWithDateTime(dateTime, self.__getValue(name, pos))
+        if self.__observed:
+            super(BarDataSeries, self).getNewValueEvent().emit(self, dateTime, self.__getBar(pos))
+
+    def __getValue(self, name, pos):
+        ret = self.__getColumn(name).item(pos)
+        if ret != ret:
+            ret = None
+        return ret
+
+    def __getOrCreateColumnDS(self, name):
+        ret = self.__columnDS.get(name)
+        if ret is None:
+            ret = dataseries.SequenceDataSeries(self.getMaxLen())
+            for dateTime, pos in zip(self.__dateTimes.data(), self.__positions.data().tolist()):
+                ret.appendWithDateTime(dateTime, self.__getValue(name, pos))
+            self.__columnDS[name] = ret
+        return ret
+
+    def getOpenDataSeries(self):
+        return self.__getOrCreateColumnDS("open")
+
+    def getCloseDataSeries(self):
+        return self.__getOrCreateColumnDS("close")
+
+    def getHighDataSeries(self):
+        return self.__getOrCreateColumnDS("high")
+
+    def getLowDataSeries(self):
+        return self.__getOrCreateColumnDS("low")
+
+    def getVolumeDataSeries(self):
+        return self.__getOrCreateColumnDS("volume")
+
+    def getAdjCloseDataSeries(self):
+        return self.__getOrCreateColumnDS("adjClose")
+
+    def getPriceDataSeries(self):
+        if self.__useAdjustedValues:
+            return self.getAdjCloseDataSeries()
+        else:
+            return self.getCloseDataSeries()
+
+    def getExtraDataSeries(self, name):
+        # Extra columns are not supported, so these are always empty.
+        ret = self.__extraDS.get(name)
+        if ret is None:
+            ret = dataseries.SequenceDataSeries(self.getMaxLen())
+            self.__extraDS[name] = ret
+        return ret
+
+
+class BarFeed(barfeed.BaseBarFeed):
+    """A non real-time BarFeed that holds open, high, low, close, volume and adjusted close values in numpy arrays,
+    one set of columns per instrument.
+
+    :param frequency: The bars frequency. Valid values defined in :class:`pyalgotrade.bar.Frequency`.
+    :param timezone: The timezone used to build bar datetimes. If None, the timezone of the first localized datetime
+        added is used. If there is none, datetimes are naive.
+    :type timezone: A pytz timezone.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded
+        from the opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+
+    .. note::
+        * OHLC values are checked once, when added to the feed.
+        * :class:`pyalgotrade.bar.Bar` instances are only built when they are accessed, either through the
+          :class:`pyalgotrade.bar.Bars` dispatched, the dataseries or :meth:`getLastBar`. Keep in mind that the
+          default fill strategy in the backtesting broker checks the volume of every bar.
+        * Extra columns are not supported.
+    """
+
+    def __init__(self, frequency, timezone=None, maxLen=None):
+        super(BarFeed, self).__init__(frequency, maxLen)
+
+        self.__timezone = timezone
+        # Instrument -> list of column tuples (datetimes, open, high, low, close, volume, adjClose)
+        self.__pending = {}
+        self.__instruments = []
+        self.__instrumentToCol = {}
+        self.__haveAdjClose = True
+        self.__useAdjustedValues = False
+        self.__started = False
+        self.__built = False
+        self.__timeline = None
+        self.__dateTimes = None
+        # For each instrument, the sorted columns and the position in the timeline for each bar.
+        self.__columns = None
+        self.__rows = None
+        # The bars in each row of the timeline, with the instrument and the position in the columns for each one.
+        self.__rowStart = None
+        self.__entryCols = None
+        self.__entryPositions = None
+        self.__nextPos = 0
+        self.__currDateTime = None
+        self.__currentBars = None
+
+    def reset(self):
+        self.__nextPos = 0
+        self.__currDateTime = None
+        self.__currentBars = None
+        super(BarFeed, self).reset()
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def barsHaveAdjClose(self):
+        return len(self.__instruments) > 0 and self.__haveAdjClose
+
+    def setUseAdjustedValues(self, useAdjusted):
+        super(BarFeed, self).setUseAdjustedValues(useAdjusted)
+        self.__useAdjustedValues = useAdjusted
+
+    def getTimezone(self):
+        return self.__timezone
+
+    def start(self):
+        super(BarFeed, self).start()
+        self.__started = True
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def createDataSeries(self, key, maxLen):
+        col = self.__instrumentToCol.get(key)
+        if col is None:
+            return super(BarFeed, self).createDataSeries(key, maxLen)
+        ret = BarDataSeries(
+            lambda pos: self.__getBar(col, pos), lambda name: self.__getColumn(col, name), maxLen
+        )
+        ret.setUseAdjustedValues(self.__useAdjustedValues)
+        return ret
+
+    def __toNanoseconds(self, dateTimes):
+        dateTimes = np.asarray(dateTimes)
+        if dateTimes.dtype.kind == "M":
+            return dateTimes.astype("datetime64[ns]").view(np.int64)
+        elif dateTimes.dtype.kind in "iu":
+            return dateTimes.astype(np.int64)
+
+        ret = np.empty(len(dateTimes), dtype=np.int64)
+        for i, dateTime in enumerate(dateTimes):
+            if dt.datetime_is_naive(dateTime):
+                if self.__timezone is not None:
+                    dateTime = dt.localize(dateTime, self.__timezone)
+            elif self.__timezone is None:
+                self.__timezone = dateTime.tzinfo
+            ret[i] = dataseries.datetime_to_nanoseconds(dateTime)
+        return ret
+
+    def addBarsFromArrays(self, instrument, dateTimes, open_, high, low, close, volume, adjClose=None, timezone=None):
+        """Adds bars for an instrument.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param dateTimes: The bar datetimes. Either :class:`datetime.datetime` instances, numpy.datetime64 values or
+            int64 nanoseconds since the epoch (UTC).
+        :param open_: The opening prices.
+        :param high: The highest prices.
+        :param low: The lowest prices.
+        :param close: The closing prices.
+        :param volume: The volumes.
+        :param adjClose: The adjusted closing prices, or None if not available.
+        :param timezone: The timezone the datetimes were localized with. Used to build bar datetimes if the feed
+            doesn't have a timezone yet.
+        :type timezone: A pytz timezone.
+        """
+
+        if self.__started:
+            raise Exception("Can't add more bars once you started consuming bars")
+
+        if self.__timezone is None:
+            self.__timezone = timezone
+        dateTimes = self.__toNanoseconds(dateTimes)
+        columns = [np.asarray(values, dtype=np.float64) for values in (open_, high, low, close, volume)]
+        if adjClose is None:
+            self.__haveAdjClose = False
+            columns.append(np.full(len(dateTimes), np.nan))
+        else:
+            columns.append(np.asarray(adjClose, dtype=np.float64))
+        for values in columns:
+            if len(values) != len(dateTimes):
+                raise Exception("All columns must have the same length")
+
+        check_ohlc(dateTimes, columns[0], columns[1], columns[2], columns[3], self.__timezone)
+
+        if instrument not in self.__pending:
+            self.__pending[instrument] = []
+            self.__instrumentToCol[instrument] = len(self.__instruments)
+            self.__instruments.append(instrument)
+        self.__pending[instrument].append([dateTimes] + columns)
+        self.__built = False
+
+        self.registerInstrument(instrument)
+
+    def addBarsFromSequence(self, instrument, bars):
+        """Adds :class:`pyalgotrade.bar.Bar` instances for an instrument."""
+
+        for bar_ in bars:
+            if len(bar_.getExtraColumns()):
+                raise Exception("Extra columns are not supported")
+
+        haveAdjClose = all(bar_.getAdjClose() is not None for bar_ in bars)
+        self.addBarsFromArrays(
+            instrument,
+            [bar_.getDateTime() for bar_ in bars],
+            [bar_.getOpen() for bar_ in bars],
+            [bar_.getHigh() for bar_ in bars],
+            [bar_.getLow() for bar_ in bars],
+            [bar_.getClose() for bar_ in bars],
+            [bar_.getVolume() for bar_ in bars],
+            [bar_.getAdjClose() for bar_ in bars] if haveAdjClose else None
+        )
+
+    def __build(self):
+        if self.__built:
+            return
+
+        # Merge the chunks for each instrument and sort them.
+        self.__columns = []
+        for instrument in self.__instruments:
+            chunks = self.__pending[instrument]
+            columns = [np.concatenate([chunk[i] for chunk in chunks]) for i in range(len(chunks[0]))]
+            # Keep the merged columns so this doesn't need to be done again if more bars get added.
+            self.__pending[instrument] = [columns]
+
+            order = np.argsort(columns[0], kind="mergesort")
+            columns = [values[order] for values in columns]
+            duplicates = np.flatnonzero(np.diff(columns[0]) == 0)
+            if len(duplicates):
+                raise Exception("Duplicate bars found for %s on %s" % (
+                    [instrument], dataseries.nanoseconds_to_datetime(columns[0][duplicates[0]], self.__timezone)
+                ))
+            self.__columns.append(columns)
+
+        if len(self.__columns):
+            self.__timeline = np.unique(np.concatenate([columns[0] for columns in self.__columns]))
+        else:
+            self.__timeline = np.empty(0, dtype=np.int64)
+        self.__rows = [np.searchsorted(self.__timeline, columns[0]) for columns in self.__columns]
+
+        # Group the bars by row. The sort is stable, so instruments keep the order in which they were added.
+        empty = np.empty(0, dtype=np.int64)
+        rows = np.concatenate([empty] + self.__rows)
+        order = np.argsort(rows, kind="mergesort")
+        self.__entryCols = np.concatenate(
+            [empty] + [np.full(len(rows_), col, dtype=np.int64) for col, rows_ in enumerate(self.__rows)]
+        )[order]
+        self.__entryPositions = np.concatenate([empty] + [np.arange(len(rows_)) for rows_ in self.__rows])[order]
+        self.__rowStart = np.searchsorted(rows[order], np.arange(len(self.__timeline) + 1))
+
+        self.__dateTimes = [None] * len(self.__timeline)
+        self.__built = True
+
+    def __getDateTime(self, row):
+        ret = self.__dateTimes[row]
+        if ret is None:
+            ret = dataseries.nanoseconds_to_datetime(self.__timeline[row], self.__timezone)
+            self.__dateTimes[row] = ret
+        return ret
+
+    def __getColumn(self, col, name):
+        self.__build()
+        return self.__columns[col][COLUMNS.index(name) + 1]
+
+    def __buildBar(self, ref):
+        col, pos = ref
+        columns = self.__columns[col]
+        open_, high, low, close, volume, adjClose = [values.item(pos) for values in columns[1:]]
+        if adjClose != adjClose:
+            adjClose = None
+        dateTime = self.__getDateTime(self.__rows[col].item(pos))
+        ret = build_bar(dateTime, open_, high, low, close, volume, adjClose, self.getFrequency())
+        ret.setUseAdjustedValue(self.__useAdjustedValues)
+        return ret
+
+    def __getBar(self, col, pos):
+        # Bars for the current row come from the current bars, so they're the same instances.
+        if self.__currentBars is not None and self.__currentBars.getRef(self.__instruments[col]) == (col, pos):
+            return self.__currentBars[self.__instruments[col]]
+        return self.__buildBar((col, pos))
+
+    def getDateTimesAsArray(self):
+        """Returns a numpy.array with the datetimes for all bars as int64 nanoseconds since the epoch (UTC)."""
+        self.__build()
+        return self.__timeline
+
+    def eof(self):
+        self.__build()
+        return self.__nextPos >= len(self.__timeline)
+
+    def peekDateTime(self):
+        ret = None
+        if not self.eof():
+            ret = self.__getDateTime(self.__nextPos)
+        return ret
+
+    def peekDateTimes(self):
+        self.__build()
+        return [self.__getDateTime(row) for row in range(self.__nextPos, len(self.__timeline))]
+
+    def getNextBars(self):
+        if self.eof():
+            return None
+
+        row = self.__nextPos
+        self.__nextPos += 1
+        begin = self.__rowStart.item(row)
+        end = self.__rowStart.item(row + 1)
+        instrumentToRef = dict(
+            (self.__instruments[col], (col, pos)) for col, pos in zip(
+                self.__entryCols[begin:end].tolist(), self.__entryPositions[begin:end].tolist()
+            )
+        )
+        dateTime = self.__getDateTime(row)
+        self.__currDateTime = dateTime
+        self.__currentBars = BarsView(dateTime, instrumentToRef, self.__buildBar)
+        return self.__currentBars
+
+    def getNextValues(self):
+        # Overridden so that bars are not built when keeping track of the last bar for each instrument.
+        dateTime = None
+        bars = self.getNextBars()
+        if bars is not None:
+            dateTime = bars.getDateTime()
+        return (dateTime, bars)
+
+    def getNextValuesAndUpdateDS(self):
+        # Overridden so that bars are not built when they get appended to the dataseries.
+        dateTime, bars = self.getNextValues()
+        if dateTime is not None:
+            for instrument in bars.getInstruments():
+                self[instrument].appendPosition(dateTime, bars.getRef(instrument)[1])
+        return (dateTime, bars)
+
+    def getCurrentBars(self):
+        return self.__currentBars
+
+    def getLastBar(self, instrument):
+        ret = None
+        col = self.__instrumentToCol.get(instrument)
+        if col is not None and self.__nextPos > 0:
+            pos = np.searchsorted(self.__rows[col], self.__nextPos - 1, side="right") - 1
+            if pos >= 0:
+                ret = self.__getBar(col, int(pos))
+        return ret
+
+    def loadAll(self):
+        for dateTime, bars in self:
+            pass
@@ -18,12 +18,22 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import csv
 import datetime
+import heapq
+import json
+import multiprocessing
+import re
 
+import numpy as np
 import pytz
 import six
 
 from pyalgotrade import bar
+from pyalgotrade import barfeed
+from pyalgotrade import dataseries
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import columnarbf
 from pyalgotrade.barfeed import membf
 from pyalgotrade.utils import csvutils, dt
 
@@ -39,12 +49,37 @@ class RowParser(object):
     def getDelimiter(self):
         raise NotImplementedError()
 
+    # Should return a string that identifies the parser settings, used to validate cached bars, or None if bars
+    # parsed with this parser can't be cached.
+    def getCacheKey(self):
+        return None
+
+    # Called instead of parseBar when bars were not parsed by this instance, for example when they are loaded from the
+    # cache or parsed in a worker process.
+    def barsLoaded(self, bars):
+        pass
+
+
+def get_timezone_key(timezone):
+    # Returns a string that identifies a timezone, to be used in cache keys.
+    if not timezone:
+        return ""
+    return getattr(timezone, "zone", None) or str(timezone)
+
 
 # Interface for bar filters.
 class BarFilter(object):
     def includeBar(self, bar_):
         raise NotImplementedError()
 
+    # Optional vectorized version of includeBar used when loading columns.
+    # columns is a dict with numpy arrays for "datetime" (int64 nanoseconds since the epoch), "open", "high", "low",
+    # "close", "volume" and "adj_close".
+    # Should return a numpy.array of booleans, or None if not supported, in which case includeBar gets called for
+    # every row.
+    def includeBars(self, columns):
+        return None
+
 
 class DateRangeFilter(BarFilter):
     def __init__(self, fromDate=None, toDate=None):
@@ -58,6 +93,15 @@ class DateRangeFilter(BarFilter):
             return False
         return True
 
+    def includeBars(self, columns):
+        dateTimes = columns["datetime"]
+        ret = np.ones(len(dateTimes), dtype=bool)
+        if self.__toDate:
+            ret &= dateTimes <= dataseries.datetime_to_nanoseconds(self.__toDate)
+        if self.__fromDate:
+            ret &= dateTimes >= dataseries.datetime_to_nanoseconds(self.__fromDate)
+        return ret
+
 
 # US Equities Regular Trading Hours filter
 # Monday ~ Friday
@@ -88,6 +132,10 @@ class USEquitiesRTH(DateRangeFilter):
                 return False
         return ret
 
+    def includeBars(self, columns):
+        # Use includeBar instead.
+        return None
+
 
 class BarFeed(membf.BarFeed):
     """Base class for CSV file based :class:`pyalgotrade.barfeed.BarFeed`.
@@ -101,6 +149,19 @@ class BarFeed(membf.BarFeed):
 
         self.__barFilter = None
         self.__dailyTime = datetime.time(0, 0, 0)
+        self.__useCache = False
+
+    def getUseCache(self):
+        return self.__useCache
+
+    def setUseCache(self, useCache):
+        """Enables or disables the bar cache.
+
+        If enabled, bars parsed from a CSV file are saved to a binary file next to it, and are loaded from there the
+        next time the same file is loaded with the same settings. The cache file is ignored if the CSV file size or
+        modification time changes.
+        """
+        self.__useCache = useCache
 
     def getDailyBarTime(self):
         return self.__dailyTime
@@ -115,34 +176,160 @@ class BarFeed(membf.BarFeed):
         self.__barFilter = barFilter
 
     def addBarsFromCSV(self, instrument, path, rowParser, skipMalformedBars=False):
-        def parse_bar_skip_malformed(row):
-            ret = None
-            try:
-                ret = rowParser.parseBar(row)
-            except Exception:
-                pass
-            return ret
+        self.__loadCSV(instrument, path, rowParser, skipMalformedBars)
 
-        if skipMalformedBars:
-            parse_bar = parse_bar_skip_malformed
-        else:
-            parse_bar = rowParser.parseBar
+    def addBarsFromCSVFiles(self, instrumentToPath, rowParser, skipMalformedBars=False, processes=None):
+        """Loads bars for many instruments, parsing the CSV files in parallel in a pool of worker processes.
+        Bars are sent back from the workers as numpy arrays, one per column.
 
-        # Load the csv file
-        loadedBars = []
-        try:
-            reader = csvutils.FastDictReader(open(
-                path, "r"), fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter())
-        except StopIteration:
+        :param instrumentToPath: A dict that maps instruments to the path of their CSV file.
+        :type instrumentToPath: dict.
+        :param rowParser: The parser for the CSV rows. It has to be picklable. Files are parsed in this process if
+            the parser has no cache key.
+        :type rowParser: :class:`RowParser`.
+        :param skipMalformedBars: True to skip errors while parsing bars.
+        :type skipMalformedBars: boolean.
+        :param processes: The number of worker processes. If None, the number of CPUs is used.
+        :type processes: int.
+        """
+
+        instruments = sorted(instrumentToPath.keys())
+        # Not worth sending bars back and forth as columns with a single process. Columns are also turned back into
+        # BasicBar instances, so parsers without a cache key, like the ones using a different bar class, can't use them.
+        if get_process_count(processes, len(instruments)) <= 1 or rowParser.getCacheKey() is None:
+            for instrument in instruments:
+                self.__loadCSV(instrument, instrumentToPath[instrument], rowParser, skipMalformedBars)
             return
-        for row in reader:
-            bar_ = parse_bar(row)
-            if bar_ is not None and (self.__barFilter is None or self.__barFilter.includeBar(bar_)):
-                loadedBars.append(bar_)
 
+        tasks = [
+            (instrumentToPath[instrument], rowParser, skipMalformedBars, self.__useCache) for instrument in instruments
+        ]
+        for instrument, result in zip(instruments, run_tasks(load_columns_task, tasks, processes)):
+            if result is None:
+                continue
+            if isinstance(result, list):
+                loadedBars = result
+            else:
+                loadedBars = barcache.columns_to_bars(result[0], result[1])
+            rowParser.barsLoaded(loadedBars)
+            self.__addLoadedBars(instrument, loadedBars)
+
+    def __loadCSV(self, instrument, path, rowParser, skipMalformedBars):
+        loadedBars = load_bars(path, rowParser, skipMalformedBars, self.__useCache)
+        if loadedBars is not None:
+            self.__addLoadedBars(instrument, loadedBars)
+
+    def __addLoadedBars(self, instrument, loadedBars):
+        if self.__barFilter is not None:
+            loadedBars = [bar_ for bar_ in loadedBars if self.__barFilter.includeBar(bar_)]
         self.addBarsFromSequence(instrument, loadedBars)
 
 
+def parse_csv(path, rowParser, skipMalformedBars):
+    """Parses a CSV file and returns a list of bars, or None if the file is empty."""
+
+    def parse_bar_skip_malformed(row):
+        ret = None
+        try:
+            ret = rowParser.parseBar(row)
+        except Exception:
+            pass
+        return ret
+
+    if skipMalformedBars:
+        parse_bar = parse_bar_skip_malformed
+    else:
+        parse_bar = rowParser.parseBar
+
+    # Load the csv file
+    ret = []
+    try:
+        reader = csvutils.FastDictReader(open(
+            path, "r"), fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter())
+    except StopIteration:
+        return None
+    for row in reader:
+        bar_ = parse_bar(row)
+        if bar_ is not None:
+            ret.append(bar_)
+    return ret
+
+
+def load_bars(path, rowParser, skipMalformedBars, useCache):
+    """Returns the list of bars in a CSV file, or None if the file is empty. Uses the cache if enabled and supported by
+    the parser."""
+
+    cacheKey = None
+    if useCache:
+        cacheKey = rowParser.getCacheKey()
+    if cacheKey is None:
+        return parse_csv(path, rowParser, skipMalformedBars)
+
+    cachePath = barcache.get_cache_path(path)
+    header = barcache.build_header(path, cacheKey, skipMalformedBars)
+    ret = barcache.load_bars(cachePath, header)
+    if ret is None:
+        ret = parse_csv(path, rowParser, skipMalformedBars)
+        if ret is not None:
+            barcache.save_bars(cachePath, header, ret)
+    else:
+        rowParser.barsLoaded(ret)
+    return ret
+
+
+def load_columns(path, rowParser, skipMalformedBars, useCache):
+    """Same as :func:`load_bars`, but returns the bars as columns.
+    Check :func:`pyalgotrade.barfeed.barcache.bars_to_columns`. If the bars can't be converted to columns, the list of
+    bars is returned instead."""
+
+    cacheKey = None
+    if useCache:
+        cacheKey = rowParser.getCacheKey()
+    if cacheKey is not None:
+        cachePath = barcache.get_cache_path(path)
+        header = barcache.build_header(path, cacheKey, skipMalformedBars)
+        ret = barcache.load_columns(cachePath, header)
+        if ret is not None:
+            return ret
+
+    bars = parse_csv(path, rowParser, skipMalformedBars)
+    if bars is None:
+        return None
+    ret = barcache.bars_to_columns(bars)
+    if ret is None:
+        return bars
+    if cacheKey is not None:
+        barcache.save_columns(cachePath, header, ret[0], ret[1])
+    return ret
+
+
+def load_columns_task(args):
+    # Entry point for worker processes.
+    return load_columns(*args)
+
+
+def get_process_count(processes, taskCount):
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    return min(processes, taskCount)
+
+
+def run_tasks(func, tasks, processes=None):
+    """Runs func for every task in a pool of worker processes, and returns the results in order.
+    If there is only one task or one process, everything runs in the current process."""
+
+    processes = get_process_count(processes, len(tasks))
+    if processes <= 1:
+        return [func(task) for task in tasks]
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(func, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
 class GenericRowParser(RowParser):
     def __init__(self, columnNames, dateTimeFormat, dailyBarTime, frequency, timezone, barClass=bar.BasicBar):
         self.__dateTimeFormat = dateTimeFormat
@@ -174,6 +361,18 @@ class GenericRowParser(RowParser):
     def barsHaveAdjClose(self):
         return self.__haveAdjClose
 
+    def getCacheKey(self):
+        if self.__barClass != bar.BasicBar:
+            return None
+        return json.dumps([
+            "generic", self.__dateTimeFormat, str(self.__dailyBarTime), self.__frequency,
+            get_timezone_key(self.__timezone), sorted(self.__columnNames.items())
+        ])
+
+    def barsLoaded(self, bars):
+        if len(bars):
+            self.__haveAdjClose = bars[-1].getAdjClose() is not None
+
     def getFieldNames(self):
         # It is expected for the first row to have the field names.
         return None
@@ -303,3 +502,585 @@ class GenericBarFeed(BarFeed):
         if self.__haveAdjClose == False:
             raise Exception(
                 "Previous bars had adjusted close and these ones don't have.")
+
+    def addBarsFromCSVFiles(self, instrumentToPath, timezone=None, skipMalformedBars=False, processes=None):
+        """Loads bars for many instruments, parsing the CSV files in parallel in a pool of worker processes.
+        The instruments get registered in the bar feed.
+
+        :param instrumentToPath: A dict that maps instruments to the path of their CSV file.
+        :type instrumentToPath: dict.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param skipMalformedBars: True to skip errors while parsing bars.
+        :type skipMalformedBars: boolean.
+        :param processes: The number of worker processes. If None, the number of CPUs is used.
+        :type processes: int.
+        """
+
+        if timezone is None:
+            timezone = self.__timezone
+
+        rowParser = GenericRowParser(
+            self.__columnNames, self.__dateTimeFormat, self.getDailyBarTime(), self.getFrequency(),
+            timezone, self.__barClass
+        )
+
+        super(GenericBarFeed, self).addBarsFromCSVFiles(
+            instrumentToPath, rowParser, skipMalformedBars=skipMalformedBars, processes=processes
+        )
+
+        self.__haveAdjClose = rowParser.barsHaveAdjClose()
+        if self.__haveAdjClose == False:
+            raise Exception(
+                "Previous bars had adjusted close and these ones don't have.")
+
+
+NANOS_PER_SECOND = 1000000000
+NANOS_PER_DAY = 24 * 60 * 60 * NANOS_PER_SECOND
+
+# Fixed width strptime directives supported by parse_fixed_layout_datetimes.
+FIXED_LAYOUT_DIRECTIVES = {"Y": 4, "m": 2, "d": 2, "H": 2, "M": 2, "S": 2}
+
+
+def get_fixed_layout(dateTimeFormat):
+    """Returns a list of (directive, offset, width) tuples, a list of (offset, char) tuples for the literals and the
+    total width, or None if dateTimeFormat is not made of fixed width fields only."""
+
+    fields = []
+    literals = []
+    offset = 0
+    for token in re.findall("%.|[^%]", dateTimeFormat):
+        if token.startswith("%"):
+            width = FIXED_LAYOUT_DIRECTIVES.get(token[1])
+            if width is None:
+                return None
+            fields.append((token[1], offset, width))
+            offset += width
+        else:
+            literals.append((offset, token))
+            offset += 1
+
+    directives = [field[0] for field in fields]
+    if len(set(directives)) != len(directives) or not set(["Y", "m", "d"]).issubset(directives):
+        return None
+    return fields, literals, offset
+
+
+def parse_fixed_layout_datetimes(values, dateTimeFormat):
+    """Parses datetime strings into a numpy.array with int64 nanoseconds since the epoch, without any timezone
+    adjustment. Returns None if the format is not supported or if any value doesn't match it exactly, in which case
+    strptime should be used instead."""
+
+    layout = get_fixed_layout(dateTimeFormat)
+    if layout is None or len(values) == 0:
+        return None
+    fields, literals, length = layout
+
+    # Lengths are checked before converting to fixed width strings, which truncates longer values.
+    if (np.char.str_len(np.asarray(values)) != length).any():
+        return None
+    try:
+        raw = np.array(values, dtype="S%d" % length)
+    except UnicodeEncodeError:
+        return None
+    chars = raw.view(np.uint8).reshape(len(values), length)
+
+    for offset, literal in literals:
+        if (chars[:, offset] != ord(literal)).any():
+            return None
+
+    zeros = np.zeros(len(values), dtype=np.int64)
+    parsed = {"H": zeros, "M": zeros, "S": zeros}
+    for directive, offset, width in fields:
+        digits = chars[:, offset:offset + width].astype(np.int64) - ord("0")
+        if ((digits < 0) | (digits > 9)).any():
+            return None
+        value = np.zeros(len(values), dtype=np.int64)
+        for i in range(width):
+            value = value * 10 + digits[:, i]
+        parsed[directive] = value
+
+    months = (parsed["Y"] - 1970) * 12 + parsed["m"] - 1
+    days = months.astype("datetime64[M]").astype("datetime64[D]") + (parsed["d"] - 1)
+    # Check that all values are within range.
+    if (
+        (parsed["m"] < 1).any() or (parsed["m"] > 12).any() or (parsed["d"] < 1).any() or
+        (days.astype("datetime64[M]") != months.astype("datetime64[M]")).any() or
+        (parsed["H"] > 23).any() or (parsed["M"] > 59).any() or (parsed["S"] > 61).any()
+    ):
+        return None
+
+    seconds = (parsed["H"] * 60 + parsed["M"]) * 60 + parsed["S"]
+    return days.astype("datetime64[ns]").view(np.int64) + seconds * NANOS_PER_SECOND
+
+
+def get_utc_offsets(wallClock, timezone):
+    # Returns the UTC offsets in nanoseconds for wall clock times in nanoseconds.
+    ret = np.empty(len(wallClock), dtype=np.int64)
+    for i, value in enumerate(wallClock.tolist()):
+        offset = dt.localize(dataseries.nanoseconds_to_datetime(value), timezone).utcoffset()
+        ret[i] = ((offset.days * 86400 + offset.seconds) * 1000000 + offset.microseconds) * 1000
+    return ret
+
+
+def localize_nanoseconds(wallClock, timezone):
+    """Converts a numpy.array with int64 nanoseconds for wall clock times in a given timezone to nanoseconds since the
+    epoch (UTC), just like :func:`pyalgotrade.utils.dt.localize` would."""
+
+    # The UTC offset is calculated once per day, unless it changes during that day. In that case it is calculated
+    # once every 15 minutes, since that is the granularity for timezone transitions.
+    days, inverse = np.unique(wallClock // NANOS_PER_DAY, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    dayOffsets = get_utc_offsets(days * NANOS_PER_DAY, timezone)
+    nextDayOffsets = get_utc_offsets((days + 1) * NANOS_PER_DAY, timezone)
+    offsets = dayOffsets[inverse]
+
+    changes = (dayOffsets != nextDayOffsets)[inverse]
+    if changes.any():
+        bucketSize = 15 * 60 * NANOS_PER_SECOND
+        buckets, bucketInverse = np.unique(wallClock[changes] // bucketSize, return_inverse=True)
+        offsets[changes] = get_utc_offsets(buckets * bucketSize, timezone)[bucketInverse.reshape(-1)]
+    return wallClock - offsets
+
+
+class GenericColumnParser(object):
+    """Parses CSV files into numpy arrays, one per column, in a single pass.
+
+    Takes the same settings as :class:`GenericRowParser`. A fast path is used to parse datetimes if dateTimeFormat
+    is only made of %Y, %m, %d, %H, %M, %S and literals, like %Y-%m-%d %H:%M:%S. Otherwise, strptime is used.
+    """
+
+    def __init__(self, columnNames, dateTimeFormat, dailyBarTime, timezone, delimiter=","):
+        self.__columnNames = columnNames
+        self.__dateTimeFormat = dateTimeFormat
+        self.__dailyBarTime = dailyBarTime
+        self.__timezone = timezone
+        self.__delimiter = delimiter
+
+    def getColumnNames(self):
+        return self.__columnNames
+
+    def getDateTimeFormat(self):
+        return self.__dateTimeFormat
+
+    def getDailyBarTime(self):
+        return self.__dailyBarTime
+
+    def getTimezone(self):
+        return self.__timezone
+
+    def getDelimiter(self):
+        return self.__delimiter
+
+    def __parseDateTimesSlow(self, values, valid, skipMalformedBars):
+        ret = np.zeros(len(values), dtype=np.int64)
+        for i, value in enumerate(values):
+            try:
+                ret[i] = dataseries.datetime_to_nanoseconds(datetime.datetime.strptime(value, self.__dateTimeFormat))
+            except Exception:
+                if not skipMalformedBars:
+                    raise
+                valid[i] = False
+        return ret
+
+    def __parseDateTimes(self, values, valid, skipMalformedBars):
+        ret = parse_fixed_layout_datetimes(values, self.__dateTimeFormat)
+        if ret is None:
+            ret = self.__parseDateTimesSlow(values, valid, skipMalformedBars)
+
+        if self.__dailyBarTime is not None:
+            ret = ret - ret % NANOS_PER_DAY + dataseries.datetime_to_nanoseconds(
+                datetime.datetime.combine(datetime.date(1970, 1, 1), self.__dailyBarTime)
+            )
+        # Localize the datetimes if a timezone was given.
+        if self.__timezone:
+            ret = localize_nanoseconds(ret, self.__timezone)
+        return ret
+
+    def __parseFloats(self, values, valid, skipMalformedBars, allowEmpty=False):
+        values = np.array(values)
+        if allowEmpty:
+            values = np.where(values == "", "nan", values)
+        try:
+            return values.astype(np.float64)
+        except ValueError:
+            if not skipMalformedBars:
+                raise
+
+        ret = np.full(len(values), np.nan)
+        for i, value in enumerate(values.tolist()):
+            try:
+                ret[i] = float(value)
+            except ValueError:
+                valid[i] = False
+        return ret
+
+    def parseColumns(self, path, skipMalformedBars=False):
+        """Parses a CSV file and returns a dict with numpy arrays for "datetime" (int64 nanoseconds since the epoch),
+        "open", "high", "low", "close", "volume" and "adj_close" (None if not available).
+        Extra columns are ignored."""
+
+        with open(path, "r") as f:
+            reader = csv.reader(f, delimiter=self.__delimiter)
+            try:
+                fieldNames = six.next(reader)
+            except StopIteration:
+                fieldNames = []
+            rows = [row for row in reader if row != []]
+
+        # Check that rows have the right number of columns.
+        rows = [row for row in rows if len(row) == len(fieldNames) or not skipMalformedBars]
+        for row in rows:
+            if len(row) != len(fieldNames):
+                raise Exception("Expected columns: %s. Actual columns: %s" % (fieldNames, row))
+
+        columns = list(zip(*rows)) if len(rows) else [()] * len(fieldNames)
+        valid = np.ones(len(rows), dtype=bool)
+
+        def get_column(key):
+            name = self.__columnNames[key]
+            if name not in fieldNames:
+                raise Exception("Column %s not found" % name)
+            return columns[fieldNames.index(name)]
+
+        ret = {"datetime": self.__parseDateTimes(get_column("datetime"), valid, skipMalformedBars)}
+        for key in ["open", "high", "low", "close", "volume"]:
+            ret[key] = self.__parseFloats(get_column(key), valid, skipMalformedBars)
+        ret["adj_close"] = None
+        adjCloseColName = self.__columnNames.get("adj_close")
+        if adjCloseColName is not None and adjCloseColName in fieldNames:
+            adjClose = self.__parseFloats(get_column("adj_close"), valid, skipMalformedBars, allowEmpty=True)
+            if not np.isnan(adjClose).all():
+                ret["adj_close"] = adjClose
+
+        invalidOHLC = columnarbf.get_invalid_ohlc(ret["open"], ret["high"], ret["low"], ret["close"])
+        if skipMalformedBars:
+            valid &= ~invalidOHLC
+        else:
+            columnarbf.check_ohlc(ret["datetime"], ret["open"], ret["high"], ret["low"], ret["close"], self.__timezone)
+
+        if not valid.all():
+            ret = dict((key, values[valid] if values is not None else None) for key, values in six.iteritems(ret))
+        return ret
+
+
+def filter_columns(columns, barFilter, frequency, timezone):
+    """Applies a :class:`BarFilter` to columns returned by :meth:`GenericColumnParser.parseColumns`."""
+    mask = barFilter.includeBars(columns)
+    if mask is None:
+        # Fall back to building a bar for each row.
+        mask = np.zeros(len(columns["datetime"]), dtype=bool)
+        adjClose = columns["adj_close"]
+        for i in range(len(mask)):
+            adjCloseValue = None
+            if adjClose is not None and not np.isnan(adjClose[i]):
+                adjCloseValue = adjClose[i]
+            bar_ = columnarbf.build_bar(
+                dataseries.nanoseconds_to_datetime(columns["datetime"][i], timezone),
+                columns["open"][i], columns["high"][i], columns["low"][i], columns["close"][i], columns["volume"][i],
+                adjCloseValue, frequency
+            )
+            mask[i] = barFilter.includeBar(bar_)
+    return dict((key, values[mask] if values is not None else None) for key, values in six.iteritems(columns))
+
+
+class GenericColumnarBarFeed(columnarbf.BarFeed):
+    """Same as :class:`GenericBarFeed`, but CSV files are parsed straight into numpy arrays and
+    :class:`pyalgotrade.bar.Bar` instances are only built when they get dispatched.
+    Check :class:`pyalgotrade.barfeed.columnarbf.BarFeed`.
+
+    :param frequency: The frequency of the bars. Check :class:`pyalgotrade.bar.Frequency`.
+    :param timezone: The default timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+    :type timezone: A pytz timezone.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+
+    .. note::
+        * The CSV file **must** have the column names in the first row.
+        * It is ok if the **Adj Close** column is empty.
+        * Extra columns are ignored.
+        * Bar filters that don't implement includeBars get called for every row, which is slower.
+    """
+
+    def __init__(self, frequency, timezone=None, maxLen=None):
+        super(GenericColumnarBarFeed, self).__init__(frequency, timezone, maxLen)
+
+        self.__timezone = timezone
+        self.__barFilter = None
+        self.__dateTimeFormat = "%Y-%m-%d %H:%M:%S"
+        self.__dailyTime = None
+        self.__columnNames = {
+            "datetime": "Date Time",
+            "open": "Open",
+            "high": "High",
+            "low": "Low",
+            "close": "Close",
+            "volume": "Volume",
+            "adj_close": "Adj Close",
+        }
+
+    def getDailyBarTime(self):
+        return self.__dailyTime
+
+    def setDailyBarTime(self, time):
+        self.__dailyTime = time
+
+    def getBarFilter(self):
+        return self.__barFilter
+
+    def setBarFilter(self, barFilter):
+        self.__barFilter = barFilter
+
+    def setNoAdjClose(self):
+        self.__columnNames["adj_close"] = None
+
+    def setColumnName(self, col, name):
+        self.__columnNames[col] = name
+
+    def setDateTimeFormat(self, dateTimeFormat):
+        """
+        Set the format string to use with strptime to parse datetime column.
+        """
+        self.__dateTimeFormat = dateTimeFormat
+
+    def getColumnParser(self, timezone):
+        return GenericColumnParser(dict(self.__columnNames), self.__dateTimeFormat, self.__dailyTime, timezone)
+
+    def addBarsFromColumns(self, instrument, columns, timezone=None):
+        """Adds bars from columns returned by :meth:`GenericColumnParser.parseColumns`, applying the bar filter."""
+        if self.__barFilter is not None:
+            columns = filter_columns(columns, self.__barFilter, self.getFrequency(), self.getTimezone() or timezone)
+        self.addBarsFromArrays(
+            instrument, columns["datetime"], columns["open"], columns["high"], columns["low"], columns["close"],
+            columns["volume"], columns["adj_close"], timezone
+        )
+
+    def addBarsFromCSV(self, instrument, path, timezone=None, skipMalformedBars=False):
+        """Loads bars for a given instrument from a CSV formatted file.
+        The instrument gets registered in the bar feed.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param path: The path to the CSV file.
+        :type path: string.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param skipMalformedBars: True to skip errors while parsing bars.
+        :type skipMalformedBars: boolean.
+        """
+
+        if timezone is None:
+            timezone = self.__timezone
+        columns = self.getColumnParser(timezone).parseColumns(path, skipMalformedBars)
+        self.addBarsFromColumns(instrument, columns, timezone)
+
+
+class CSVBarReader(object):
+    # Reads bars for one instrument from a CSV file, one row at a time, checking that they're in order.
+
+    def __init__(self, instrument, path, rowParser, skipMalformedBars):
+        self.__instrument = instrument
+        self.__path = path
+        self.__rowParser = rowParser
+        self.__skipMalformedBars = skipMalformedBars
+        self.__barFilter = None
+        self.__file = None
+        self.__reader = None
+        self.__lastDateTime = None
+
+    def open(self, barFilter):
+        self.close()
+        self.__barFilter = barFilter
+        self.__file = open(self.__path, "r")
+        self.__lastDateTime = None
+        try:
+            self.__reader = csvutils.FastDictReader(
+                self.__file, fieldnames=self.__rowParser.getFieldNames(), delimiter=self.__rowParser.getDelimiter()
+            )
+        except StopIteration:
+            self.close()
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+        self.__file = None
+        self.__reader = None
+
+    def __parseBar(self, row):
+        ret = None
+        try:
+            ret = self.__rowParser.parseBar(row)
+        except Exception:
+            if not self.__skipMalformedBars:
+                raise
+        return ret
+
+    # Returns the next bar, or None if there are no more bars.
+    def readBar(self):
+        while self.__reader is not None:
+            try:
+                row = six.next(self.__reader)
+            except StopIteration:
+                self.close()
+                break
+
+            bar_ = self.__parseBar(row)
+            if bar_ is None or (self.__barFilter is not None and not self.__barFilter.includeBar(bar_)):
+                continue
+
+            dateTime = bar_.getDateTime()
+            if self.__lastDateTime is not None:
+                if dateTime == self.__lastDateTime:
+                    raise Exception("Duplicate bars found for %s on %s" % ([self.__instrument], dateTime))
+                elif dateTime < self.__lastDateTime:
+                    raise Exception(
+                        "Bar date times are not in order in %s. Previous datetime was %s and current datetime is %s" % (
+                            self.__path, self.__lastDateTime, dateTime
+                        )
+                    )
+            self.__lastDateTime = dateTime
+            return bar_
+        return None
+
+
+class StreamingBarFeed(barfeed.BaseBarFeed):
+    """A non real-time BarFeed that reads bars from CSV files as they get dispatched, instead of loading them into
+    memory upfront.
+
+    :param frequency: The frequency of the bars. Check :class:`pyalgotrade.bar.Frequency`.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+
+    .. note::
+        * Each file **must** be sorted by datetime. This is checked while bars are read.
+        * Only one file per instrument is supported.
+        * Only one row per instrument is held in memory at any time.
+    """
+
+    def __init__(self, frequency, maxLen=None):
+        super(StreamingBarFeed, self).__init__(frequency, maxLen)
+
+        self.__barFilter = None
+        self.__readers = []
+        self.__instruments = []
+        self.__started = False
+        self.__currDateTime = None
+        self.__haveAdjClose = None
+        # A min-heap with the next bar for each instrument that has bars left. Built on demand.
+        self.__heap = None
+
+    def reset(self):
+        self.__closeReaders()
+        self.__currDateTime = None
+        super(StreamingBarFeed, self).reset()
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def getBarFilter(self):
+        return self.__barFilter
+
+    def setBarFilter(self, barFilter):
+        self.__barFilter = barFilter
+
+    def start(self):
+        super(StreamingBarFeed, self).start()
+        self.__started = True
+
+    def stop(self):
+        self.__closeReaders()
+        # No more bars are returned once stopped, unless reset gets called.
+        self.__heap = []
+
+    def join(self):
+        pass
+
+    def barsHaveAdjClose(self):
+        # This is based on the first bar for each instrument.
+        if self.__haveAdjClose is None:
+            self.__getHeap()
+        return self.__haveAdjClose
+
+    def addBarsFromCSV(self, instrument, path, rowParser, skipMalformedBars=False):
+        """Registers a CSV file to read bars for a given instrument from.
+        The instrument gets registered in the bar feed.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param path: The path to the CSV file.
+        :type path: string.
+        :param rowParser: The parser for the CSV rows.
+        :type rowParser: :class:`RowParser`.
+        :param skipMalformedBars: True to skip errors while parsing bars.
+        :type skipMalformedBars: boolean.
+        """
+
+        if self.__started:
+            raise Exception("Can't add more bars once you started consuming bars")
+        if instrument in self.__instruments:
+            raise Exception("A file for %s was already added" % instrument)
+
+        self.__closeReaders()
+        self.__haveAdjClose = None
+        self.__readers.append(CSVBarReader(instrument, path, rowParser, skipMalformedBars))
+        self.__instruments.append(instrument)
+        self.registerInstrument(instrument)
+
+    def __closeReaders(self):
+        for reader in self.__readers:
+            reader.close()
+        self.__heap = None
+
+    # Heap items are (datetime, instrument index, bar) tuples. The instrument index is there to break ties
+    # following the order in which instruments were added.
+    def __getHeap(self):
+        if self.__heap is None:
+            self.__heap = []
+            for idx, reader in enumerate(self.__readers):
+                reader.open(self.__barFilter)
+                bar_ = reader.readBar()
+                if bar_ is not None:
+                    self.__heap.append((bar_.getDateTime(), idx, bar_))
+            heapq.heapify(self.__heap)
+            self.__haveAdjClose = len(self.__heap) > 0 and all(
+                item[2].getAdjClose() is not None for item in self.__heap
+            )
+        return self.__heap
+
+    def eof(self):
+        return len(self.__getHeap()) == 0
+
+    def peekDateTime(self):
+        ret = None
+        heap = self.__getHeap()
+        if len(heap):
+            ret = heap[0][0]
+        return ret
+
+    def getNextBars(self):
+        heap = self.__getHeap()
+        if len(heap) == 0:
+            return None
+        smallestDateTime = heap[0][0]
+
+        # Pop all the instruments that have a bar with the smallest datetime, and replace them with their next bar.
+        ret = {}
+        while len(heap) and heap[0][0] == smallestDateTime:
+            _, idx, bar_ = heap[0]
+            ret[self.__instruments[idx]] = bar_
+            nextBar = self.__readers[idx].readBar()
+            if nextBar is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (nextBar.getDateTime(), idx, nextBar))
+
+        self.__currDateTime = smallestDateTime
+        return bar.Bars(ret)
+
+    def loadAll(self):
+        for dateTime, bars in self:
+            pass
@@ -19,6 +19,14 @@
 """
 
 
+def iter_feed_bars(feed):
+    # Yields (instrument, bar) tuples for all the bars in a feed.
+    for dateTime, bars in feed:
+        if bars:
+            for instrument in bars.getInstruments():
+                yield instrument, bars.getBar(instrument)
+
+
 class Database(object):
     def addBars(self, bars, frequency):
         for instrument in bars.getInstruments():
@@ -26,9 +34,16 @@ class Database(object):
             self.addBar(instrument, bar, frequency)
 
     def addBarsFromFeed(self, feed):
-        for dateTime, bars in feed:
-            if bars:
-                self.addBars(bars, feed.getFrequency())
+        return self.addBarSequence(iter_feed_bars(feed), feed.getFrequency())
+
+    def addBarSequence(self, instrumentBars, frequency):
+        # instrumentBars is an iterable of (instrument, bar) tuples.
+        # Subclasses should override this if they can write bars in bulk.
+        ret = 0
+        for instrument, bar in instrumentBars:
+            self.addBar(instrument, bar, frequency)
+            ret += 1
+        return ret
 
     def addBar(self, instrument, bar, frequency):
         raise NotImplementedError()
@@ -18,11 +18,43 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import heapq
+
 import six
 
 from pyalgotrade import barfeed
 from pyalgotrade import bar
-from pyalgotrade import utils
+
+
+def is_sorted(bars):
+    # True if bars are sorted by datetime. Checked in a single pass.
+    for i in six.moves.xrange(1, len(bars)):
+        if bars[i].getDateTime() < bars[i - 1].getDateTime():
+            return False
+    return True
+
+
+def merge_sorted(bars1, bars2):
+    # Merges two lists of bars already sorted by datetime in linear time.
+    # On ties, bars from bars1 go first, just like a stable sort over bars1 + bars2 would do.
+    if len(bars1) == 0 or len(bars2) == 0 or bars1[-1].getDateTime() <= bars2[0].getDateTime():
+        return bars1 + bars2
+    if bars2[-1].getDateTime() < bars1[0].getDateTime():
+        return bars2 + bars1
+
+    ret = []
+    i = 0
+    j = 0
+    while i < len(bars1) and j < len(bars2):
+        if bars2[j].getDateTime() < bars1[i].getDateTime():
+            ret.append(bars2[j])
+            j += 1
+        else:
+            ret.append(bars1[i])
+            i += 1
+    ret.extend(bars1[i:])
+    ret.extend(bars2[j:])
+    return ret
 
 
 # A non real-time BarFeed responsible for:
@@ -40,12 +72,15 @@ class BarFeed(barfeed.BaseBarFeed):
         self.__nextPos = {}
         self.__started = False
         self.__currDateTime = None
+        # A min-heap with the next bar datetime for each instrument that has bars left. Built on demand.
+        self.__heap = None
 
     def reset(self):
         self.__nextPos = {}
         for instrument in self.__bars.keys():
             self.__nextPos.setdefault(instrument, 0)
         self.__currDateTime = None
+        self.__heap = None
         super(BarFeed, self).reset()
 
     def getCurrentDateTime(self):
@@ -65,48 +100,78 @@ class BarFeed(barfeed.BaseBarFeed):
         if self.__started:
             raise Exception("Can't add more bars once you started consuming bars")
 
-        self.__bars.setdefault(instrument, [])
         self.__nextPos.setdefault(instrument, 0)
 
-        # Add and sort the bars
-        self.__bars[instrument].extend(bars)
-        self.__bars[instrument].sort(key=lambda b: b.getDateTime())
+        # Bars usually come in order, and in chunks that go after the ones already added (one file per year for
+        # example), so only sort when needed and merge the new bars in linear time.
+        bars = list(bars)
+        if not is_sorted(bars):
+            bars.sort(key=lambda b: b.getDateTime())
+        currentBars = self.__bars.get(instrument)
+        if currentBars is None:
+            self.__bars[instrument] = bars
+        elif len(currentBars) == 0 or len(bars) == 0 or currentBars[-1].getDateTime() <= bars[0].getDateTime():
+            currentBars.extend(bars)
+        else:
+            self.__bars[instrument] = merge_sorted(currentBars, bars)
+        self.__heap = None
 
         self.registerInstrument(instrument)
 
+    # Heap items are (datetime, instrument index, instrument) tuples. The instrument index is there to break ties
+    # following the order in which instruments were added.
+    def __getHeap(self):
+        if self.__heap is None:
+            self.__heap = []
+            for idx, (instrument, bars) in enumerate(six.iteritems(self.__bars)):
+                nextPos = self.__nextPos[instrument]
+                if nextPos < len(bars):
+                    self.__heap.append((bars[nextPos].getDateTime(), idx, instrument))
+            heapq.heapify(self.__heap)
+        return self.__heap
+
     def eof(self):
-        ret = True
         # Check if there is at least one more bar to return.
-        for instrument, bars in six.iteritems(self.__bars):
-            nextPos = self.__nextPos[instrument]
-            if nextPos < len(bars):
-                ret = False
-                break
-        return ret
+        return len(self.__getHeap()) == 0
 
     def peekDateTime(self):
         ret = None
+        heap = self.__getHeap()
+        if len(heap):
+            ret = heap[0][0]
+        return ret
 
+    def peekDateTimes(self):
+        ret = set()
         for instrument, bars in six.iteritems(self.__bars):
             nextPos = self.__nextPos[instrument]
-            if nextPos < len(bars):
-                ret = utils.safe_min(ret, bars[nextPos].getDateTime())
-        return ret
+            ret.update(bar_.getDateTime() for bar_ in bars[nextPos:])
+        return sorted(ret)
 
     def getNextBars(self):
         # All bars must have the same datetime. We will return all the ones with the smallest datetime.
-        smallestDateTime = self.peekDateTime()
-
-        if smallestDateTime is None:
+        heap = self.__getHeap()
+        if len(heap) == 0:
             return None
+        smallestDateTime = heap[0][0]
 
-        # Make a second pass to get all the bars that had the smallest datetime.
+        # Pop all the instruments that have a bar with the smallest datetime.
         ret = {}
-        for instrument, bars in six.iteritems(self.__bars):
+        popped = []
+        while len(heap) and heap[0][0] == smallestDateTime:
+            item = heapq.heappop(heap)
+            instrument = item[2]
+            nextPos = self.__nextPos[instrument]
+            ret[instrument] = self.__bars[instrument][nextPos]
+            self.__nextPos[instrument] = nextPos + 1
+            popped.append(item)
+
+        # Reschedule those instruments once we're done, so that a duplicate bar doesn't get returned in this same call.
+        for _, idx, instrument in popped:
+            bars = self.__bars[instrument]
             nextPos = self.__nextPos[instrument]
-            if nextPos < len(bars) and bars[nextPos].getDateTime() == smallestDateTime:
-                ret[instrument] = bars[nextPos]
-                self.__nextPos[instrument] += 1
+            if nextPos < len(bars):
+                heapq.heappush(heap, (bars[nextPos].getDateTime(), idx, instrument))
 
         if self.__currDateTime == smallestDateTime:
             raise Exception("Duplicate bars found for %s on %s" % (list(ret.keys()), smallestDateTime))
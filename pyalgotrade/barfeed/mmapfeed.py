@@ -0,0 +1,281 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import heapq
+import json
+import os
+
+import numpy as np
+import pytz
+
+from pyalgotrade import bar
+from pyalgotrade import barfeed
+from pyalgotrade import dataseries
+from pyalgotrade.barfeed import columnarbf
+
+# Bump this if the directory layout changes.
+VERSION = 1
+HEADER_FILE = "header.json"
+COLUMNS = ["datetime", "open", "high", "low", "close", "volume", "adj_close"]
+
+
+def get_column_path(path, column):
+    return os.path.join(path, "%s.npy" % column)
+
+
+def write_arrays(path, frequency, dateTimes, open_, high, low, close, volume, adjClose=None, timezone=None):
+    """Writes bars for one instrument to a directory, one .npy file per column.
+
+    :param path: The directory to write to. It gets created if it doesn't exist.
+    :type path: string.
+    :param frequency: The bars frequency. Valid values defined in :class:`pyalgotrade.bar.Frequency`.
+    :param dateTimes: A numpy.array with int64 nanoseconds since the epoch (UTC), sorted in ascending order.
+    :param open_: The opening prices.
+    :param high: The highest prices.
+    :param low: The lowest prices.
+    :param close: The closing prices.
+    :param volume: The volumes.
+    :param adjClose: The adjusted closing prices, or None if not available.
+    :param timezone: The timezone used to build bar datetimes when loading, or None to build naive (UTC) datetimes.
+    :type timezone: A pytz timezone.
+    """
+
+    dateTimes = np.asarray(dateTimes, dtype=np.int64)
+    columns = [np.asarray(values, dtype=np.float64) for values in (open_, high, low, close, volume)]
+    if adjClose is not None:
+        columns.append(np.asarray(adjClose, dtype=np.float64))
+    for values in columns:
+        if len(values) != len(dateTimes):
+            raise Exception("All columns must have the same length")
+    if np.any(np.diff(dateTimes) <= 0):
+        raise Exception("Bar date times are not in order")
+    columnarbf.check_ohlc(dateTimes, columns[0], columns[1], columns[2], columns[3], timezone)
+
+    if not os.path.exists(path):
+        os.makedirs(path)
+    for name, values in zip(COLUMNS, [dateTimes] + columns):
+        np.save(get_column_path(path, name), values)
+
+    header = {
+        "version": VERSION,
+        "frequency": frequency,
+        "timezone": timezone.zone if timezone is not None else "",
+        "adj_close": adjClose is not None,
+    }
+    with open(os.path.join(path, HEADER_FILE), "w") as f:
+        json.dump(header, f)
+
+
+def write_bars(path, bars, timezone=None):
+    """Writes a sequence of :class:`pyalgotrade.bar.Bar` for one instrument to a directory.
+    Check :func:`write_arrays`."""
+
+    if len(bars) == 0:
+        raise Exception("No bars to write")
+    haveAdjClose = all(bar_.getAdjClose() is not None for bar_ in bars)
+    write_arrays(
+        path,
+        bars[0].getFrequency(),
+        [dataseries.datetime_to_nanoseconds(bar_.getDateTime()) for bar_ in bars],
+        [bar_.getOpen() for bar_ in bars],
+        [bar_.getHigh() for bar_ in bars],
+        [bar_.getLow() for bar_ in bars],
+        [bar_.getClose() for bar_ in bars],
+        [bar_.getVolume() for bar_ in bars],
+        [bar_.getAdjClose() for bar_ in bars] if haveAdjClose else None,
+        timezone
+    )
+
+
+class InstrumentColumns(object):
+    # Memory-mapped columns for one instrument, along with the position of the next bar.
+
+    def __init__(self, path):
+        with open(os.path.join(path, HEADER_FILE)) as f:
+            self.header = json.load(f)
+        if self.header.get("version") != VERSION:
+            raise Exception("Unsupported version in %s" % path)
+
+        self.dateTimes = np.load(get_column_path(path, "datetime"), mmap_mode="r")
+        names = COLUMNS[1:] if self.header["adj_close"] else COLUMNS[1:-1]
+        self.values = [np.load(get_column_path(path, name), mmap_mode="r") for name in names]
+        for values in self.values:
+            if len(values) != len(self.dateTimes):
+                raise Exception("All columns must have the same length in %s" % path)
+        self.nextPos = 0
+
+    def getTimezone(self):
+        ret = None
+        if self.header["timezone"]:
+            ret = pytz.timezone(self.header["timezone"])
+        return ret
+
+
+class Feed(barfeed.BaseBarFeed):
+    """A non real-time BarFeed that reads bars from memory-mapped column files, one directory per instrument.
+    Use :func:`write_arrays` or :func:`write_bars` to create those.
+
+    :param frequency: The bars frequency. Valid values defined in :class:`pyalgotrade.bar.Frequency`.
+    :param timezone: The timezone used to build bar datetimes. If None, the timezone of the first instrument added is
+        used.
+    :type timezone: A pytz timezone.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded
+        from the opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+
+    .. note::
+        * Bars are only built when dispatched, and files are mapped read-only so the OS can page them in and out and
+          share them between processes.
+        * Files are expected to be sorted by datetime. This is checked while bars are dispatched.
+        * Extra columns are not supported.
+    """
+
+    def __init__(self, frequency, timezone=None, maxLen=None):
+        super(Feed, self).__init__(frequency, maxLen)
+
+        self.__timezone = timezone
+        self.__columns = {}
+        self.__instruments = []
+        self.__haveAdjClose = True
+        self.__started = False
+        self.__currDateTime = None
+        # A min-heap with the next bar datetime (as nanoseconds) for each instrument that has bars left.
+        # Built on demand.
+        self.__heap = None
+
+    def reset(self):
+        for columns in self.__columns.values():
+            columns.nextPos = 0
+        self.__currDateTime = None
+        self.__heap = None
+        super(Feed, self).reset()
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def barsHaveAdjClose(self):
+        return len(self.__instruments) > 0 and self.__haveAdjClose
+
+    def getTimezone(self):
+        return self.__timezone
+
+    def start(self):
+        super(Feed, self).start()
+        self.__started = True
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def addBarsFromPath(self, instrument, path):
+        """Maps the bars for a given instrument.
+        The instrument gets registered in the bar feed.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param path: The directory where the column files were written.
+        :type path: string.
+        """
+
+        if self.__started:
+            raise Exception("Can't add more bars once you started consuming bars")
+        if instrument in self.__columns:
+            raise Exception("Bars for %s were already added" % instrument)
+
+        columns = InstrumentColumns(path)
+        if columns.header["frequency"] != self.getFrequency():
+            raise Exception("Invalid frequency in %s" % path)
+        if self.__timezone is None:
+            self.__timezone = columns.getTimezone()
+        if not columns.header["adj_close"]:
+            self.__haveAdjClose = False
+
+        self.__columns[instrument] = columns
+        self.__instruments.append(instrument)
+        self.__heap = None
+        self.registerInstrument(instrument)
+
+    # Heap items are (nanoseconds, instrument index, instrument) tuples. The instrument index is there to break ties
+    # following the order in which instruments were added.
+    def __getHeap(self):
+        if self.__heap is None:
+            self.__heap = []
+            for idx, instrument in enumerate(self.__instruments):
+                columns = self.__columns[instrument]
+                if columns.nextPos < len(columns.dateTimes):
+                    self.__heap.append((columns.dateTimes.item(columns.nextPos), idx, instrument))
+            heapq.heapify(self.__heap)
+        return self.__heap
+
+    def eof(self):
+        return len(self.__getHeap()) == 0
+
+    def peekDateTime(self):
+        ret = None
+        heap = self.__getHeap()
+        if len(heap):
+            ret = dataseries.nanoseconds_to_datetime(heap[0][0], self.__timezone)
+        return ret
+
+    def __buildBar(self, dateTime, columns, pos):
+        values = [column.item(pos) for column in columns.values]
+        adjClose = values[5] if len(values) > 5 else None
+        return columnarbf.build_bar(
+            dateTime, values[0], values[1], values[2], values[3], values[4], adjClose, self.getFrequency()
+        )
+
+    def getNextBars(self):
+        heap = self.__getHeap()
+        if len(heap) == 0:
+            return None
+        smallest = heap[0][0]
+        dateTime = dataseries.nanoseconds_to_datetime(smallest, self.__timezone)
+
+        # Pop all the instruments that have a bar with the smallest datetime.
+        ret = {}
+        while len(heap) and heap[0][0] == smallest:
+            _, idx, instrument = heap[0]
+            columns = self.__columns[instrument]
+            ret[instrument] = self.__buildBar(dateTime, columns, columns.nextPos)
+            columns.nextPos += 1
+            if columns.nextPos < len(columns.dateTimes):
+                nextNanoseconds = columns.dateTimes.item(columns.nextPos)
+                # Files are checked as bars get dispatched, so there is no need to scan them upfront.
+                if nextNanoseconds == smallest:
+                    raise Exception("Duplicate bars found for %s on %s" % ([instrument], dateTime))
+                elif nextNanoseconds < smallest:
+                    raise Exception(
+                        "Bar date times are not in order for %s. Previous datetime was %s and next datetime is %s" % (
+                            instrument, dateTime, dataseries.nanoseconds_to_datetime(nextNanoseconds, self.__timezone)
+                        )
+                    )
+                heapq.heapreplace(heap, (nextNanoseconds, idx, instrument))
+            else:
+                heapq.heappop(heap)
+
+        self.__currDateTime = dateTime
+        return bar.Bars(ret)
+
+    def loadAll(self):
+        for dateTime, bars in self:
+            pass
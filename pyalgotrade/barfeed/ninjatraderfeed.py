@@ -26,6 +26,7 @@ from pyalgotrade.utils import dt
 import pytz
 
 import datetime
+import json
 
 
 ######################################################################
@@ -87,6 +88,11 @@ class RowParser(csvfeed.RowParser):
     def getFieldNames(self):
         return ["Date Time", "Open", "High", "Low", "Close", "Volume"]
 
+    def getCacheKey(self):
+        return json.dumps([
+            "ninjatrader", str(self.__dailyBarTime), self.__frequency, csvfeed.get_timezone_key(self.__timezone)
+        ])
+
     def getDelimiter(self):
         return ";"
 
@@ -147,3 +153,24 @@ class Feed(csvfeed.BarFeed):
 
         rowParser = RowParser(self.getFrequency(), self.getDailyBarTime(), timezone)
         super(Feed, self).addBarsFromCSV(instrument, path, rowParser)
+
+    def addBarsFromCSVFiles(self, instrumentToPath, timezone=None, processes=None):
+        """Loads bars for many instruments, parsing the files in parallel in a pool of worker processes.
+        The instruments get registered in the bar feed.
+
+        :param instrumentToPath: A dict that maps instruments to the path of their file.
+        :type instrumentToPath: dict.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param processes: The number of worker processes. If None, the number of CPUs is used.
+        :type processes: int.
+        """
+
+        if isinstance(timezone, int):
+            raise Exception("timezone as an int parameter is not supported anymore. Please use a pytz timezone instead.")
+
+        if timezone is None:
+            timezone = self.__timezone
+
+        rowParser = RowParser(self.getFrequency(), self.getDailyBarTime(), timezone)
+        super(Feed, self).addBarsFromCSVFiles(instrumentToPath, rowParser, processes=processes)
@@ -0,0 +1,391 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import os
+import sqlite3
+import zlib
+
+import numpy as np
+
+from pyalgotrade import dataseries
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import columnarbf
+from pyalgotrade.barfeed import dbfeed
+from pyalgotrade.barfeed import sqlitefeed
+import pyalgotrade.logger
+
+logger = pyalgotrade.logger.getLogger(__name__)
+
+# Bump this if the blob layout changes.
+VERSION = 1
+
+CHUNK_DAY = "day"
+CHUNK_MONTH = "month"
+
+COLUMNS = ["datetime", "open", "high", "low", "close", "volume", "adj_close"]
+
+
+def get_chunk_keys(dateTimes, chunkSize):
+    # Returns the chunk for each datetime (int64 nanoseconds since the epoch), as days or months since the epoch (UTC).
+    unit = {CHUNK_DAY: "datetime64[D]", CHUNK_MONTH: "datetime64[M]"}.get(chunkSize)
+    if unit is None:
+        raise Exception("Invalid chunk size %s" % chunkSize)
+    return np.asarray(dateTimes, dtype=np.int64).view("datetime64[ns]").astype(unit).astype(np.int64)
+
+
+def shuffle_bytes(values):
+    # Groups the first byte of every value, then the second one, and so on. Prices in a chunk are usually close to each
+    # other, so this gives zlib long runs of similar bytes to work with.
+    return np.ascontiguousarray(values.view(np.uint8).reshape(len(values), values.itemsize).T).tobytes()
+
+
+def unshuffle_bytes(data, dtype, count):
+    dtype = np.dtype(dtype)
+    return np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, count).T.copy().view(dtype).reshape(count)
+
+
+def encode_chunk(columns):
+    """Encodes bar columns as a compressed blob. Check :func:`decode_chunk`."""
+
+    dateTimes = np.asarray(columns["datetime"], dtype="<i8")
+    # Datetimes are delta encoded since bars are usually evenly spaced.
+    parts = [shuffle_bytes(np.diff(dateTimes, prepend=np.int64(0)).astype("<i8"))]
+    for name in COLUMNS[1:]:
+        parts.append(shuffle_bytes(np.asarray(columns[name], dtype="<f8")))
+    return zlib.compress(b"".join(parts))
+
+
+def decode_chunk(data, count):
+    """Decodes a blob written by :func:`encode_chunk` into a dict with a numpy array for each column."""
+
+    data = zlib.decompress(data)
+    size = count * 8
+    if len(data) != size * len(COLUMNS):
+        raise Exception("Invalid chunk size")
+    ret = {"datetime": np.cumsum(unshuffle_bytes(data[:size], "<i8", count)).astype(np.int64)}
+    for i, name in enumerate(COLUMNS[1:]):
+        ret[name] = unshuffle_bytes(data[size * (i + 1):size * (i + 2)], "<f8", count).astype(np.float64)
+    return ret
+
+
+def merge_columns(columns1, columns2):
+    # Merges bar columns sorting them by datetime. On duplicate datetimes, values from columns2 win.
+    merged = dict((name, np.concatenate([columns1[name], columns2[name]])) for name in COLUMNS)
+    order = np.argsort(merged["datetime"], kind="mergesort")
+    dateTimes = merged["datetime"][order]
+    # Keep the last row for each datetime.
+    keep = order[np.append(np.diff(dateTimes) != 0, True)]
+    return dict((name, values[keep]) for name, values in merged.items())
+
+
+def empty_columns():
+    ret = dict((name, np.empty(0, dtype=np.float64)) for name in COLUMNS)
+    ret["datetime"] = np.empty(0, dtype=np.int64)
+    return ret
+
+
+def bars_to_columns(bars):
+    ret = {
+        "datetime": np.array([dataseries.datetime_to_nanoseconds(bar_.getDateTime()) for bar_ in bars], dtype=np.int64),
+        "adj_close": np.array([
+            np.nan if bar_.getAdjClose() is None else bar_.getAdjClose() for bar_ in bars
+        ], dtype=np.float64),
+    }
+    for name, getter in [("open", "getOpen"), ("high", "getHigh"), ("low", "getLow"), ("close", "getClose"),
+                         ("volume", "getVolume")]:
+        ret[name] = np.array([getattr(bar_, getter)() for bar_ in bars], dtype=np.float64)
+    return ret
+
+
+# SQLite DB that stores bars in compressed column blobs, one per instrument, frequency and day or month.
+# Timestamps are stored in UTC.
+class Database(dbfeed.Database):
+    """A SQLite database that stores bars in compressed columnar chunks.
+
+    :param dbFilePath: The path to the SQLite database. It gets created if it doesn't exist.
+    :type dbFilePath: string.
+    :param chunkSize: The time span for each chunk, either **CHUNK_DAY** or **CHUNK_MONTH**. Only used when the
+        database gets created.
+    :type chunkSize: string.
+
+    .. note::
+        * Days and months are in UTC.
+        * Use small chunks if bars are usually read for short periods, and large chunks for a smaller database file.
+    """
+
+    def __init__(self, dbFilePath, chunkSize=CHUNK_MONTH):
+        self.__instrumentIds = {}
+
+        # If the file doesn't exist, we'll create it and initialize it.
+        initialize = not os.path.exists(dbFilePath)
+        self.__connection = sqlite3.connect(dbFilePath)
+        self.__connection.isolation_level = None  # To do auto-commit
+        if initialize:
+            self.createSchema(chunkSize)
+        try:
+            self.__chunkSize = self.__getSetting("chunk_size")
+            version = self.__getSetting("version")
+        except sqlite3.OperationalError:
+            raise Exception("%s is not a chunked bar database" % dbFilePath)
+        if version != str(VERSION):
+            raise Exception("Unsupported version in %s" % dbFilePath)
+
+    def createSchema(self, chunkSize):
+        get_chunk_keys([], chunkSize)
+        self.__connection.execute(
+            "create table instrument ("
+            "instrument_id integer primary key autoincrement"
+            ", name text unique not null)")
+
+        self.__connection.execute(
+            "create table bar_chunk ("
+            "instrument_id integer references instrument (instrument_id)"
+            ", frequency integer not null"
+            ", chunk integer not null"
+            ", first_timestamp integer not null"
+            ", last_timestamp integer not null"
+            ", bar_count integer not null"
+            ", data blob not null"
+            ", primary key (instrument_id, frequency, chunk))")
+
+        self.__connection.execute("create table setting (name text primary key, value text not null)")
+        self.__connection.executemany(
+            "insert into setting (name, value) values (?, ?)", [("version", str(VERSION)), ("chunk_size", chunkSize)]
+        )
+
+    def __getSetting(self, name):
+        row = self.__connection.execute("select value from setting where name = ?", [name]).fetchone()
+        return row[0] if row is not None else None
+
+    def getChunkSize(self):
+        return self.__chunkSize
+
+    def __getInstrumentId(self, instrument, create):
+        ret = self.__instrumentIds.get(instrument)
+        if ret is None:
+            row = self.__connection.execute(
+                "select instrument_id from instrument where name = ?", [instrument]
+            ).fetchone()
+            if row is not None:
+                ret = row[0]
+            elif create:
+                ret = self.__connection.execute("insert into instrument (name) values (?)", [instrument]).lastrowid
+            if ret is not None:
+                self.__instrumentIds[instrument] = ret
+        return ret
+
+    def __loadChunk(self, instrumentId, frequency, chunk):
+        row = self.__connection.execute(
+            "select data, bar_count from bar_chunk where instrument_id = ? and frequency = ? and chunk = ?",
+            [instrumentId, frequency, chunk]
+        ).fetchone()
+        return decode_chunk(row[0], row[1]) if row is not None else None
+
+    def __writeColumns(self, instrument, frequency, columns):
+        instrumentId = self.__getInstrumentId(sqlitefeed.normalize_instrument(instrument), True)
+        chunkKeys = get_chunk_keys(columns["datetime"], self.__chunkSize)
+        rows = []
+        for chunk in np.unique(chunkKeys).tolist():
+            mask = chunkKeys == chunk
+            chunkColumns = dict((name, np.asarray(columns[name])[mask]) for name in COLUMNS)
+            # Bars being written replace the ones already stored for the same datetime.
+            existing = self.__loadChunk(instrumentId, frequency, chunk)
+            chunkColumns = merge_columns(existing if existing is not None else empty_columns(), chunkColumns)
+            dateTimes = chunkColumns["datetime"]
+            rows.append((
+                instrumentId, frequency, chunk, int(dateTimes[0]), int(dateTimes[-1]), len(dateTimes),
+                sqlite3.Binary(encode_chunk(chunkColumns))
+            ))
+        self.__connection.executemany(
+            "insert or replace into bar_chunk"
+            " (instrument_id, frequency, chunk, first_timestamp, last_timestamp, bar_count, data)"
+            " values (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+    def __writeInTransaction(self, instrumentToColumns, frequency):
+        self.__connection.execute("begin")
+        try:
+            for instrument, columns in instrumentToColumns.items():
+                self.__writeColumns(instrument, frequency, columns)
+            self.__connection.execute("commit")
+        except Exception:
+            self.__connection.execute("rollback")
+            # Instruments added in this transaction are gone.
+            self.__instrumentIds = {}
+            raise
+
+    def addBarColumns(self, instrument, frequency, columns):
+        """Adds or updates bars for an instrument from a dict with a numpy array for each column, like the one returned
+        by :meth:`getBarColumns`."""
+
+        for name in COLUMNS:
+            if len(columns[name]) != len(columns["datetime"]):
+                raise Exception("All columns must have the same length")
+        if len(columns["datetime"]):
+            self.__writeInTransaction({instrument: columns}, frequency)
+
+    def addBar(self, instrument, bar, frequency):
+        self.addBarSequence([(instrument, bar)], frequency)
+
+    def addBarSequence(self, instrumentBars, frequency, batchSize=sqlitefeed.DEFAULT_BATCH_SIZE):
+        """Adds or updates many bars, writing them in batches using one transaction per batch.
+
+        :param instrumentBars: An iterable of (instrument, bar) tuples.
+        :param frequency: The bars frequency. Valid values defined in :class:`pyalgotrade.bar.Frequency`.
+        :param batchSize: The number of bars to write in each transaction. Chunks touched by a batch get rewritten,
+            so large batches are much faster.
+        :type batchSize: int.
+        :rtype: The number of bars written.
+        """
+
+        if batchSize < 1:
+            raise Exception("Invalid batch size")
+
+        ret = 0
+        pending = {}
+        count = 0
+        for instrument, bar_ in instrumentBars:
+            pending.setdefault(instrument, []).append(bar_)
+            count += 1
+            if count == batchSize:
+                self.__writeInTransaction(
+                    dict((key, bars_to_columns(bars)) for key, bars in pending.items()), frequency
+                )
+                ret += count
+                pending = {}
+                count = 0
+        if count:
+            self.__writeInTransaction(dict((key, bars_to_columns(bars)) for key, bars in pending.items()), frequency)
+            ret += count
+        return ret
+
+    def getBarColumns(self, instrument, frequency, fromDateTime=None, toDateTime=None):
+        """Returns a dict with numpy arrays for "datetime" (int64 nanoseconds since the epoch), "open", "high", "low",
+        "close", "volume" and "adj_close" (NaN if missing)."""
+
+        instrumentId = self.__getInstrumentId(sqlitefeed.normalize_instrument(instrument), False)
+        if instrumentId is None:
+            return empty_columns()
+
+        sql = "select data, bar_count from bar_chunk where instrument_id = ? and frequency = ?"
+        args = [instrumentId, frequency]
+        fromNanos = None
+        toNanos = None
+        if fromDateTime is not None:
+            fromNanos = dataseries.datetime_to_nanoseconds(fromDateTime)
+            sql += " and last_timestamp >= ?"
+            args.append(fromNanos)
+        if toDateTime is not None:
+            toNanos = dataseries.datetime_to_nanoseconds(toDateTime)
+            sql += " and first_timestamp <= ?"
+            args.append(toNanos)
+        sql += " order by chunk asc"
+
+        chunks = [decode_chunk(data, count) for data, count in self.__connection.execute(sql, args)]
+        if len(chunks) == 0:
+            return empty_columns()
+        ret = dict((name, np.concatenate([chunk[name] for chunk in chunks])) for name in COLUMNS)
+
+        # Chunks at the edges may hold bars outside the range.
+        mask = np.ones(len(ret["datetime"]), dtype=bool)
+        if fromNanos is not None:
+            mask &= ret["datetime"] >= fromNanos
+        if toNanos is not None:
+            mask &= ret["datetime"] <= toNanos
+        if not mask.all():
+            ret = dict((name, values[mask]) for name, values in ret.items())
+        return ret
+
+    def getBars(self, instrument, frequency, timezone=None, fromDateTime=None, toDateTime=None):
+        columns = self.getBarColumns(instrument, frequency, fromDateTime, toDateTime)
+        # Bars are localized to UTC if no timezone is set, just like in sqlitefeed.Database.getBars.
+        meta = {
+            "timezone": timezone.zone if timezone else "UTC",
+            "frequency": frequency,
+            "extra": [],
+        }
+        return barcache.columns_to_bars(columns, meta)
+
+    def disconnect(self):
+        self.__connection.close()
+        self.__connection = None
+
+
+class Feed(columnarbf.BarFeed):
+    """A non real-time BarFeed that loads bars from a :class:`Database`.
+    Chunks are decoded straight into numpy arrays, and bars are only built when dispatched.
+
+    :param dbFilePath: The path to the SQLite database.
+    :type dbFilePath: string.
+    :param frequency: The bars frequency. Valid values defined in :class:`pyalgotrade.bar.Frequency`.
+    :param timezone: The timezone used to build bar datetimes. If None, datetimes are naive (UTC).
+    :type timezone: A pytz timezone.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded
+        from the opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    """
+
+    def __init__(self, dbFilePath, frequency, timezone=None, maxLen=None):
+        super(Feed, self).__init__(frequency, timezone, maxLen)
+        self.__db = Database(dbFilePath)
+
+    def getDatabase(self):
+        return self.__db
+
+    def loadBars(self, instrument, fromDateTime=None, toDateTime=None):
+        columns = self.__db.getBarColumns(instrument, self.getFrequency(), fromDateTime, toDateTime)
+        adjClose = columns["adj_close"]
+        if len(adjClose) and np.isnan(adjClose).all():
+            adjClose = None
+        self.addBarsFromArrays(
+            instrument, columns["datetime"], columns["open"], columns["high"], columns["low"], columns["close"],
+            columns["volume"], adjClose
+        )
+
+
+def migrate(srcDbFilePath, dstDbFilePath, chunkSize=CHUNK_MONTH):
+    """Copies all the bars from a :class:`pyalgotrade.barfeed.sqlitefeed.Database` into a :class:`Database`.
+
+    :param srcDbFilePath: The path to the existing SQLite database.
+    :type srcDbFilePath: string.
+    :param dstDbFilePath: The path to the chunked SQLite database. It gets created if it doesn't exist.
+    :type dstDbFilePath: string.
+    :param chunkSize: The time span for each chunk, either **CHUNK_DAY** or **CHUNK_MONTH**.
+    :type chunkSize: string.
+    :rtype: The number of bars copied.
+    """
+
+    if not os.path.exists(srcDbFilePath):
+        raise Exception("%s doesn't exist" % srcDbFilePath)
+
+    ret = 0
+    src = sqlitefeed.Database(srcDbFilePath)
+    dst = Database(dstDbFilePath, chunkSize)
+    try:
+        for instrument, frequency in src.getInstrumentFrequencies():
+            columns = src.getBarColumns(instrument, frequency)
+            dst.addBarColumns(instrument, frequency, columns)
+            logger.info("%d bars copied for %s (frequency %s)" % (len(columns["datetime"]), instrument, frequency))
+            ret += len(columns["datetime"])
+    finally:
+        src.disconnect()
+        dst.disconnect()
+    return ret
@@ -18,13 +18,38 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import csvfeed
 from pyalgotrade.barfeed import dbfeed
 from pyalgotrade.barfeed import membf
 from pyalgotrade import bar
+from pyalgotrade import barfeed
 from pyalgotrade.utils import dt
+import pyalgotrade.logger
+
+import numpy as np
 
 import sqlite3
 import os
+import time
+
+logger = pyalgotrade.logger.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_FETCH_SIZE = 1000
+
+# UPSERT is available since SQLite 3.24. Before that INSERT OR REPLACE has the same effect on the bar table.
+if sqlite3.sqlite_version_info >= (3, 24, 0):
+    UPSERT_BAR_SQL = "insert into bar" \
+        " (instrument_id, frequency, timestamp, open, high, low, close, volume, adj_close)" \
+        " values (?, ?, ?, ?, ?, ?, ?, ?, ?)" \
+        " on conflict (instrument_id, frequency, timestamp) do update set open = excluded.open" \
+        ", high = excluded.high, low = excluded.low, close = excluded.close, volume = excluded.volume" \
+        ", adj_close = excluded.adj_close"
+else:
+    UPSERT_BAR_SQL = "insert or replace into bar" \
+        " (instrument_id, frequency, timestamp, open, high, low, close, volume, adj_close)" \
+        " values (?, ?, ?, ?, ?, ?, ?, ?, ?)"
 
 
 def normalize_instrument(instrument):
@@ -93,22 +118,93 @@ class Database(dbfeed.Database):
             ", adj_close real"
             ", primary key (instrument_id, frequency, timestamp))")
 
-    def addBar(self, instrument, bar, frequency):
-        instrument = normalize_instrument(instrument)
-        instrumentId = self.__getOrCreateInstrument(instrument)
+    def __getBarRow(self, instrument, bar, frequency):
+        instrumentId = self.__getOrCreateInstrument(normalize_instrument(instrument))
         timeStamp = dt.datetime_to_timestamp(bar.getDateTime())
+        return (
+            instrumentId, frequency, timeStamp, bar.getOpen(), bar.getHigh(), bar.getLow(), bar.getClose(),
+            bar.getVolume(), bar.getAdjClose()
+        )
+
+    def addBar(self, instrument, bar, frequency):
+        self.__connection.execute(UPSERT_BAR_SQL, self.__getBarRow(instrument, bar, frequency))
+
+    def __setPragma(self, name, value):
+        ret = self.__connection.execute("pragma %s" % name).fetchone()[0]
+        if value is not None:
+            self.__connection.execute("pragma %s = %s" % (name, value))
+        return ret
 
+    def __writeBatch(self, instrumentBars, frequency):
+        self.__connection.execute("begin")
         try:
-            sql = "insert into bar (instrument_id, frequency, timestamp, open, high, low, close, volume, adj_close) values (?, ?, ?, ?, ?, ?, ?, ?, ?)"
-            params = [instrumentId, frequency, timeStamp, bar.getOpen(), bar.getHigh(), bar.getLow(), bar.getClose(), bar.getVolume(), bar.getAdjClose()]
-            self.__connection.execute(sql, params)
-        except sqlite3.IntegrityError:
-            sql = "update bar set open = ?, high = ?, low = ?, close = ?, volume = ?, adj_close = ?" \
-                " where instrument_id = ? and frequency = ? and timestamp = ?"
-            params = [bar.getOpen(), bar.getHigh(), bar.getLow(), bar.getClose(), bar.getVolume(), bar.getAdjClose(), instrumentId, frequency, timeStamp]
-            self.__connection.execute(sql, params)
+            # New instruments are added in the same transaction as their bars.
+            rows = [self.__getBarRow(instrument, bar_, frequency) for instrument, bar_ in instrumentBars]
+            self.__connection.executemany(UPSERT_BAR_SQL, rows)
+            self.__connection.execute("commit")
+        except Exception:
+            self.__connection.execute("rollback")
+            # Instruments added in this transaction are gone.
+            self.__instrumentIds = {}
+            raise
 
-    def getBars(self, instrument, frequency, timezone=None, fromDateTime=None, toDateTime=None):
+    def addBarSequence(
+        self, instrumentBars, frequency, batchSize=DEFAULT_BATCH_SIZE, journalMode=None, synchronous=None
+    ):
+        """Adds or updates many bars, writing them in batches using one transaction per batch.
+
+        :param instrumentBars: An iterable of (instrument, bar) tuples.
+        :param frequency: The bars frequency. Valid values defined in :class:`pyalgotrade.bar.Frequency`.
+        :param batchSize: The number of bars to write in each transaction.
+        :type batchSize: int.
+        :param journalMode: The journal_mode pragma to use during the import, for example "WAL", "MEMORY" or "OFF".
+            If None, it is left unchanged.
+        :type journalMode: string.
+        :param synchronous: The synchronous pragma to use during the import, for example "NORMAL" or "OFF".
+            If None, it is left unchanged.
+        :type synchronous: string.
+        :rtype: The number of bars written.
+
+        .. note::
+            * Pragmas are restored once the import finishes. Using "OFF" for any of them is faster, but the database
+              may get corrupted if the process crashes during the import.
+            * If a batch fails, bars written in previous batches are kept. Instruments are added in the same transaction
+              as their bars, so they are only kept if their batch is written.
+        """
+
+        if batchSize < 1:
+            raise Exception("Invalid batch size")
+
+        prevJournalMode = self.__setPragma("journal_mode", journalMode)
+        prevSynchronous = self.__setPragma("synchronous", synchronous)
+        ret = 0
+        started = time.time()
+        try:
+            batch = []
+            for instrument, bar_ in instrumentBars:
+                batch.append((instrument, bar_))
+                if len(batch) == batchSize:
+                    self.__writeBatch(batch, frequency)
+                    ret += len(batch)
+                    batch = []
+            if len(batch):
+                self.__writeBatch(batch, frequency)
+                ret += len(batch)
+        finally:
+            self.__setPragma("synchronous", prevSynchronous)
+            self.__setPragma("journal_mode", prevJournalMode)
+
+        elapsed = time.time() - started
+        logger.info("%d bars written in %.2f seconds (%.0f bars/second)" % (ret, elapsed, ret / max(elapsed, 1e-6)))
+        return ret
+
+    def addBarsFromFeed(self, feed, batchSize=DEFAULT_BATCH_SIZE, journalMode=None, synchronous=None):
+        """Adds or updates all the bars from a feed. Check :meth:`addBarSequence`."""
+        return self.addBarSequence(
+            dbfeed.iter_feed_bars(feed), feed.getFrequency(), batchSize, journalMode, synchronous
+        )
+
+    def __executeGetBars(self, instrument, frequency, fromDateTime, toDateTime):
         instrument = normalize_instrument(instrument)
         sql = "select bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume, bar.adj_close, bar.frequency" \
             " from bar join instrument on (bar.instrument_id = instrument.instrument_id)" \
@@ -125,6 +221,10 @@ class Database(dbfeed.Database):
         sql += " order by bar.timestamp asc"
         cursor = self.__connection.cursor()
         cursor.execute(sql, args)
+        return cursor
+
+    def getBars(self, instrument, frequency, timezone=None, fromDateTime=None, toDateTime=None):
+        cursor = self.__executeGetBars(instrument, frequency, fromDateTime, toDateTime)
         ret = []
         for row in cursor:
             dateTime = dt.timestamp_to_datetime(row[0])
@@ -134,15 +234,91 @@ class Database(dbfeed.Database):
         cursor.close()
         return ret
 
+    def getBarColumns(self, instrument, frequency, fromDateTime=None, toDateTime=None):
+        """Same as getBars, but returns a dict with numpy arrays for "datetime" (int64 nanoseconds since the epoch),
+        "open", "high", "low", "close", "volume" and "adj_close" (NaN if missing)."""
+
+        cursor = self.__executeGetBars(instrument, frequency, fromDateTime, toDateTime)
+        rows = cursor.fetchall()
+        cursor.close()
+
+        columns = list(zip(*rows)) if len(rows) else [()] * 8
+        ret = {
+            "datetime": np.round(np.array(columns[0], dtype=np.float64) * 1e6).astype(np.int64) * 1000,
+            "adj_close": np.array([np.nan if value is None else value for value in columns[6]], dtype=np.float64),
+        }
+        for i, name in enumerate(["open", "high", "low", "close", "volume"]):
+            ret[name] = np.array(columns[i + 1], dtype=np.float64)
+        return ret
+
+    def getInstrumentFrequencies(self):
+        """Returns a list of (instrument, frequency) tuples for which there are bars."""
+        cursor = self.__connection.execute(
+            "select distinct instrument.name, bar.frequency"
+            " from bar join instrument on (bar.instrument_id = instrument.instrument_id)"
+            " order by instrument.name, bar.frequency"
+        )
+        ret = [(row[0], row[1]) for row in cursor]
+        cursor.close()
+        return ret
+
+    def iterBars(self, instruments, frequency, timezone=None, fromDateTime=None, toDateTime=None,
+                 fetchSize=DEFAULT_FETCH_SIZE):
+        """Yields (instrument, bar) tuples for many instruments, sorted by datetime, using a single query.
+        Rows are fetched in pages of fetchSize rows, so only one page is held in memory at any time."""
+
+        # Bars are yielded using the instrument names that were requested.
+        names = dict((normalize_instrument(instrument), instrument) for instrument in instruments)
+        if len(names) == 0:
+            return
+
+        sql = "select instrument.name, bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume" \
+            ", bar.adj_close, bar.frequency" \
+            " from bar join instrument on (bar.instrument_id = instrument.instrument_id)" \
+            " where instrument.name in (%s) and bar.frequency = ?" % ", ".join(["?"] * len(names))
+        args = list(names.keys()) + [frequency]
+        if fromDateTime is not None:
+            sql += " and bar.timestamp >= ?"
+            args.append(dt.datetime_to_timestamp(fromDateTime))
+        if toDateTime is not None:
+            sql += " and bar.timestamp <= ?"
+            args.append(dt.datetime_to_timestamp(toDateTime))
+        sql += " order by bar.timestamp asc, instrument.name asc"
+
+        cursor = self.__connection.cursor()
+        try:
+            cursor.execute(sql, args)
+            rows = cursor.fetchmany(fetchSize)
+            while len(rows):
+                for row in rows:
+                    dateTime = dt.timestamp_to_datetime(row[1])
+                    if timezone:
+                        dateTime = dt.localize(dateTime, timezone)
+                    yield names[row[0]], bar.BasicBar(dateTime, row[2], row[3], row[4], row[5], row[6], row[7], row[8])
+                rows = cursor.fetchmany(fetchSize)
+        finally:
+            cursor.close()
+
     def disconnect(self):
         self.__connection.close()
         self.__connection = None
 
 
+def load_bar_columns(args):
+    # Entry point for worker processes.
+    dbFilePath, instrument, frequency, fromDateTime, toDateTime = args
+    db = Database(dbFilePath)
+    try:
+        return db.getBarColumns(instrument, frequency, fromDateTime, toDateTime)
+    finally:
+        db.disconnect()
+
+
 class Feed(membf.BarFeed):
     def __init__(self, dbFilePath, frequency, maxLen=None):
         super(Feed, self).__init__(frequency, maxLen)
 
+        self.__dbFilePath = dbFilePath
         self.__db = Database(dbFilePath)
 
     def barsHaveAdjClose(self):
@@ -154,3 +330,143 @@ class Feed(membf.BarFeed):
     def loadBars(self, instrument, timezone=None, fromDateTime=None, toDateTime=None):
         bars = self.__db.getBars(instrument, self.getFrequency(), timezone, fromDateTime, toDateTime)
         self.addBarsFromSequence(instrument, bars)
+
+    def loadBarsForInstruments(self, instruments, timezone=None, fromDateTime=None, toDateTime=None, processes=None):
+        """Loads bars for many instruments, running the queries in parallel in a pool of worker processes.
+        Bars are sent back from the workers as numpy arrays, one per column."""
+
+        # Columns are turned into bars using the timezone name, so only pytz timezones can be used. Bars are loaded
+        # one at a time with other timezones.
+        if timezone is not None and getattr(timezone, "zone", None) is None:
+            for instrument in instruments:
+                self.loadBars(instrument, timezone, fromDateTime, toDateTime)
+            return
+
+        tasks = [
+            (self.__dbFilePath, instrument, self.getFrequency(), fromDateTime, toDateTime) for instrument in instruments
+        ]
+        # Bars are localized to UTC if no timezone is set, just like in Database.getBars.
+        meta = {
+            "timezone": timezone.zone if timezone else "UTC",
+            "frequency": self.getFrequency(),
+            "extra": [],
+        }
+        for instrument, columns in zip(instruments, csvfeed.run_tasks(load_bar_columns, tasks, processes)):
+            self.addBarsFromSequence(instrument, barcache.columns_to_bars(columns, meta))
+
+
+class StreamingFeed(barfeed.BaseBarFeed):
+    """A non real-time BarFeed that reads bars from a SQLite database as they get dispatched, instead of loading them
+    into memory upfront. Bars for all the instruments are read using a single query sorted by datetime.
+
+    :param dbFilePath: The path to the SQLite database.
+    :type dbFilePath: string.
+    :param frequency: The bars frequency. Valid values defined in :class:`pyalgotrade.bar.Frequency`.
+    :param instruments: The instruments to read bars for.
+    :type instruments: list.
+    :param timezone: The timezone used to localize bars. If None, bars are localized to UTC.
+    :type timezone: A pytz timezone.
+    :param fromDateTime: If not None, bars before this datetime are skipped.
+    :type fromDateTime: datetime.datetime.
+    :param toDateTime: If not None, bars after this datetime are skipped.
+    :type toDateTime: datetime.datetime.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded
+        from the opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    """
+
+    def __init__(self, dbFilePath, frequency, instruments, timezone=None, fromDateTime=None, toDateTime=None,
+                 maxLen=None):
+        super(StreamingFeed, self).__init__(frequency, maxLen)
+
+        self.__db = Database(dbFilePath)
+        self.__instruments = list(instruments)
+        self.__timezone = timezone
+        self.__fromDateTime = fromDateTime
+        self.__toDateTime = toDateTime
+        self.__fetchSize = DEFAULT_FETCH_SIZE
+        self.__currDateTime = None
+        # The (instrument, bar) iterator and the next item, with one item lookahead to group bars by datetime.
+        # Opened on demand.
+        self.__rows = None
+        self.__nextItem = None
+
+        for instrument in self.__instruments:
+            self.registerInstrument(instrument)
+
+    def reset(self):
+        self.__closeRows()
+        self.__currDateTime = None
+        super(StreamingFeed, self).reset()
+
+    def getDatabase(self):
+        return self.__db
+
+    def setFetchSize(self, fetchSize):
+        """Sets the number of rows to fetch from the database at a time."""
+        if fetchSize < 1:
+            raise Exception("Invalid fetch size")
+        self.__fetchSize = fetchSize
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def barsHaveAdjClose(self):
+        return True
+
+    def start(self):
+        super(StreamingFeed, self).start()
+
+    def stop(self):
+        self.__closeRows()
+        # No more bars are returned once stopped, unless reset gets called.
+        self.__rows = iter([])
+
+    def join(self):
+        pass
+
+    def __closeRows(self):
+        if self.__rows is not None and hasattr(self.__rows, "close"):
+            self.__rows.close()
+        self.__rows = None
+        self.__nextItem = None
+
+    def __openRows(self):
+        if self.__rows is None:
+            self.__rows = self.__db.iterBars(
+                self.__instruments, self.getFrequency(), self.__timezone, self.__fromDateTime, self.__toDateTime,
+                self.__fetchSize
+            )
+            self.__nextItem = next(self.__rows, None)
+
+    def eof(self):
+        self.__openRows()
+        return self.__nextItem is None
+
+    def peekDateTime(self):
+        self.__openRows()
+        ret = None
+        if self.__nextItem is not None:
+            ret = self.__nextItem[1].getDateTime()
+        return ret
+
+    def getNextBars(self):
+        self.__openRows()
+        if self.__nextItem is None:
+            return None
+
+        # Rows are sorted by datetime, so consume all the ones with the same datetime.
+        dateTime = self.__nextItem[1].getDateTime()
+        ret = {}
+        while self.__nextItem is not None and self.__nextItem[1].getDateTime() == dateTime:
+            instrument, bar_ = self.__nextItem
+            ret[instrument] = bar_
+            self.__nextItem = next(self.__rows, None)
+
+        self.__currDateTime = dateTime
+        return bar.Bars(ret)
+
+    def loadAll(self):
+        for dateTime, bars in self:
+            pass
@@ -24,6 +24,7 @@ from pyalgotrade.utils import dt
 from pyalgotrade import bar
 
 import datetime
+import json
 
 
 ######################################################################
@@ -68,6 +69,14 @@ class RowParser(csvfeed.RowParser):
         # It is expected for the first row to have the field names.
         return None
 
+    def getCacheKey(self):
+        if self.__barClass != bar.BasicBar:
+            return None
+        return json.dumps([
+            "yahoo", str(self.__dailyBarTime), self.__frequency, csvfeed.get_timezone_key(self.__timezone),
+            self.__sanitize
+        ])
+
     def getDelimiter(self):
         return ","
 
@@ -150,3 +159,26 @@ class Feed(csvfeed.BarFeed):
             self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars, self.__barClass
         )
         super(Feed, self).addBarsFromCSV(instrument, path, rowParser)
+
+    def addBarsFromCSVFiles(self, instrumentToPath, timezone=None, processes=None):
+        """Loads bars for many instruments, parsing the CSV files in parallel in a pool of worker processes.
+        The instruments get registered in the bar feed.
+
+        :param instrumentToPath: A dict that maps instruments to the path of their CSV file.
+        :type instrumentToPath: dict.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param processes: The number of worker processes. If None, the number of CPUs is used.
+        :type processes: int.
+        """
+
+        if isinstance(timezone, int):
+            raise Exception("timezone as an int parameter is not supported anymore. Please use a pytz timezone instead.")
+
+        if timezone is None:
+            timezone = self.__timezone
+
+        rowParser = RowParser(
+            self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars, self.__barClass
+        )
+        super(Feed, self).addBarsFromCSVFiles(instrumentToPath, rowParser, processes=processes)
@@ -500,6 +500,10 @@ class Broker(broker.Broker):
     def peekDateTime(self):
         return None
 
+    def peekDateTimes(self):
+        # This subject never dispatches events by itself.
+        return []
+
     def createMarketOrder(self, action, instrument, quantity, onClose=False):
         # In order to properly support market-on-close with intraday feeds I'd need to know about different
         # exchange/market trading hours and support specifying routing an order to a specific exchange/market.
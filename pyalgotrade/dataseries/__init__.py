@@ -19,15 +19,24 @@
 """
 
 import abc
+import datetime
+import numbers
 
+import numpy as np
 import six
 from six.moves import xrange
 
 from pyalgotrade import observer
 from pyalgotrade.utils import collections
+from pyalgotrade.utils import dt
 
 DEFAULT_MAX_LEN = 1024
 
+# The value used to store missing datetimes in int64 arrays. This matches numpy.datetime64('NaT').
+NAT = np.iinfo(np.int64).min
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
 
 def get_checked_max_len(maxLen):
     if maxLen is None:
@@ -145,3 +154,132 @@ class SequenceDataSeries(DataSeries):
 
     def getDateTimes(self):
         return self.__dateTimes.data()
+
+
+def datetime_to_nanoseconds(dateTime):
+    """Converts a :class:`datetime.datetime` to nanoseconds since the epoch. Naive datetimes are treated as UTC."""
+    if dateTime is None:
+        return NAT
+    if dt.datetime_is_naive(dateTime):
+        diff = dateTime.replace(tzinfo=None) - _EPOCH
+    else:
+        diff = dateTime - dt.epoch_utc
+    return ((diff.days * 86400 + diff.seconds) * 1000000 + diff.microseconds) * 1000
+
+
+def nanoseconds_to_datetime(nanoseconds, tzinfo=None):
+    """Converts nanoseconds since the epoch to a :class:`datetime.datetime`. If tzinfo is None a naive datetime is
+    returned."""
+    if nanoseconds == NAT:
+        return None
+    ret = _EPOCH + datetime.timedelta(microseconds=int(nanoseconds) // 1000)
+    if tzinfo is not None:
+        ret = dt.as_utc(ret).astimezone(tzinfo)
+    return ret
+
+
+class NumericDataSeries(DataSeries):
+    """A DataSeries that holds float values in a preallocated numpy.array, along with datetimes stored as int64
+    nanoseconds since the epoch.
+
+    :param maxLen: The maximum number of values to hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+
+    .. note::
+        * None values are stored as NaN, and NaN values are returned as None when accessed by position.
+        * Slices are returned as numpy.array views.
+    """
+
+    def __init__(self, maxLen=None):
+        super(NumericDataSeries, self).__init__()
+        maxLen = get_checked_max_len(maxLen)
+
+        self.__newValueEvent = observer.Event()
+        self.__values = collections.NumPyDeque(maxLen, np.float64)
+        self.__dateTimes = collections.NumPyDeque(maxLen, np.int64)
+        self.__lastDateTime = NAT
+        self.__tzinfo = None
+
+    def __len__(self):
+        return len(self.__values)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.__values.data()[key]
+        # numbers.Integral includes numpy integers, like the ones returned by argmax.
+        elif isinstance(key, numbers.Integral):
+            value = self.__values.data()[key]
+            if np.isnan(value):
+                return None
+            return float(value)
+        else:
+            raise TypeError("Invalid argument type")
+
+    def setMaxLen(self, maxLen):
+        """Sets the maximum number of values to hold and resizes accordingly if necessary."""
+        self.__values.resize(maxLen)
+        self.__dateTimes.resize(maxLen)
+
+    def getMaxLen(self):
+        """Returns the maximum number of values to hold."""
+        return self.__values.getMaxLen()
+
+    # Event handler receives:
+    # 1: Dataseries generating the event
+    # 2: The datetime for the new value
+    # 3: The new value
+    def getNewValueEvent(self):
+        return self.__newValueEvent
+
+    def getValueAbsolute(self, pos):
+        ret = None
+        if pos >= 0 and pos < len(self.__values):
+            ret = self[pos]
+        return ret
+
+    def append(self, value):
+        """Appends a value."""
+        self.appendWithDateTime(None, value)
+
+    def appendWithDateTime(self, dateTime, value):
+        """
+        Appends a value with an associated datetime.
+
+        .. note::
+            If dateTime is not None, it must be greater than the last one.
+        """
+
+        nanoseconds = datetime_to_nanoseconds(dateTime)
+        if dateTime is not None:
+            if self.__lastDateTime != NAT and self.__lastDateTime >= nanoseconds:
+                raise Exception("Invalid datetime. It must be bigger than that last one")
+            self.__tzinfo = dateTime.tzinfo
+        self.__lastDateTime = nanoseconds
+
+        self.__dateTimes.append(nanoseconds)
+        self.__values.append(np.nan if value is None else value)
+
+        self.getNewValueEvent().emit(self, dateTime, value)
+
+    def getDateTimes(self):
+        # Datetimes are rebuilt using the timezone of the last one appended.
+        return [nanoseconds_to_datetime(nanoseconds, self.__tzinfo) for nanoseconds in self.__dateTimes.data()]
+
+    def asarray(self):
+        """Returns a numpy.array view with the values. Missing values are NaN.
+
+        .. note::
+            The view is only valid until the next value is appended.
+        """
+        return self.__values.data()
+
+    def datetimesAsArray(self):
+        """Returns a numpy.array view with the datetimes as int64 nanoseconds since the epoch (UTC).
+        Missing datetimes are set to dataseries.NAT.
+
+        .. note::
+            The view is only valid until the next value is appended.
+        """
+        return self.__dateTimes.data()
@@ -30,23 +30,37 @@ class BarDataSeries(dataseries.SequenceDataSeries):
         Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
         opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
     :type maxLen: int.
+
+    .. note::
+        The dataseries for each column (open, close, etc.) are created the first time they are requested and filled in
+        using the bars held at that moment.
     """
 
     def __init__(self, maxLen=None):
         super(BarDataSeries, self).__init__(maxLen)
-        self.__openDS = dataseries.SequenceDataSeries(maxLen)
-        self.__closeDS = dataseries.SequenceDataSeries(maxLen)
-        self.__highDS = dataseries.SequenceDataSeries(maxLen)
-        self.__lowDS = dataseries.SequenceDataSeries(maxLen)
-        self.__volumeDS = dataseries.SequenceDataSeries(maxLen)
-        self.__adjCloseDS = dataseries.SequenceDataSeries(maxLen)
+        # Column name -> (dataseries, getter) for the columns that were requested so far.
+        self.__columnDS = {}
         self.__extraDS = {}
         self.__useAdjustedValues = False
 
+    def __getOrCreateColumnDS(self, name, getter):
+        ret = self.__columnDS.get(name)
+        if ret is None:
+            ds = dataseries.SequenceDataSeries(self.getMaxLen())
+            for dateTime, bar in zip(self.getDateTimes(), self[:]):
+                ds.appendWithDateTime(dateTime, getter(bar))
+            ret = (ds, getter)
+            self.__columnDS[name] = ret
+        return ret[0]
+
     def __getOrCreateExtraDS(self, name):
         ret = self.__extraDS.get(name)
         if ret is None:
             ret = dataseries.SequenceDataSeries(self.getMaxLen())
+            for dateTime, bar in zip(self.getDateTimes(), self[:]):
+                extraColumns = bar.getExtraColumns()
+                if name in extraColumns:
+                    ret.appendWithDateTime(dateTime, extraColumns[name])
             self.__extraDS[name] = ret
         return ret
 
@@ -63,48 +77,46 @@ class BarDataSeries(dataseries.SequenceDataSeries):
 
         super(BarDataSeries, self).appendWithDateTime(dateTime, bar)
 
-        self.__openDS.appendWithDateTime(dateTime, bar.getOpen())
-        self.__closeDS.appendWithDateTime(dateTime, bar.getClose())
-        self.__highDS.appendWithDateTime(dateTime, bar.getHigh())
-        self.__lowDS.appendWithDateTime(dateTime, bar.getLow())
-        self.__volumeDS.appendWithDateTime(dateTime, bar.getVolume())
-        self.__adjCloseDS.appendWithDateTime(dateTime, bar.getAdjClose())
+        for ds, getter in six.itervalues(self.__columnDS):
+            ds.appendWithDateTime(dateTime, getter(bar))
 
         # Process extra columns.
-        for name, value in six.iteritems(bar.getExtraColumns()):
-            extraDS = self.__getOrCreateExtraDS(name)
-            extraDS.appendWithDateTime(dateTime, value)
+        if len(self.__extraDS):
+            for name, value in six.iteritems(bar.getExtraColumns()):
+                extraDS = self.__extraDS.get(name)
+                if extraDS is not None:
+                    extraDS.appendWithDateTime(dateTime, value)
 
     def getOpenDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the open prices."""
-        return self.__openDS
+        return self.__getOrCreateColumnDS("open", lambda bar: bar.getOpen())
 
     def getCloseDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the close prices."""
-        return self.__closeDS
+        return self.__getOrCreateColumnDS("close", lambda bar: bar.getClose())
 
     def getHighDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the high prices."""
-        return self.__highDS
+        return self.__getOrCreateColumnDS("high", lambda bar: bar.getHigh())
 
     def getLowDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the low prices."""
-        return self.__lowDS
+        return self.__getOrCreateColumnDS("low", lambda bar: bar.getLow())
 
     def getVolumeDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the volume."""
-        return self.__volumeDS
+        return self.__getOrCreateColumnDS("volume", lambda bar: bar.getVolume())
 
     def getAdjCloseDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the adjusted close prices."""
-        return self.__adjCloseDS
+        return self.__getOrCreateColumnDS("adjClose", lambda bar: bar.getAdjClose())
 
     def getPriceDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the close or adjusted close prices."""
         if self.__useAdjustedValues:
-            return self.__adjCloseDS
+            return self.getAdjCloseDataSeries()
         else:
-            return self.__closeDS
+            return self.getCloseDataSeries()
 
     def getExtraDataSeries(self, name):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` for an extra column."""
@@ -18,19 +18,39 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import heapq
+
+import six
+
 from pyalgotrade import utils
 from pyalgotrade import observer
 from pyalgotrade import dispatchprio
 
 
+class Scheduling(object):
+    # All subjects are polled on every step.
+    LINEAR = 1
+    # Non-realtime subjects are kept in a min-heap keyed by their next datetime.
+    HEAP = 2
+    # The whole timeline is built up front, before dispatching any event. This is only possible if all subjects can
+    # tell the datetimes for all their events beforehand (peekDateTimes), like historical feeds do.
+    # If that is not the case, HEAP scheduling is used instead.
+    TIMELINE = 3
+
+
 # This class is responsible for dispatching events from multiple subjects, synchronizing them if necessary.
 class Dispatcher(object):
-    def __init__(self):
+    def __init__(self, scheduling=Scheduling.LINEAR):
         self.__subjects = []
         self.__stop = False
         self.__startEvent = observer.Event()
         self.__idleEvent = observer.Event()
         self.__currDateTime = None
+        self.__scheduling = None
+        self.__heap = []
+        self.__realtimeSubjects = []
+        self.__rebuildSchedule = True
+        self.setScheduling(scheduling)
 
     # Returns the current event datetime. It may be None for events from realtime subjects.
     def getCurrentDateTime(self):
@@ -48,6 +68,15 @@ class Dispatcher(object):
     def getSubjects(self):
         return self.__subjects
 
+    def getScheduling(self):
+        return self.__scheduling
+
+    def setScheduling(self, scheduling):
+        if scheduling not in (Scheduling.LINEAR, Scheduling.HEAP, Scheduling.TIMELINE):
+            raise Exception("Invalid scheduling mode")
+        self.__scheduling = scheduling
+        self.__rebuildSchedule = True
+
     def addSubject(self, subject):
         # Skip the subject if it was already added.
         if subject in self.__subjects:
@@ -65,6 +94,7 @@ class Dispatcher(object):
                 pos += 1
             self.__subjects.insert(pos, subject)
 
+        self.__rebuildSchedule = True
         subject.onDispatcherRegistered(self)
 
     # Return True if events were dispatched.
@@ -98,6 +128,125 @@ class Dispatcher(object):
                     eventsDispatched = True
         return eof, eventsDispatched
 
+    # Subjects that are not at eof and have a datetime for their next event go into the heap. Everything else is
+    # polled on every step, just like in linear mode, since realtime subjects (or subjects that are empty for now,
+    # like resampled feeds) may start generating events at any time.
+    def __buildSchedule(self):
+        self.__heap = []
+        self.__realtimeSubjects = []
+        for pos, subject in enumerate(self.__subjects):
+            dateTime = None if subject.eof() else subject.peekDateTime()
+            if dateTime is None:
+                self.__realtimeSubjects.append((pos, subject))
+            else:
+                self.__heap.append((dateTime, pos, subject))
+        heapq.heapify(self.__heap)
+        self.__rebuildSchedule = False
+
+    # Same as __dispatch but only non-realtime subjects with the lowest datetime are checked.
+    def __dispatchHeap(self):
+        if self.__rebuildSchedule:
+            self.__buildSchedule()
+
+        heap = self.__heap
+        eof = len(heap) == 0
+        eventsDispatched = False
+
+        # Realtime subjects are dispatched on every step, unless they have a datetime for their next event, in which
+        # case they get moved into the heap.
+        toDispatch = []
+        realtimeSubjects = []
+        for pos, subject in self.__realtimeSubjects:
+            if subject.eof():
+                realtimeSubjects.append((pos, subject))
+            else:
+                eof = False
+                dateTime = subject.peekDateTime()
+                if dateTime is None:
+                    realtimeSubjects.append((pos, subject))
+                    toDispatch.append((pos, subject))
+                else:
+                    heapq.heappush(heap, (dateTime, pos, subject))
+        self.__realtimeSubjects = realtimeSubjects
+
+        if not eof:
+            smallestDateTime = heap[0][0] if len(heap) else None
+            self.__currDateTime = smallestDateTime
+
+            # Pop all the non-realtime subjects that share the lowest datetime.
+            fired = []
+            while len(heap) and heap[0][0] == smallestDateTime:
+                _, pos, subject = heapq.heappop(heap)
+                fired.append((pos, subject))
+            toDispatch.extend(fired)
+
+            # Keep the dispatch priority ordering within the same datetime.
+            if len(fired) and len(toDispatch) > 1:
+                toDispatch.sort(key=lambda item: item[0])
+
+            for pos, subject in toDispatch:
+                if self.__dispatchSubject(subject, smallestDateTime):
+                    eventsDispatched = True
+
+            # Reschedule the non-realtime subjects that were dispatched.
+            for pos, subject in fired:
+                if not subject.eof():
+                    dateTime = subject.peekDateTime()
+                    if dateTime is None:
+                        self.__realtimeSubjects.append((pos, subject))
+                        self.__realtimeSubjects.sort(key=lambda item: item[0])
+                    else:
+                        heapq.heappush(heap, (dateTime, pos, subject))
+        return eof, eventsDispatched
+
+    # Returns a list of (datetime, subjects) tuples, one per dispatch step, or None if the timeline can't be
+    # determined up front.
+    def __buildTimeline(self):
+        subjectsDateTimes = []
+        for subject in self.__subjects:
+            dateTimes = subject.peekDateTimes()
+            if dateTimes is None:
+                return None
+            if len(dateTimes):
+                subjectsDateTimes.append((subject, dateTimes))
+
+        if len(subjectsDateTimes) == 0:
+            return []
+        elif len(subjectsDateTimes) == 1:
+            subject, dateTimes = subjectsDateTimes[0]
+            subjects = [subject]
+            return [(dateTime, subjects) for dateTime in dateTimes]
+
+        # A subject may have many events with the same datetime. Those get dispatched on consecutive steps, so the
+        # occurrence number is part of the key. Subjects are processed in dispatch priority order so that's the order
+        # they'll be in within each step.
+        steps = {}
+        for subject, dateTimes in subjectsDateTimes:
+            prevDateTime = None
+            occurrence = 0
+            for dateTime in dateTimes:
+                if dateTime == prevDateTime:
+                    occurrence += 1
+                else:
+                    occurrence = 0
+                    prevDateTime = dateTime
+                steps.setdefault((dateTime, occurrence), []).append(subject)
+        return [(key[0], subjects) for key, subjects in sorted(six.iteritems(steps), key=lambda item: item[0])]
+
+    def __runTimeline(self, timeline):
+        idleEvent = self.__idleEvent
+        for dateTime, subjects in timeline:
+            if self.__stop:
+                break
+
+            self.__currDateTime = dateTime
+            eventsDispatched = False
+            for subject in subjects:
+                if subject.dispatch() is True:
+                    eventsDispatched = True
+            if not eventsDispatched:
+                idleEvent.emit()
+
     def run(self):
         try:
             for subject in self.__subjects:
@@ -105,8 +254,21 @@ class Dispatcher(object):
 
             self.__startEvent.emit()
 
+            if self.__scheduling == Scheduling.TIMELINE:
+                timeline = self.__buildTimeline()
+                if timeline is not None:
+                    self.__runTimeline(timeline)
+                # Anything not covered by the timeline gets dispatched using the heap.
+                dispatchImpl = self.__dispatchHeap
+                self.__rebuildSchedule = True
+            elif self.__scheduling == Scheduling.HEAP:
+                dispatchImpl = self.__dispatchHeap
+                self.__rebuildSchedule = True
+            else:
+                dispatchImpl = self.__dispatch
+
             while not self.__stop:
-                eof, eventsDispatched = self.__dispatch()
+                eof, eventsDispatched = dispatchImpl()
                 if eof:
                     self.__stop = True
                 elif not eventsDispatched:
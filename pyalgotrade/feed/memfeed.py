@@ -56,6 +56,9 @@ class MemFeed(feed.BaseFeed):
             ret = self.__values[self.__nextIdx][0]
         return ret
 
+    def peekDateTimes(self):
+        return [dateTime for dateTime, _ in self.__values[self.__nextIdx:]]
+
     def createDataSeries(self, key, maxLen):
         return dataseries.SequenceDataSeries(maxLen)
 
@@ -107,6 +107,12 @@ class Subject(object):
         # Return None since this is a realtime subject.
         raise NotImplementedError()
 
+    def peekDateTimes(self):
+        # Return a sorted sequence with the datetimes for all the events left to dispatch, one per dispatch call.
+        # This is needed to build the timeline up front when the dispatcher is using Scheduling.TIMELINE.
+        # Return None if that can't be determined beforehand, for example, for realtime subjects.
+        return None
+
     def getDispatchPriority(self):
         # Returns a priority used to sort subjects within the dispatch queue.
         # The return value should never change once this subject is added to the dispatcher.
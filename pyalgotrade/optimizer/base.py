@@ -23,12 +23,59 @@ import threading
 import six
 
 
+class Transport(object):
+    """The transports used by servers and workers to talk to each other.
+
+    * **XMLRPC**: XML-RPC over HTTP.
+    * **TCP**: A binary protocol over persistent TCP connections. Faster, specially for short strategy executions.
+    """
+    XMLRPC = "xmlrpc"
+    TCP = "tcp"
+
+
 class Parameters(object):
     def __init__(self, *args, **kwargs):
         self.args = args
         self.kwargs = kwargs
 
 
+class Budget(object):
+    """Limits a strategy execution to the first bars, as a fraction of them. Search drivers put a budget before the
+    strategy parameters to backtest on a subset of the bars. Results for strategy executions with a budget don't
+    compete for the best result.
+
+    :param fraction: The fraction of the bars to use, between 0 and 1.
+    :type fraction: float.
+    """
+
+    def __init__(self, fraction):
+        assert 0 < fraction <= 1, "Invalid budget"
+        self.fraction = fraction
+
+    def getBarCount(self, totalBarCount):
+        return max(1, int(totalBarCount * self.fraction))
+
+    def __eq__(self, other):
+        return isinstance(other, Budget) and self.fraction == other.fraction
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.fraction)
+
+    def __repr__(self):
+        return "Budget(%s)" % self.fraction
+
+
+def split_budget(parameters):
+    # Returns the budget, or None, and the strategy parameters.
+    parameters = tuple(parameters)
+    if len(parameters) and isinstance(parameters[0], Budget):
+        return parameters[0], parameters[1:]
+    return None, parameters
+
+
 class ParameterSource(object):
     """
     Source for backtesting parameters. This class is thread safe.
@@ -68,6 +115,32 @@ class ParameterSource(object):
         with self.__lock:
             return self.__iter is None
 
+    def isAdaptive(self):
+        """
+        Returns True if parameters are generated based on the results so far. Parameters from adaptive sources are
+        handed out one at a time, instead of in batches, so that each one takes into account as many results as
+        possible. Adaptive sources may also return no parameters before reaching the end, while waiting for results.
+        """
+        return False
+
+    def onNewResult(self, result, parameters):
+        """
+        Called with the result of every strategy execution. Sources that generate parameters based on the results so
+        far, like the ones in :mod:`pyalgotrade.optimizer.search`, override this.
+
+        :param result: The result, or None if the strategy execution failed or was pruned.
+        :param parameters: The parameters that yield the given result.
+        :type parameters: Parameters
+        """
+        pass
+
+
+def get_parameter_source(strategyParameters):
+    # Strategy parameters can be an iterable with parameter tuples, or a ParameterSource, like a search driver.
+    if isinstance(strategyParameters, ParameterSource):
+        return strategyParameters
+    return ParameterSource(strategyParameters)
+
 
 class ResultSinc(object):
     """
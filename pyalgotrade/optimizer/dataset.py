@@ -0,0 +1,159 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import zlib
+
+import pyalgotrade.logger
+from pyalgotrade.optimizer import serialization
+
+
+logger = pyalgotrade.logger.getLogger(__name__)
+
+# The number of bars in each chunk. Since chunks are split by bars, appending bars to a dataset leaves all but the last
+# chunk unchanged.
+CHUNK_SIZE = 10000
+
+CHUNK_HASH_RE = re.compile("^[0-9a-f]{64}$")
+
+
+def get_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def iter_chunks(bars, chunkSize=CHUNK_SIZE):
+    # Yields the hash and the serialized bars for each chunk.
+    for begin in range(0, len(bars), chunkSize):
+        data = serialization.dumps(bars[begin:begin + chunkSize])
+        yield get_hash(data), data
+
+
+def get_dataset_hash(instruments, chunkHashes):
+    return get_hash("\n".join(list(instruments) + list(chunkHashes)).encode("utf-8"))
+
+
+def get_fingerprint(instruments, bars):
+    """Returns the hash that identifies a dataset. Same as the one in the manifest of a :class:`Dataset`."""
+    return get_dataset_hash(instruments, [chunkHash for chunkHash, _ in iter_chunks(bars)])
+
+
+class Dataset(object):
+    # Instruments and bars split in compressed chunks that are identified by the hash of their content.
+    # The manifest has the dataset hash, the instruments, and the hashes of the chunks in order.
+
+    def __init__(self, instruments, bars, chunkSize=CHUNK_SIZE):
+        assert chunkSize > 0, "Invalid chunk size"
+
+        instruments = list(instruments)
+        self.__chunks = {}
+        chunkHashes = []
+        for chunkHash, data in iter_chunks(bars, chunkSize):
+            self.__chunks[chunkHash] = zlib.compress(data)
+            chunkHashes.append(chunkHash)
+        datasetHash = get_dataset_hash(instruments, chunkHashes)
+        self.__manifest = {"hash": datasetHash, "instruments": instruments, "chunks": chunkHashes}
+
+    def getManifest(self):
+        return self.__manifest
+
+    def getChunk(self, chunkHash):
+        # Returns the compressed chunk.
+        ret = self.__chunks.get(chunkHash)
+        if ret is None:
+            raise Exception("Invalid chunk %s" % chunkHash)
+        return ret
+
+
+class Cache(object):
+    # Compressed chunks stored in a directory. Many processes can share the same directory.
+
+    def __init__(self, path):
+        self.__path = path
+        try:
+            os.makedirs(path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+
+    def __getChunkPath(self, chunkHash):
+        # The hash comes from the server, so check it before using it as a file name.
+        if CHUNK_HASH_RE.match(chunkHash) is None:
+            raise Exception("Invalid chunk hash %s" % chunkHash)
+        return os.path.join(self.__path, chunkHash + ".chunk")
+
+    def getChunk(self, chunkHash):
+        # Returns the compressed chunk, or None if it is not in the cache.
+        path = self.__getChunkPath(chunkHash)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def putChunk(self, chunkHash, compressed):
+        path = self.__getChunkPath(chunkHash)
+        # Write to a temporary file and rename it, so other processes never read a partial chunk.
+        fd, tmpPath = tempfile.mkstemp(dir=self.__path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressed)
+            os.rename(tmpPath, path)
+        except OSError:
+            os.remove(tmpPath)
+            # On Windows, rename fails if another process already stored the chunk.
+            if not os.path.exists(path):
+                raise
+
+    def __loadChunk(self, chunkHash, fetchChunk):
+        compressed = self.getChunk(chunkHash)
+        if compressed is not None:
+            data = zlib.decompress(compressed)
+            if get_hash(data) == chunkHash:
+                return data, False
+            logger.warning("Chunk %s in the cache is corrupt" % chunkHash)
+
+        compressed = fetchChunk(chunkHash)
+        data = zlib.decompress(compressed)
+        if get_hash(data) != chunkHash:
+            raise Exception("Chunk %s doesn't match its hash" % chunkHash)
+        self.putChunk(chunkHash, compressed)
+        return data, True
+
+    def load(self, manifest, fetchChunk):
+        """Returns the instruments and bars in the dataset, fetching only the chunks that are missing from the cache.
+
+        :param manifest: The dataset manifest.
+        :type manifest: dict.
+        :param fetchChunk: A function that receives a chunk hash and returns the compressed chunk.
+        """
+
+        bars = []
+        fetched = 0
+        for chunkHash in manifest["chunks"]:
+            data, wasFetched = self.__loadChunk(chunkHash, fetchChunk)
+            bars.extend(serialization.loads(data))
+            if wasFetched:
+                fetched += 1
+        logger.info("Dataset %s loaded. %d out of %d chunks fetched" % (
+            manifest["hash"], fetched, len(manifest["chunks"])
+        ))
+        return manifest["instruments"], bars
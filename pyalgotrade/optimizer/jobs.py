@@ -0,0 +1,376 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import collections
+import threading
+import time
+
+import pyalgotrade.logger
+from pyalgotrade.optimizer import base
+
+
+logger = pyalgotrade.logger.getLogger(__name__)
+
+# The number of seconds that, ideally, each job should take when using adaptive batch sizes.
+DEFAULT_TARGET_JOB_DURATION = 5
+# Weight given to the latest measurement when updating the time it takes a worker to run the strategy once.
+RUN_TIME_SMOOTHING = 0.5
+# Jobs are handed out again if workers don't report progress for this many seconds.
+DEFAULT_LEASE_TIMEOUT = 60
+# The max number of workers that run the same job at the same time, to finish off stragglers.
+MAX_JOB_COPIES = 2
+# Returned when reporting progress on a job that is no longer active, so the worker stops running it.
+JOB_CANCELLED = -1
+
+
+def load_bars(barFeed):
+    # Returns the registered instruments and a list with all the bars in the feed.
+    loadedBars = []
+    for dateTime, bars in barFeed:
+        loadedBars.append(bars)
+    return barFeed.getRegisteredInstruments(), loadedBars
+
+
+class AutoStopThread(threading.Thread):
+    def __init__(self, server):
+        super(AutoStopThread, self).__init__()
+        self.__server = server
+
+    def run(self):
+        while self.__server.jobsPending():
+            time.sleep(1)
+        self.__server.stop()
+
+
+class Job(object):
+    def __init__(self, strategyParameters, bestResult=None):
+        self.__strategyParameters = strategyParameters
+        self.__bestResult = bestResult
+        self.__bestParameters = None
+        self.__id = id(self)
+        self.__stolenCount = 0
+
+    def getId(self):
+        return self.__id
+
+    def getBestResult(self):
+        # The best result when the job was handed out. Used for pruning.
+        return self.__bestResult
+
+    def isEmpty(self):
+        # Empty jobs tell workers to wait and ask again, since parameters depend on results that are not in yet.
+        return len(self.__strategyParameters) == 0
+
+    def getNextParameters(self):
+        ret = None
+        if len(self.__strategyParameters):
+            ret = self.__strategyParameters.pop()
+        return ret
+
+    def setStolenCount(self, stolenCount):
+        # Parameters are popped from the back, so they get stolen from the front, which is the last to be processed.
+        newlyStolen = stolenCount - self.__stolenCount
+        if newlyStolen > 0:
+            del self.__strategyParameters[:newlyStolen]
+            self.__stolenCount = stolenCount
+
+    def cancel(self):
+        del self.__strategyParameters[:]
+
+
+class ActiveJob(object):
+    # Server side bookkeeping for a job that was handed out to a worker.
+
+    def __init__(self, job, parameters, workerName, copies=None):
+        self.job = job
+        self.parameters = parameters
+        self.workerName = workerName
+        self.startTime = time.time()
+        # Only moves when the worker finishes running a set of parameters, so stalled workers lose their lease even
+        # if they keep reporting.
+        self.lastProgressTime = self.startTime
+        self.processedCount = 0  # As reported by the worker.
+        self.stolenCount = 0  # Taken from the front of parameters.
+        # The ids of the jobs that run these same parameters. The first one to finish wins.
+        if copies is None:
+            copies = []
+        self.copies = copies
+        self.copies.append(job.getId())
+
+    def getUnstartedCount(self):
+        # The worker is probably running one more set of parameters than the ones reported.
+        return max(0, len(self.parameters) - self.stolenCount - self.processedCount - 1)
+
+    def getAssignedCount(self):
+        return len(self.parameters) - self.stolenCount
+
+    def getAssignedParameters(self):
+        return self.parameters[self.stolenCount:]
+
+
+class JobManager(object):
+    # Hands out jobs and collects their results. Shared by the different server implementations.
+    #
+    # If targetJobDuration is set, batch sizes adapt so that jobs take roughly that many seconds for each worker,
+    # using batchSize as the upper bound. In any case, batches shrink when parameters are about to run out, and once
+    # they do, idle workers steal the unstarted parameters from other workers' jobs. If there is nothing left to
+    # steal, idle workers get a copy of a job that is still running, and the first copy to finish wins.
+    #
+    # Jobs are leased. If a worker doesn't finish any parameters for leaseTimeout seconds, its job goes back to the
+    # queue.
+    #
+    # If resultCache is set, parameters that already have results for the dataset set with setDatasetHash are not
+    # handed out, and every result that workers push gets stored.
+    # This class is thread safe.
+
+    def __init__(
+        self, paramSource, resultSinc, batchSize, targetJobDuration=None, leaseTimeout=DEFAULT_LEASE_TIMEOUT,
+        resultCache=None
+    ):
+        assert batchSize > 0, "Invalid batch size"
+        assert targetJobDuration is None or targetJobDuration > 0, "Invalid target job duration"
+        assert leaseTimeout > 0, "Invalid lease timeout"
+
+        self.__batchSize = batchSize
+        self.__targetJobDuration = targetJobDuration
+        self.__leaseTimeout = leaseTimeout
+        self.__resultCache = resultCache
+        self.__datasetHash = None
+        self.__paramSource = paramSource
+        self.__resultSinc = resultSinc
+        # Parameters are read ahead to know when they're about to run out.
+        self.__pendingParams = collections.deque()
+        self.__activeJobs = {}
+        self.__runTimes = {}  # Worker name -> seconds it takes to run the strategy once.
+        self.__workerNames = set()
+        self.__lock = threading.Lock()
+        self.__bestResult = None
+
+    def __pushResult(self, result, parameters):
+        budget, _ = base.split_budget(parameters)
+        parameters = base.Parameters(*parameters)
+        self.__paramSource.onNewResult(result, parameters)
+        # Results on a subset of the bars don't compete with the rest.
+        if budget is None:
+            self.__resultSinc.push(result, parameters)
+
+    def __updateRunTime(self, workerName, elapsed, count):
+        if count <= 0:
+            return
+        runTime = elapsed / float(count)
+        previous = self.__runTimes.get(workerName)
+        if previous is not None:
+            runTime = RUN_TIME_SMOOTHING * runTime + (1 - RUN_TIME_SMOOTHING) * previous
+        self.__runTimes[workerName] = runTime
+
+    def __getRunTime(self, workerName):
+        ret = self.__runTimes.get(workerName)
+        # Workers that haven't finished anything yet are assumed to be as fast as the average.
+        if ret is None and len(self.__runTimes):
+            ret = sum(self.__runTimes.values()) / len(self.__runTimes)
+        return ret
+
+    def __getBatchSize(self, workerName):
+        # Parameters from adaptive sources depend on the results so far, so they're handed out one at a time and
+        # never read ahead.
+        if self.__paramSource.isAdaptive():
+            return 1
+
+        ret = self.__batchSize
+        if self.__targetJobDuration is not None:
+            runTime = self.__getRunTime(workerName)
+            if runTime is None:
+                # Nothing measured yet. Start with a single run to get an estimate.
+                ret = 1
+            elif runTime > 0:
+                ret = max(1, min(ret, int(self.__targetJobDuration / runTime)))
+
+        # Read ahead, so that by the time the source is exhausted there are enough parameters to split among workers.
+        workerCount = max(1, len(self.__workerNames))
+        readAhead = self.__batchSize * (workerCount + 1) - len(self.__pendingParams)
+        if readAhead > 0 and not self.__paramSource.eof():
+            self.__pendingParams.extend(self.__paramSource.getNext(readAhead))
+        # Shrink batches as the parameters run out, so that workers finish at about the same time.
+        if self.__paramSource.eof():
+            ret = min(ret, max(1, (len(self.__pendingParams) + workerCount - 1) // workerCount))
+        return ret
+
+    def __getParameters(self, count):
+        # Returns up to count parameters, answering the ones that are in the result cache.
+        ret = []
+        while len(ret) < count:
+            if len(self.__pendingParams) == 0:
+                if self.__paramSource.eof():
+                    break
+                readCount = self.__batchSize
+                if self.__paramSource.isAdaptive():
+                    readCount = count - len(ret)
+                params = self.__paramSource.getNext(readCount)
+                # Adaptive sources may have nothing to hand out until results come in.
+                if len(params) == 0:
+                    break
+                self.__pendingParams.extend(params)
+                continue
+
+            params = []
+            while len(ret) + len(params) < count and len(self.__pendingParams):
+                params.append(self.__pendingParams.popleft().args)
+            if self.__resultCache is not None:
+                cachedResults = self.__resultCache.getResults(self.__datasetHash, params)
+                for cachedParams, result in cachedResults.items():
+                    self.__pushResult(result, cachedParams)
+                params = [p for p in params if tuple(p) not in cachedResults]
+            ret.extend(params)
+        return ret
+
+    def __stealJob(self, workerName):
+        # Take half of the unstarted parameters from the job that has the most of them.
+        victim = None
+        for activeJob in self.__activeJobs.values():
+            if activeJob.workerName == workerName and workerName is not None:
+                continue
+            if victim is None or activeJob.getUnstartedCount() > victim.getUnstartedCount():
+                victim = activeJob
+        if victim is None:
+            return None
+        count = victim.getUnstartedCount() // 2
+        if count == 0:
+            return None
+        begin = victim.stolenCount
+        victim.stolenCount += count
+        logger.info("%s stole %d parameters from %s" % (workerName, count, victim.workerName))
+        return victim.parameters[begin:begin + count]
+
+    def __expireJobs(self):
+        now = time.time()
+        for activeJob in list(self.__activeJobs.values()):
+            if now - activeJob.lastProgressTime < self.__leaseTimeout:
+                continue
+            logger.warning("Job from %s expired" % activeJob.workerName)
+            self.__removeJob(activeJob)
+            # Unless other copies are still running, the parameters go back to the front of the queue.
+            if len(activeJob.copies) == 0:
+                self.__pendingParams.extendleft(
+                    base.Parameters(*params) for params in reversed(activeJob.getAssignedParameters())
+                )
+
+    def __removeJob(self, activeJob):
+        del self.__activeJobs[activeJob.job.getId()]
+        activeJob.copies.remove(activeJob.job.getId())
+
+    def __copyJob(self, workerName):
+        # Copy the job that has been running for the longest time, unless the worker is already running it.
+        ret = None
+        for activeJob in self.__activeJobs.values():
+            if len(activeJob.copies) >= MAX_JOB_COPIES:
+                continue
+            workerNames = [self.__activeJobs[jobId].workerName for jobId in activeJob.copies]
+            if workerName is not None and workerName in workerNames:
+                continue
+            if ret is None or activeJob.startTime < ret.startTime:
+                ret = activeJob
+        if ret is not None:
+            logger.info("%s got a copy of a job from %s" % (workerName, ret.workerName))
+        return ret
+
+    def getNextJob(self, workerName=None):
+        ret = None
+
+        with self.__lock:
+            self.__workerNames.add(workerName)
+            self.__expireJobs()
+
+            # Get the next set of parameters.
+            params = self.__getParameters(self.__getBatchSize(workerName))
+            if len(params) == 0:
+                params = self.__stealJob(workerName)
+
+            # Map the active job
+            bestResult = self.__resultSinc.getBest()[0]
+            if params:
+                ret = Job(params, bestResult)
+                self.__activeJobs[ret.getId()] = ActiveJob(ret, list(params), workerName)
+            else:
+                original = self.__copyJob(workerName)
+                if original is not None:
+                    params = original.getAssignedParameters()
+                    ret = Job(list(params), bestResult)
+                    self.__activeJobs[ret.getId()] = ActiveJob(ret, params, workerName, original.copies)
+                elif not self.__paramSource.eof():
+                    ret = Job([], bestResult)
+
+        return ret
+
+    def setDatasetHash(self, datasetHash):
+        # Identifies the bars in the result cache. Must be set before handing out jobs.
+        self.__datasetHash = datasetHash
+
+    def reportProgress(self, jobId, processedCount, workerName):
+        # Returns how many parameters, from the front of the job, were stolen by other workers so far, or
+        # JOB_CANCELLED if the job expired or another copy finished first.
+        # Reports that show progress renew the job's lease.
+        ret = JOB_CANCELLED
+        with self.__lock:
+            activeJob = self.__activeJobs.get(jobId)
+            if activeJob is not None:
+                if processedCount > activeJob.processedCount:
+                    activeJob.processedCount = processedCount
+                    activeJob.lastProgressTime = time.time()
+                ret = activeJob.stolenCount
+        return ret
+
+    def jobsPending(self):
+        with self.__lock:
+            self.__expireJobs()
+            jobsPending = not self.__paramSource.eof() or len(self.__pendingParams) > 0
+            activeJobs = len(self.__activeJobs) > 0
+
+        return jobsPending or activeJobs
+
+    def pushJobResults(self, jobId, result, parameters, workerName, allResults=None):
+        # Results are cached even if the job is no longer active, since they're still valid.
+        if self.__resultCache is not None and allResults is not None:
+            self.__resultCache.addResults(self.__datasetHash, allResults)
+
+        # Remove the job mapping.
+        with self.__lock:
+            activeJob = self.__activeJobs.get(jobId)
+            if activeJob is None:
+                # The job's results were already submitted, the job expired, or another copy finished first.
+                return
+            # Cancel the other copies.
+            for copyId in list(activeJob.copies):
+                self.__removeJob(self.__activeJobs[copyId])
+
+            self.__updateRunTime(activeJob.workerName, time.time() - activeJob.startTime, activeJob.getAssignedCount())
+            if allResults is None:
+                allResults = [(parameters, result)]
+            # The worker may have run parameters that were stolen before it found out. Those are pushed by the thief.
+            if activeJob.stolenCount:
+                assigned = [tuple(params) for params in activeJob.getAssignedParameters()]
+                allResults = [item for item in allResults if tuple(item[0]) in assigned]
+            for parameters, result in allResults:
+                isBest = result is not None and (self.__bestResult is None or result > self.__bestResult)
+                if isBest and base.split_budget(parameters)[0] is None:
+                    logger.info("Best result so far %s with parameters %s" % (result, parameters))
+                    self.__bestResult = result
+
+        for parameters, result in allResults:
+            self.__pushResult(result, parameters)
@@ -26,13 +26,22 @@ import socket
 import threading
 import time
 
+from six.moves import queue
+
+from pyalgotrade import barfeed
 from pyalgotrade.optimizer import base
+from pyalgotrade.optimizer import dataset
+from pyalgotrade.optimizer import jobs
 from pyalgotrade.optimizer import server
+from pyalgotrade.optimizer import sharedbars
 from pyalgotrade.optimizer import worker
-from pyalgotrade.optimizer import xmlrpcserver
 
 logger = logging.getLogger(__name__)
 
+# The strategy class and the bars used by forked workers. Set by the parent process right before forking, so workers
+# inherit them (copy-on-write) instead of getting a copy through a pipe or a socket.
+forked_state = {}
+
 
 class ServerThread(threading.Thread):
     def __init__(self, server):
@@ -43,23 +52,58 @@ class ServerThread(threading.Thread):
         self.__results = self.__server.serve()
 
 
-def worker_process(strategyClass, port, logLevel):
-    class Worker(worker.Worker):
+def worker_process(
+    strategyClass, port, logLevel, sharedBarsDescriptor=None, transport=base.Transport.TCP, pruner=None
+):
+    class Worker(worker.get_worker_class(transport)):
+        def getInstrumentsAndBars(self):
+            if sharedBarsDescriptor is None:
+                return super(Worker, self).getInstrumentsAndBars()
+            # Bars are read straight from shared memory instead of being downloaded from the server.
+            return sharedBarsDescriptor["instruments"], sharedbars.SharedBars(sharedBarsDescriptor)
+
         def runStrategy(self, barFeed, *args, **kwargs):
             strat = strategyClass(barFeed, *args, **kwargs)
-            strat.run()
-            return strat.getResult()
+            return self.runAndGetResult(strat)
 
     # Create a worker and run it.
     try:
         name = "worker-%s" % (os.getpid())
         w = Worker("localhost", port, name)
         w.getLogger().setLevel(logLevel)
+        w.setPruner(pruner)
         w.run()
     except Exception as e:
         w.getLogger().exception("Failed to run worker: %s" % (e))
 
 
+def fork_supported():
+    # Python 2 lacks multiprocessing.get_context, and some platforms (Windows) can't fork.
+    return hasattr(multiprocessing, "get_context") and "fork" in multiprocessing.get_all_start_methods()
+
+
+def forked_worker_init(logLevel):
+    strategyClass = forked_state["strategyClass"]
+
+    class Worker(worker.BaseWorker):
+        def runStrategy(self, barFeed, *args, **kwargs):
+            strat = strategyClass(barFeed, *args, **kwargs)
+            return self.runAndGetResult(strat)
+
+    w = Worker("worker-%s" % (os.getpid()))
+    w.getLogger().setLevel(logLevel)
+    w.setPruner(forked_state["pruner"])
+    forked_state["worker"] = w
+
+
+def forked_worker_run_job(parameters, bestResult):
+    # Returns the best result and parameters, and the (parameters, result) for every execution.
+    job = jobs.Job(parameters, bestResult)
+    return forked_state["worker"].runJob(
+        job, forked_state["barsFreq"], forked_state["instruments"], forked_state["bars"]
+    )
+
+
 def find_port():
     while True:
         ret = random.randint(1025, 65536)
@@ -81,7 +125,10 @@ def stop_process(p):
         p.join(timeout)
 
 
-def run_impl(strategyClass, barFeed, strategyParameters, batchSize, workerCount=None, logLevel=logging.ERROR, resultSinc=None):
+def run_impl(
+    strategyClass, barFeed, strategyParameters, batchSize, workerCount=None, logLevel=logging.ERROR, resultSinc=None,
+    useSharedMemory=True, transport=base.Transport.TCP, resultCache=None, pruner=None
+):
     if workerCount is None:
         workerCount = multiprocessing.cpu_count()
     assert workerCount > 0, "No workers"
@@ -94,13 +141,31 @@ def run_impl(strategyClass, barFeed, strategyParameters, batchSize, workerCount=
 
     # Build and start the server thread before the worker processes.
     # We'll manually stop the server once workers have finished.
-    paramSource = base.ParameterSource(strategyParameters)
+    paramSource = base.get_parameter_source(strategyParameters)
     if resultSinc is None:
         resultSinc = base.ResultSinc()
 
+    # Publish the bars in shared memory, if possible, so workers don't need to get a copy from the server.
+    sharedBarStore = None
+    sharedBarsDescriptor = None
+    if useSharedMemory and sharedbars.is_supported():
+        instruments, loadedBars = jobs.load_bars(barFeed)
+        sharedBarStore = sharedbars.publish(barFeed.getFrequency(), instruments, loadedBars)
+        if sharedBarStore is not None:
+            logger.info("Bars published in shared memory")
+            sharedBarsDescriptor = sharedBarStore.getDescriptor()
+            # The server needs the bars to identify them in the result cache.
+            if resultCache is None:
+                loadedBars = []
+        # The server iterates over the feed, so it gets the bars that were already loaded (if any are needed).
+        barFeed = barfeed.OptimizerBarFeed(barFeed.getFrequency(), instruments, loadedBars)
+
     # Create and start the server.
     logger.info("Starting server on port %s" % port)
-    srv = xmlrpcserver.Server(paramSource, resultSinc, barFeed, "localhost", port, autoStop=False, batchSize=batchSize)
+    srv = server.get_server_class(transport)(
+        paramSource, resultSinc, barFeed, "localhost", port, autoStop=False, batchSize=batchSize,
+        resultCache=resultCache
+    )
     serverThread = ServerThread(srv)
     serverThread.start()
     logger.info("Waiting for the server to be ready")
@@ -112,7 +177,7 @@ def run_impl(strategyClass, barFeed, strategyParameters, batchSize, workerCount=
         for i in range(workerCount):
             workers.append(multiprocessing.Process(
                 target=worker_process,
-                args=(strategyClass, port, logLevel))
+                args=(strategyClass, port, logLevel, sharedBarsDescriptor, transport, pruner))
             )
         # Start workers
         for process in workers:
@@ -131,6 +196,9 @@ def run_impl(strategyClass, barFeed, strategyParameters, batchSize, workerCount=
         srv.stop()
         serverThread.join()
 
+        if sharedBarStore is not None:
+            sharedBarStore.close()
+
         bestResult, bestParameters = resultSinc.getBest()
         if bestResult is not None:
             ret = server.Results(bestParameters.args, bestResult)
@@ -138,20 +206,148 @@ def run_impl(strategyClass, barFeed, strategyParameters, batchSize, workerCount=
     return ret
 
 
-def run(strategyClass, barFeed, strategyParameters, workerCount=None, logLevel=logging.ERROR, batchSize=200):
+def run_forked_impl(
+    strategyClass, barFeed, strategyParameters, batchSize, workerCount=None, logLevel=logging.ERROR, resultSinc=None,
+    resultCache=None, pruner=None
+):
+    if workerCount is None:
+        workerCount = multiprocessing.cpu_count()
+    assert workerCount > 0, "No workers"
+    assert batchSize > 0, "Invalid batch size"
+    if forked_state:
+        raise Exception("Forked workers are already running")
+
+    ret = None
+    paramSource = base.get_parameter_source(strategyParameters)
+    if resultSinc is None:
+        resultSinc = base.ResultSinc()
+
+    def push_result(result, parameters):
+        budget, _ = base.split_budget(parameters)
+        parameters = base.Parameters(*parameters)
+        paramSource.onNewResult(result, parameters)
+        # Results on a subset of the bars don't compete with the rest.
+        if budget is None:
+            resultSinc.push(result, parameters)
+
+    # Load the bars once, before forking, so workers inherit them.
+    logger.info("Loading bars")
+    instruments, loadedBars = jobs.load_bars(barFeed)
+    datasetHash = None
+    if resultCache is not None:
+        datasetHash = dataset.get_fingerprint(instruments, loadedBars)
+    forked_state.update({
+        "strategyClass": strategyClass,
+        "barsFreq": barFeed.getFrequency(),
+        "instruments": instruments,
+        "bars": loadedBars,
+        "pruner": pruner,
+    })
+
+    try:
+        logger.info("Starting %s workers" % workerCount)
+        pool = multiprocessing.get_context("fork").Pool(
+            workerCount, initializer=forked_worker_init, initargs=(logLevel,)
+        )
+        # forked_state is only needed in the parent until workers are forked. The pool may need to fork new workers
+        # if one dies, so it is cleared once all the jobs are done.
+        try:
+            # Batches are submitted as workers go, instead of using imap_unordered, because the pool consumes the
+            # whole iterable upfront and the parameter space may be huge.
+            results = queue.Queue()
+            maxPending = workerCount * 2
+            # Parameters from adaptive sources are handed out one at a time, as results come in.
+            if paramSource.isAdaptive():
+                batchSize = 1
+                maxPending = workerCount
+            pending = 0
+            eof = False
+            while pending or not eof:
+                while not eof and pending < maxPending:
+                    parameters = [p.args for p in paramSource.getNext(batchSize)]
+                    if len(parameters) == 0:
+                        # Adaptive sources may need pending results before handing out more parameters.
+                        eof = paramSource.eof() or pending == 0
+                        break
+                    # Parameters that have results in the cache don't need to run.
+                    if resultCache is not None and not eof:
+                        cachedResults = resultCache.getResults(datasetHash, parameters)
+                        for cachedParameters, result in cachedResults.items():
+                            push_result(result, cachedParameters)
+                        parameters = [p for p in parameters if p not in cachedResults]
+                    if len(parameters):
+                        pool.apply_async(
+                            forked_worker_run_job, (parameters, resultSinc.getBest()[0]), callback=results.put,
+                            error_callback=results.put
+                        )
+                        pending += 1
+                if pending:
+                    result = results.get()
+                    pending -= 1
+                    if isinstance(result, Exception):
+                        raise result
+                    _, _, allResults = result
+                    if resultCache is not None:
+                        resultCache.addResults(datasetHash, allResults)
+                    for parameters, result in allResults:
+                        push_result(result, parameters)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        forked_state.clear()
+
+        bestResult, bestParameters = resultSinc.getBest()
+        if bestResult is not None:
+            ret = server.Results(bestParameters.args, bestResult)
+
+    return ret
+
+
+def run(
+    strategyClass, barFeed, strategyParameters, workerCount=None, logLevel=logging.ERROR, batchSize=200,
+    useSharedMemory=True, transport=base.Transport.TCP, useFork=False, resultCache=None, pruner=None
+):
     """Executes many instances of a strategy in parallel and finds the parameters that yield the best results.
 
     :param strategyClass: The strategy class.
     :param barFeed: The bar feed to use to backtest the strategy.
     :type barFeed: :class:`pyalgotrade.barfeed.BarFeed`.
     :param strategyParameters: The set of parameters to use for backtesting. An iterable object where **each element is
-        a tuple that holds parameter values**.
+        a tuple that holds parameter values**, or a search driver from :mod:`pyalgotrade.optimizer.search`.
     :param workerCount: The number of strategies to run in parallel. If None then as many workers as CPUs are used.
     :type workerCount: int.
     :param logLevel: The log level. Defaults to **logging.ERROR**.
     :param batchSize: The number of strategy executions that are delivered to each worker.
     :type batchSize: int.
+    :param useSharedMemory: True to publish bars once in shared memory for all the workers to read, instead of having
+        each worker get a copy from the server. Requires Python 3.8 or greater, and bars without extra columns.
+    :type useSharedMemory: boolean.
+    :param transport: The transport used by the workers to talk to the server. Valid values are defined in
+        :class:`pyalgotrade.optimizer.base.Transport`.
+    :param useFork: True to load the bars once and fork workers that inherit them, instead of running a server for the
+        workers to talk to. Batches and results go through the pipes of a :class:`multiprocessing.Pool`. Only
+        supported on platforms that can fork (not on Windows), and ignored otherwise. When set, **useSharedMemory**
+        and **transport** are not used.
+    :type useFork: boolean.
+    :param resultCache: A cache with results from previous runs. Parameters that have results in the cache don't run
+        again, and new results are stored in it.
+    :type resultCache: :class:`pyalgotrade.optimizer.resultcache.ResultCache`.
+    :param pruner: Aborts strategy executions that are not promising at checkpoints. Each worker process gets a copy.
+    :type pruner: :class:`pyalgotrade.optimizer.pruning.Pruner`.
     :rtype: A :class:`Results` instance with the best results found.
     """
 
-    return run_impl(strategyClass, barFeed, strategyParameters, batchSize, workerCount=workerCount, logLevel=logLevel)
+    if useFork:
+        if fork_supported():
+            return run_forked_impl(
+                strategyClass, barFeed, strategyParameters, batchSize, workerCount=workerCount, logLevel=logLevel,
+                resultCache=resultCache, pruner=pruner
+            )
+        logger.warning("Forking workers is not supported on this platform")
+
+    return run_impl(
+        strategyClass, barFeed, strategyParameters, batchSize, workerCount=workerCount, logLevel=logLevel,
+        useSharedMemory=useSharedMemory, transport=transport, resultCache=resultCache, pruner=pruner
+    )
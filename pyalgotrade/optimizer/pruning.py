@@ -0,0 +1,198 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+
+from pyalgotrade import stratanalyzer
+from pyalgotrade.stratanalyzer import drawdown
+
+
+class Metrics(object):
+    """Interim metrics for a strategy execution, as seen by a :class:`Pruner` at a checkpoint.
+
+    .. note::
+        This class should not be instantiated directly.
+    """
+
+    def __init__(self, strat):
+        self.__strat = strat
+        self.__barCount = 0
+        self.__dateTime = None
+        self.__equityCurve = []
+        self.__maxDrawDown = 0
+        self.__drawDownHelper = drawdown.DrawDownHelper()
+
+    def update(self, dateTime):
+        equity = self.__strat.getBroker().getEquity()
+        self.__barCount += 1
+        self.__dateTime = dateTime
+        self.__equityCurve.append(equity)
+        self.__drawDownHelper.update(dateTime, equity, equity)
+        self.__maxDrawDown = min(self.__maxDrawDown, self.__drawDownHelper.getMaxDrawDown())
+
+    def getStrategy(self):
+        """Returns the :class:`pyalgotrade.strategy.BaseStrategy` being run."""
+        return self.__strat
+
+    def getBarCount(self):
+        """Returns the number of bars processed so far."""
+        return self.__barCount
+
+    def getDateTime(self):
+        """Returns the :class:`datetime.datetime` for the current bars."""
+        return self.__dateTime
+
+    def getEquity(self):
+        """Returns the current portfolio value."""
+        return self.__equityCurve[-1]
+
+    def getEquityCurve(self):
+        """Returns a list with the portfolio value for every bar processed so far."""
+        return self.__equityCurve
+
+    def getMaxDrawDown(self):
+        """Returns the max. (deepest) drawdown so far."""
+        return abs(self.__maxDrawDown)
+
+    def getResult(self):
+        """Returns the strategy result (:meth:`pyalgotrade.strategy.BaseStrategy.getResult`) so far."""
+        return self.__strat.getResult()
+
+
+class Pruner(object):
+    """Base class for pruners. At every checkpoint, pruners get to see the interim metrics of a strategy execution and
+    decide whether to abort it. Aborted executions have no result.
+
+    :param checkpoints: When to check strategy executions. Each checkpoint is either a number of bars or a
+        :class:`datetime.datetime`.
+    :type checkpoints: list.
+
+    .. note::
+        * This is a base class and should not be used directly.
+        * Each worker process gets a copy of the pruner, so pruners that keep state only see executions run by the
+          same worker process.
+    """
+
+    def __init__(self, checkpoints):
+        assert len(checkpoints), "No checkpoints"
+        self.__checkpoints = list(checkpoints)
+
+    def getCheckpoints(self):
+        return self.__checkpoints
+
+    def prune(self, checkpoint, metrics, bestResult):
+        """Override to decide whether to abort a strategy execution.
+
+        :param checkpoint: The index of the checkpoint reached.
+        :type checkpoint: int.
+        :param metrics: The interim metrics.
+        :type metrics: :class:`Metrics`.
+        :param bestResult: The best result so far, or None if there are no results yet.
+        :rtype: True to abort the strategy execution.
+        """
+        raise NotImplementedError()
+
+
+class DrawDownPruner(Pruner):
+    """A :class:`Pruner` that aborts strategy executions whose drawdown goes beyond a limit.
+
+    :param checkpoints: When to check strategy executions. Check :class:`Pruner`.
+    :type checkpoints: list.
+    :param maxDrawDown: The max. drawdown allowed. For example, 0.2 for 20%.
+    :type maxDrawDown: float.
+    """
+
+    def __init__(self, checkpoints, maxDrawDown):
+        super(DrawDownPruner, self).__init__(checkpoints)
+        self.__maxDrawDown = maxDrawDown
+
+    def prune(self, checkpoint, metrics, bestResult):
+        return metrics.getMaxDrawDown() > self.__maxDrawDown
+
+
+class MedianPruner(Pruner):
+    """A :class:`Pruner` that aborts strategy executions whose interim result is below the median of the interim
+    results of previous executions at the same checkpoint.
+
+    :param checkpoints: When to check strategy executions. Check :class:`Pruner`.
+    :type checkpoints: list.
+    :param minExecutions: The number of executions that need to reach a checkpoint before pruning at that checkpoint.
+    :type minExecutions: int.
+    """
+
+    def __init__(self, checkpoints, minExecutions=5):
+        super(MedianPruner, self).__init__(checkpoints)
+        assert minExecutions > 0, "Invalid number of executions"
+        self.__minExecutions = minExecutions
+        self.__results = [[] for _ in checkpoints]
+
+    def prune(self, checkpoint, metrics, bestResult):
+        ret = False
+        result = metrics.getResult()
+        results = self.__results[checkpoint]
+        if len(results) >= self.__minExecutions:
+            results = sorted(results)
+            middle = len(results) // 2
+            if len(results) % 2:
+                median = results[middle]
+            else:
+                median = (results[middle - 1] + results[middle]) / 2.0
+            ret = result < median
+        self.__results[checkpoint].append(result)
+        return ret
+
+
+class PruningAnalyzer(stratanalyzer.StrategyAnalyzer):
+    # Tracks metrics and checks with the pruner at every checkpoint. Stops the strategy if the pruner says so.
+
+    def __init__(self, pruner, bestResult):
+        super(PruningAnalyzer, self).__init__()
+        self.__pruner = pruner
+        self.__bestResult = bestResult
+        self.__checkpoints = pruner.getCheckpoints()
+        self.__nextCheckpoint = 0
+        self.__metrics = None
+        self.__pruned = False
+
+    def attached(self, strat):
+        self.__metrics = Metrics(strat)
+
+    def __reached(self, checkpoint):
+        if isinstance(checkpoint, datetime.datetime):
+            return self.__metrics.getDateTime() >= checkpoint
+        return self.__metrics.getBarCount() >= checkpoint
+
+    def beforeOnBars(self, strat, bars):
+        if self.__pruned:
+            return
+        self.__metrics.update(bars.getDateTime())
+        # More than one checkpoint may be reached with the same bars when using datetimes.
+        while self.__nextCheckpoint < len(self.__checkpoints):
+            checkpoint = self.__nextCheckpoint
+            if not self.__reached(self.__checkpoints[checkpoint]):
+                break
+            self.__nextCheckpoint += 1
+            if self.__pruner.prune(checkpoint, self.__metrics, self.__bestResult):
+                self.__pruned = True
+                strat.stop()
+                break
+
+    def isPruned(self):
+        return self.__pruned
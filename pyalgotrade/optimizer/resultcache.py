@@ -0,0 +1,119 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import pickle
+import sqlite3
+import threading
+
+# Parameters are pickled with a fixed protocol so keys don't change across Python versions.
+PARAMETERS_PICKLE_PROTOCOL = 2
+
+
+def get_strategy_id(strategyClass):
+    """Returns an id for a strategy class based on its module and name."""
+    return "%s.%s" % (strategyClass.__module__, strategyClass.__name__)
+
+
+def get_parameters_key(parameters):
+    return sqlite3.Binary(pickle.dumps(tuple(parameters), PARAMETERS_PICKLE_PROTOCOL))
+
+
+class ResultCache(object):
+    """Strategy results stored in a SQLite database, so that a strategy doesn't run again with the same bars and
+    parameters. Results are keyed by the strategy id, the hash of the bars and the parameters.
+
+    :param dbFilePath: The path to the database. It is created if it doesn't exist.
+    :type dbFilePath: string.
+    :param strategyId: Identifies the strategy, for example using :func:`get_strategy_id`. Change it whenever the
+        strategy changes in a way that affects its results.
+    :type strategyId: string.
+
+    .. note::
+        * Failed strategy executions are not cached.
+        * This class is thread safe.
+    """
+
+    def __init__(self, dbFilePath, strategyId):
+        self.__strategyId = strategyId
+        self.__lock = threading.Lock()
+        # Servers use the cache from different threads.
+        self.__connection = sqlite3.connect(dbFilePath, check_same_thread=False)
+        self.__connection.isolation_level = None  # To do auto-commit
+        self.__connection.execute(
+            "create table if not exists result ("
+            "strategy_id text not null"
+            ", dataset_hash text not null"
+            ", parameters blob not null"
+            ", result blob not null"
+            ", primary key (strategy_id, dataset_hash, parameters))"
+        )
+
+    def getStrategyId(self):
+        return self.__strategyId
+
+    def getResults(self, datasetHash, parametersList):
+        """Returns a dict that maps parameters to results, for the parameters that have results in the cache.
+
+        :param datasetHash: The hash that identifies the bars, as returned by
+            :func:`pyalgotrade.optimizer.dataset.get_fingerprint`.
+        :type datasetHash: string.
+        :param parametersList: A list of parameter tuples.
+        """
+
+        ret = {}
+        sql = "select result from result where strategy_id = ? and dataset_hash = ? and parameters = ?"
+        with self.__lock:
+            for parameters in parametersList:
+                row = self.__connection.execute(
+                    sql, [self.__strategyId, datasetHash, get_parameters_key(parameters)]
+                ).fetchone()
+                if row is not None:
+                    ret[tuple(parameters)] = pickle.loads(bytes(row[0]))
+        return ret
+
+    def addResults(self, datasetHash, results):
+        """Stores results.
+
+        :param datasetHash: The hash that identifies the bars.
+        :type datasetHash: string.
+        :param results: A list of (parameters, result) tuples.
+        """
+
+        rows = [
+            (self.__strategyId, datasetHash, get_parameters_key(parameters), sqlite3.Binary(pickle.dumps(result)))
+            for parameters, result in results if result is not None
+        ]
+        if len(rows) == 0:
+            return
+        with self.__lock:
+            self.__connection.execute("begin")
+            try:
+                self.__connection.executemany(
+                    "insert or replace into result (strategy_id, dataset_hash, parameters, result) values (?, ?, ?, ?)",
+                    rows
+                )
+                self.__connection.execute("commit")
+            except Exception:
+                self.__connection.execute("rollback")
+                raise
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
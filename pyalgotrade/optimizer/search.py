@@ -0,0 +1,413 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import math
+import random
+import threading
+
+from pyalgotrade.optimizer import base
+
+# Attempts to find parameters that were not tried yet before giving up.
+MAX_SAMPLING_ATTEMPTS = 100
+
+
+class Dimension(object):
+    """Base class for the values that a single strategy parameter can take.
+
+    .. note::
+        This is a base class and should not be used directly.
+    """
+
+    def sample(self, rnd):
+        # Returns a value sampled uniformly.
+        raise NotImplementedError()
+
+    def sampleNear(self, rnd, values):
+        # Returns a value sampled from a density estimated from values.
+        raise NotImplementedError()
+
+    def getLogDensity(self, value, values):
+        # Returns the log of the density estimated from values, at value.
+        raise NotImplementedError()
+
+
+class Choice(Dimension):
+    """A parameter that takes one of a set of values.
+
+    :param values: The values.
+    :type values: list.
+    """
+
+    def __init__(self, values):
+        assert len(values), "No values"
+        self.__values = list(values)
+
+    def sample(self, rnd):
+        return rnd.choice(self.__values)
+
+    def __getWeights(self, values):
+        # Every value gets a prior count of 1.
+        counts = dict((value, 1) for value in self.__values)
+        for value in values:
+            counts[value] += 1
+        return [counts[value] for value in self.__values]
+
+    def sampleNear(self, rnd, values):
+        weights = self.__getWeights(values)
+        point = rnd.random() * sum(weights)
+        for value, weight in zip(self.__values, weights):
+            point -= weight
+            if point < 0:
+                return value
+        return self.__values[-1]
+
+    def getLogDensity(self, value, values):
+        weights = self.__getWeights(values)
+        return math.log(weights[self.__values.index(value)] / float(sum(weights)))
+
+
+class Float(Dimension):
+    """A parameter that takes values between low and high.
+
+    :param low: The lowest value.
+    :type low: float.
+    :param high: The highest value.
+    :type high: float.
+    """
+
+    def __init__(self, low, high):
+        assert low < high, "Invalid range"
+        self.__low = low
+        self.__high = high
+
+    def getLow(self):
+        return self.__low
+
+    def getHigh(self):
+        return self.__high
+
+    def sample(self, rnd):
+        return rnd.uniform(self.__low, self.__high)
+
+    def __getBandwidth(self, values):
+        # Narrower kernels as there are more values.
+        return (self.__high - self.__low) / float(min(100, len(values) + 1))
+
+    def sampleNear(self, rnd, values):
+        # A mixture of a uniform prior and a gaussian kernel around each value.
+        i = rnd.randint(0, len(values))
+        if i == len(values):
+            return self.sample(rnd)
+        ret = rnd.gauss(values[i], self.__getBandwidth(values))
+        return min(self.__high, max(self.__low, ret))
+
+    def getLogDensity(self, value, values):
+        width = float(self.__high - self.__low)
+        bandwidth = self.__getBandwidth(values)
+        density = 1 / width
+        for center in values:
+            density += math.exp(-0.5 * ((value - center) / bandwidth) ** 2) / (bandwidth * math.sqrt(2 * math.pi))
+        return math.log(density / (len(values) + 1))
+
+
+class Integer(Float):
+    """A parameter that takes integer values between low and high, both included.
+
+    :param low: The lowest value.
+    :type low: int.
+    :param high: The highest value.
+    :type high: int.
+    """
+
+    def __init__(self, low, high):
+        # Values are rounded, so each integer gets the same share of the range.
+        super(Integer, self).__init__(low - 0.5, high + 0.5)
+        self.__low = low
+        self.__high = high
+
+    def __round(self, value):
+        return min(self.__high, max(self.__low, int(math.floor(value + 0.5))))
+
+    def sample(self, rnd):
+        return rnd.randint(self.__low, self.__high)
+
+    def sampleNear(self, rnd, values):
+        return self.__round(super(Integer, self).sampleNear(rnd, values))
+
+
+class Search(base.ParameterSource):
+    """Base class for search drivers. Search drivers generate strategy parameters as workers ask for them, based on the
+    results so far, instead of going through every combination. They can be used instead of an iterable with the
+    parameters in :func:`pyalgotrade.optimizer.local.run` and :func:`pyalgotrade.optimizer.server.serve`.
+
+    :param space: The values that each strategy parameter can take, in order. Each element is a :class:`Dimension`,
+        like :class:`Choice`, :class:`Integer` or :class:`Float`.
+    :type space: list.
+    :param maxTrials: The max number of strategy executions.
+    :type maxTrials: int.
+    :param seed: The seed for the random number generator, to get the same parameters on every run.
+
+    .. note::
+        * This is a base class and should not be used directly.
+        * Parameters are handed out one at a time, regardless of **batchSize**, so that each one takes into account
+          the results so far.
+        * The same parameters are not tried twice. The search finishes early if it runs out of new parameters.
+    """
+
+    def __init__(self, space, maxTrials, seed=None):
+        assert len(space), "No dimensions"
+        assert maxTrials > 0, "Invalid number of trials"
+        self.__space = list(space)
+        self.__maxTrials = maxTrials
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.__tried = set()
+        self.__exhausted = False
+        self.__results = []
+
+    def getSpace(self):
+        return self.__space
+
+    def getResults(self):
+        """Returns a list with the (parameters, result) for every strategy execution so far. Failed and pruned strategy
+        executions have None as the result."""
+        return self.__results
+
+    def sample(self, rnd):
+        """Override to return the next parameters to try, as a tuple. Called with the lock held.
+
+        :param rnd: The random number generator to use.
+        :type rnd: :class:`random.Random`.
+        """
+        raise NotImplementedError()
+
+    def newParameters(self):
+        # Returns parameters that were not tried yet, or None if there are no more. Called with the lock held.
+        if self.__exhausted or len(self.__tried) >= self.__maxTrials:
+            return None
+        for _ in range(MAX_SAMPLING_ATTEMPTS):
+            ret = tuple(self.sample(self.__random))
+            if ret not in self.__tried:
+                self.__tried.add(ret)
+                return ret
+        self.__exhausted = True
+        return None
+
+    def nextParameters(self):
+        # Returns the next parameters to hand out, or None if there are none available. Called with the lock held.
+        return self.newParameters()
+
+    def isDone(self):
+        # Called with the lock held.
+        return self.__exhausted or len(self.__tried) >= self.__maxTrials
+
+    def processResult(self, parameters, result):
+        # Called with the lock held for every result.
+        pass
+
+    def getNext(self, count):
+        assert count > 0, "Invalid number of parameters"
+
+        ret = []
+        with self.__lock:
+            while len(ret) < count and not self.isDone():
+                parameters = self.nextParameters()
+                if parameters is None:
+                    break
+                ret.append(base.Parameters(*parameters))
+        return ret
+
+    def eof(self):
+        with self.__lock:
+            return self.isDone()
+
+    def isAdaptive(self):
+        return True
+
+    def onNewResult(self, result, parameters):
+        with self.__lock:
+            parameters = tuple(parameters.args)
+            self.__results.append((parameters, result))
+            self.processResult(parameters, result)
+
+
+class RandomSearch(Search):
+    """A :class:`Search` that samples every parameter uniformly at random. With many parameters, this usually finds
+    parameters as good as an exhaustive grid with far fewer strategy executions.
+
+    :param space: The values that each strategy parameter can take. Check :class:`Search`.
+    :type space: list.
+    :param maxTrials: The max number of strategy executions.
+    :type maxTrials: int.
+    :param seed: The seed for the random number generator.
+    """
+
+    def sample(self, rnd):
+        return [dimension.sample(rnd) for dimension in self.getSpace()]
+
+
+class TPESearch(Search):
+    """A :class:`Search` that uses a Tree-structured Parzen Estimator (TPE). Results so far are split in good and bad
+    ones, a density is estimated for each parameter on each group, and the candidate that is most likely to be good
+    is picked. Starts with random parameters until there are enough results.
+
+    :param space: The values that each strategy parameter can take. Check :class:`Search`.
+    :type space: list.
+    :param maxTrials: The max number of strategy executions.
+    :type maxTrials: int.
+    :param startupTrials: The number of results needed before using the estimator.
+    :type startupTrials: int.
+    :param gamma: The fraction of the results that are considered good.
+    :type gamma: float.
+    :param candidates: The number of candidates sampled from the good density on each step.
+    :type candidates: int.
+    :param seed: The seed for the random number generator.
+
+    .. note::
+        Failed and pruned strategy executions are considered bad.
+    """
+
+    def __init__(self, space, maxTrials, startupTrials=10, gamma=0.25, candidates=24, seed=None):
+        super(TPESearch, self).__init__(space, maxTrials, seed)
+        assert startupTrials > 0, "Invalid number of startup trials"
+        assert 0 < gamma < 1, "Invalid gamma"
+        assert candidates > 0, "Invalid number of candidates"
+        self.__startupTrials = startupTrials
+        self.__gamma = gamma
+        self.__candidates = candidates
+
+    def sample(self, rnd):
+        space = self.getSpace()
+        results = self.getResults()
+        if len(results) < self.__startupTrials:
+            return [dimension.sample(rnd) for dimension in space]
+
+        ranked = sorted([item for item in results if item[1] is not None], key=lambda item: item[1], reverse=True)
+        goodCount = int(math.ceil(self.__gamma * len(ranked)))
+        good = [parameters for parameters, _ in ranked[:goodCount]]
+        bad = [parameters for parameters, _ in ranked[goodCount:]]
+        bad.extend(parameters for parameters, result in results if result is None)
+
+        # Each parameter is handled independently.
+        ret = None
+        bestScore = None
+        for _ in range(self.__candidates):
+            candidate = []
+            score = 0
+            for i, dimension in enumerate(space):
+                goodValues = [parameters[i] for parameters in good]
+                badValues = [parameters[i] for parameters in bad]
+                value = dimension.sampleNear(rnd, goodValues)
+                candidate.append(value)
+                score += dimension.getLogDensity(value, goodValues) - dimension.getLogDensity(value, badValues)
+            if bestScore is None or score > bestScore:
+                ret = candidate
+                bestScore = score
+        return ret
+
+
+class SuccessiveHalvingSearch(Search):
+    """A :class:`Search` that does asynchronous successive halving. New parameters, sampled at random, are first
+    backtested on a small subset of the bars. Parameters whose result is in the top 1/**reductionFactor** of the
+    results on a subset get promoted, and backtested on a subset **reductionFactor** times larger, until the whole
+    dataset is used. This spends most of the time on promising parameters.
+
+    :param space: The values that each strategy parameter can take. Check :class:`Search`.
+    :type space: list.
+    :param maxTrials: The max number of new parameters to try.
+    :type maxTrials: int.
+    :param minBudget: The fraction of the bars to use for new parameters. For example, 1/9. for the first 11% of the
+        bars.
+    :type minBudget: float.
+    :param reductionFactor: Only 1 out of **reductionFactor** parameters get promoted on each subset.
+    :type reductionFactor: int.
+    :param seed: The seed for the random number generator.
+
+    .. note::
+        * Subsets of the bars always start with the first bar.
+        * Strategy parameters are preceded by a :class:`pyalgotrade.optimizer.base.Budget` when backtesting on a
+          subset of the bars. Only results on the whole dataset compete for the best result.
+        * Workers may need to wait for results from other workers before parameters get promoted.
+    """
+
+    def __init__(self, space, maxTrials, minBudget, reductionFactor=3, seed=None):
+        super(SuccessiveHalvingSearch, self).__init__(space, maxTrials, seed)
+        assert 0 < minBudget <= 1, "Invalid budget"
+        assert reductionFactor > 1, "Invalid reduction factor"
+        self.__reductionFactor = reductionFactor
+        self.__budgets = []
+        budget = minBudget
+        while budget < 1:
+            self.__budgets.append(budget)
+            budget *= reductionFactor
+        self.__budgets.append(1)
+        # Results, promoted parameters and parameters being backtested, on each rung.
+        self.__rungs = [{} for _ in self.__budgets]
+        self.__promoted = [set() for _ in self.__budgets]
+        self.__pending = set()
+
+    def getBudgets(self):
+        """Returns the fraction of the bars used on each rung."""
+        return self.__budgets
+
+    def sample(self, rnd):
+        return [dimension.sample(rnd) for dimension in self.getSpace()]
+
+    def __getPromotion(self):
+        # Upper rungs first, so the best parameters reach the whole dataset as soon as possible.
+        for rung in range(len(self.__rungs) - 2, -1, -1):
+            results = self.__rungs[rung]
+            ranked = sorted(
+                [item for item in results.items() if item[1] is not None], key=lambda item: item[1], reverse=True
+            )
+            for parameters, _ in ranked[:len(results) // self.__reductionFactor]:
+                if parameters not in self.__promoted[rung]:
+                    return rung, parameters
+        return None
+
+    def __handOut(self, rung, parameters):
+        self.__pending.add((rung, parameters))
+        # The budget is left out on the whole dataset.
+        if rung == len(self.__budgets) - 1:
+            return parameters
+        return (base.Budget(self.__budgets[rung]),) + parameters
+
+    def nextParameters(self):
+        promotion = self.__getPromotion()
+        if promotion is not None:
+            rung, parameters = promotion
+            self.__promoted[rung].add(parameters)
+            return self.__handOut(rung + 1, parameters)
+
+        parameters = self.newParameters()
+        if parameters is not None:
+            return self.__handOut(0, parameters)
+        return None
+
+    def isDone(self):
+        return super(SuccessiveHalvingSearch, self).isDone() and not self.__pending and self.__getPromotion() is None
+
+    def processResult(self, parameters, result):
+        budget, parameters = base.split_budget(parameters)
+        rung = len(self.__budgets) - 1
+        if budget is not None:
+            rung = self.__budgets.index(budget.fraction)
+        self.__pending.discard((rung, parameters))
+        self.__rungs[rung][parameters] = result
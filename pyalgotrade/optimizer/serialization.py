@@ -19,10 +19,26 @@
 """
 
 import pickle
+import struct
 
 import six
 from six.moves import xmlrpc_client
 
+# Messages sent over TCP are framed with a header that has the message type (1 byte) and the payload length
+# (4 bytes), both in network byte order.
+MESSAGE_HEADER = struct.Struct("!BI")
+
+
+class MessageType(object):
+    # Requests are answered with a message of the same type, except for PUSH_JOB_RESULTS which has no reply.
+    GET_INSTRUMENTS_AND_BARS = 1
+    GET_BARS_FREQUENCY = 2
+    GET_NEXT_JOB = 3
+    PUSH_JOB_RESULTS = 4
+    REPORT_PROGRESS = 5
+    GET_DATASET_MANIFEST = 6
+    GET_DATASET_CHUNK = 7  # The payload is the chunk hash, and the reply is the compressed chunk.
+
 
 def dumps(obj):
     return pickle.dumps(obj)
@@ -32,3 +48,37 @@ def loads(serialized):
     if six.PY3 and isinstance(serialized, xmlrpc_client.Binary):
         serialized = serialized.data
     return pickle.loads(serialized)
+
+
+def recv_exactly(sock, size):
+    # Returns None if the connection gets closed before receiving anything.
+    chunks = []
+    received = 0
+    while received < size:
+        chunk = sock.recv(min(size - received, 1024 * 1024))
+        if not chunk:
+            if received == 0:
+                return None
+            raise Exception("Connection closed while receiving a message")
+        chunks.append(chunk)
+        received += len(chunk)
+    return b"".join(chunks)
+
+
+def send_message(sock, msgType, payload=b""):
+    sock.sendall(MESSAGE_HEADER.pack(msgType, len(payload)) + payload)
+
+
+def recv_message(sock):
+    """Returns a (message type, payload) tuple, or (None, None) if the connection was closed."""
+
+    header = recv_exactly(sock, MESSAGE_HEADER.size)
+    if header is None:
+        return None, None
+    msgType, size = MESSAGE_HEADER.unpack(header)
+    payload = b""
+    if size:
+        payload = recv_exactly(sock, size)
+        if payload is None:
+            raise Exception("Connection closed while receiving a message")
+    return msgType, payload
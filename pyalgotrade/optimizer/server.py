@@ -18,9 +18,13 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import threading
+
 import pyalgotrade.logger
 from pyalgotrade.optimizer import base
-from pyalgotrade.optimizer import xmlrpcserver
+from pyalgotrade.optimizer import dataset
+from pyalgotrade.optimizer import jobs
+from pyalgotrade.optimizer import serialization
 
 logger = pyalgotrade.logger.getLogger(__name__)
 
@@ -40,24 +44,140 @@ class Results(object):
         return self.__result
 
 
-def serve(barFeed, strategyParameters, address, port, batchSize=200):
+class BaseServer(object):
+    """Base class for servers that hand out bars and jobs to workers.
+
+    Subclasses implement the transport and must also derive from a :class:`socketserver.BaseServer` subclass.
+    """
+
+    def __init__(
+        self, paramSource, resultSinc, barFeed, autoStop=True, batchSize=200,
+        targetJobDuration=jobs.DEFAULT_TARGET_JOB_DURATION, leaseTimeout=jobs.DEFAULT_LEASE_TIMEOUT, resultCache=None
+    ):
+        assert batchSize > 0, "Invalid batch size"
+
+        self.__jobManager = jobs.JobManager(
+            paramSource, resultSinc, batchSize, targetJobDuration, leaseTimeout, resultCache
+        )
+        self.__barFeed = barFeed
+        self.__resultCache = resultCache
+        self.__loadedBars = None
+        # Serialized instruments and bars, and the dataset for workers that keep a cache. Built when first requested.
+        self.__instrumentsAndBars = None
+        self.__dataset = None
+        self.__lock = threading.Lock()
+        self.__barsFreq = None
+        self.__startedServingEvent = threading.Event()
+        self.__forcedStop = False
+        if autoStop:
+            self.__autoStopThread = jobs.AutoStopThread(self)
+        else:
+            self.__autoStopThread = None
+
+    def getJobManager(self):
+        return self.__jobManager
+
+    def getSerializedInstrumentsAndBars(self):
+        with self.__lock:
+            if self.__instrumentsAndBars is None:
+                self.__instrumentsAndBars = serialization.dumps(self.__loadedBars)
+            return self.__instrumentsAndBars
+
+    def getDataset(self):
+        with self.__lock:
+            if self.__dataset is None:
+                instruments, bars = self.__loadedBars
+                self.__dataset = dataset.Dataset(instruments, bars)
+            return self.__dataset
+
+    def getFrequency(self):
+        return self.__barsFreq
+
+    def jobsPending(self):
+        if self.__forcedStop:
+            return False
+        return self.__jobManager.jobsPending()
+
+    def waitServing(self, timeout=None):
+        return self.__startedServingEvent.wait(timeout)
+
+    def stop(self):
+        self.shutdown()
+
+    def serve(self):
+        try:
+            # Initialize instruments, bars and parameters.
+            logger.info("Loading bars")
+            instruments, bars = jobs.load_bars(self.__barFeed)
+            self.__loadedBars = (instruments, bars)
+            if self.__resultCache is not None:
+                self.__jobManager.setDatasetHash(dataset.get_fingerprint(instruments, bars))
+            self.__barsFreq = self.__barFeed.getFrequency()
+
+            if self.__autoStopThread:
+                self.__autoStopThread.start()
+
+            logger.info("Started serving")
+            self.__startedServingEvent.set()
+            self.serve_forever()
+            logger.info("Finished serving")
+
+            if self.__autoStopThread:
+                self.__autoStopThread.join()
+        finally:
+            self.__forcedStop = True
+            self.server_close()
+
+
+def get_server_class(transport):
+    # Imported here since both transports derive from BaseServer.
+    from pyalgotrade.optimizer import tcpserver
+    from pyalgotrade.optimizer import xmlrpcserver
+
+    ret = {
+        base.Transport.XMLRPC: xmlrpcserver.Server,
+        base.Transport.TCP: tcpserver.Server,
+    }.get(transport)
+    if ret is None:
+        raise Exception("Invalid transport %s" % transport)
+    return ret
+
+
+def serve(
+    barFeed, strategyParameters, address, port, batchSize=200, transport=base.Transport.XMLRPC,
+    targetJobDuration=jobs.DEFAULT_TARGET_JOB_DURATION, leaseTimeout=jobs.DEFAULT_LEASE_TIMEOUT, resultCache=None
+):
     """Executes a server that will provide bars and strategy parameters for workers to use.
 
     :param barFeed: The bar feed that each worker will use to backtest the strategy.
     :type barFeed: :class:`pyalgotrade.barfeed.BarFeed`.
-    :param strategyParameters: The set of parameters to use for backtesting. An iterable object where **each element is a tuple that holds parameter values**.
+    :param strategyParameters: The set of parameters to use for backtesting. An iterable object where **each element is a tuple that holds parameter values**, or a search driver from :mod:`pyalgotrade.optimizer.search`.
     :param address: The address to listen for incoming worker connections.
     :type address: string.
     :param port: The port to listen for incoming worker connections.
     :type port: int.
-    :param batchSize: The number of strategy executions that are delivered to each worker.
+    :param batchSize: The max number of strategy executions that are delivered to each worker.
     :type batchSize: int.
+    :param transport: The transport used to talk to workers. Valid values are defined in
+        :class:`pyalgotrade.optimizer.base.Transport`. Workers must use the same one.
+    :param targetJobDuration: The number of seconds that each batch of strategy executions should take. Batch sizes
+        adapt to how fast each worker is, up to **batchSize**. Use None to always deliver **batchSize** executions.
+    :type targetJobDuration: int.
+    :param leaseTimeout: The number of seconds after which a batch is handed out again if the worker that got it
+        doesn't finish running any parameters. It should be longer than a single strategy execution.
+    :type leaseTimeout: int.
+    :param resultCache: A cache with results from previous runs. Parameters that have results in the cache are not
+        handed out to workers, and new results are stored in it.
+    :type resultCache: :class:`pyalgotrade.optimizer.resultcache.ResultCache`.
     :rtype: A :class:`Results` instance with the best results found or None if no results were obtained.
     """
 
-    paramSource = base.ParameterSource(strategyParameters)
+    paramSource = base.get_parameter_source(strategyParameters)
     resultSinc = base.ResultSinc()
-    s = xmlrpcserver.Server(paramSource, resultSinc, barFeed, address, port, batchSize=batchSize)
+    s = get_server_class(transport)(
+        paramSource, resultSinc, barFeed, address, port, batchSize=batchSize, targetJobDuration=targetJobDuration,
+        leaseTimeout=leaseTimeout, resultCache=resultCache
+    )
     logger.info("Starting server")
     s.serve()
     logger.info("Server finished")
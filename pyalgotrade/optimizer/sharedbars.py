@@ -0,0 +1,238 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import numpy as np
+import pytz
+
+from pyalgotrade import bar
+from pyalgotrade import dataseries
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import columnarbf
+
+# multiprocessing.shared_memory is only available since Python 3.8.
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+
+# Values stored for every bar, in this order.
+VALUES = ["open", "high", "low", "close", "volume", "adj_close"]
+
+
+def is_supported():
+    return shared_memory is not None
+
+
+def get_arrays(buf, rows, cols, entries):
+    # Returns the arrays laid out in a shared memory buffer. Bars are stored in per instrument columns, one after the
+    # other, and colStart holds the offset where each instrument starts. rowStart and rowEntries group the bars by
+    # datetime: rowEntries[rowStart[i]:rowStart[i + 1]] are the offsets of the bars for the i-th datetime.
+    # The layout is: int64 colStart (cols + 1), int64 rowStart (rows + 1), int64 rowEntries (entries), int64 datetimes
+    # (entries) and float64 values (6 x entries).
+    offset = 0
+    arrays = []
+    for size in [cols + 1, rows + 1, entries, entries]:
+        arrays.append(np.ndarray((size,), dtype=np.int64, buffer=buf, offset=offset))
+        offset += arrays[-1].nbytes
+    colStart, rowStart, rowEntries, dateTimes = arrays
+    values = []
+    for _ in VALUES:
+        values.append(np.ndarray((entries,), dtype=np.float64, buffer=buf, offset=offset))
+        offset += values[-1].nbytes
+    return colStart, rowStart, rowEntries, dateTimes, values
+
+
+def get_size(rows, cols, entries):
+    return (cols + 1 + rows + 1 + entries * 2) * 8 + len(VALUES) * entries * 8
+
+
+def build_bar(dateTime, values, pos, frequency):
+    open_, high, low, close, volume, adjClose = [values_.item(pos) for values_ in values]
+    if adjClose != adjClose:
+        adjClose = None
+    return columnarbf.build_bar(dateTime, open_, high, low, close, volume, adjClose, frequency)
+
+
+class SharedBarStore(object):
+    """Holds bars in a shared memory block as columnar arrays. Use :func:`publish` to build one.
+    Worker processes attach to it using the descriptor and :class:`SharedBars`."""
+
+    def __init__(self, shm, descriptor):
+        self.__shm = shm
+        self.__descriptor = descriptor
+
+    def getDescriptor(self):
+        """Returns a picklable dict that :class:`SharedBars` uses to attach to the shared memory block."""
+        return self.__descriptor
+
+    def close(self):
+        """Releases the shared memory block. Workers should be done with it."""
+        if self.__shm is not None:
+            self.__shm.close()
+            self.__shm.unlink()
+            self.__shm = None
+
+
+def publish(frequency, instruments, loadedBars):
+    """Copies a sequence of :class:`pyalgotrade.bar.Bars` into shared memory.
+
+    :param frequency: The bars frequency. Valid values defined in :class:`pyalgotrade.bar.Frequency`.
+    :param instruments: The instruments.
+    :type instruments: list.
+    :param loadedBars: The :class:`pyalgotrade.bar.Bars` to share, sorted by datetime.
+    :rtype: A :class:`SharedBarStore`, or None if shared memory is not supported or bars can't be shared (bars with
+        extra columns, or datetimes that don't have a single pytz timezone).
+    """
+
+    if not is_supported():
+        return None
+    timezoneName = barcache.get_timezone_name(loadedBars)
+    if timezoneName is None:
+        return None
+
+    instruments = list(instruments)
+    instrumentToCol = dict((instrument, col) for col, instrument in enumerate(instruments))
+    # Split the bars by instrument first.
+    colDateTimes = [[] for _ in instruments]
+    colRows = [[] for _ in instruments]
+    colValues = [[] for _ in instruments]
+    for row, bars in enumerate(loadedBars):
+        dateTime = dataseries.datetime_to_nanoseconds(bars.getDateTime())
+        for instrument in bars.getInstruments():
+            bar_ = bars[instrument]
+            col = instrumentToCol.get(instrument)
+            if col is None or type(bar_) is not bar.BasicBar or len(bar_.getExtraColumns()):
+                return None
+            adjClose = bar_.getAdjClose()
+            colDateTimes[col].append(dateTime)
+            colRows[col].append(row)
+            colValues[col].append((
+                bar_.getOpen(), bar_.getHigh(), bar_.getLow(), bar_.getClose(), bar_.getVolume(),
+                np.nan if adjClose is None else adjClose
+            ))
+
+    rows = len(loadedBars)
+    cols = len(instruments)
+    counts = [len(colRows_) for colRows_ in colRows]
+    entries = sum(counts)
+    # Shared memory blocks can't be empty.
+    shm = shared_memory.SharedMemory(create=True, size=max(1, get_size(rows, cols, entries)))
+    try:
+        colStart, rowStart, rowEntries, dateTimes, values = get_arrays(shm.buf, rows, cols, entries)
+        colStart[0] = 0
+        colStart[1:] = np.cumsum(counts)
+        entryRows = np.empty(entries, dtype=np.int64)
+        for col in range(cols):
+            begin, end = colStart[col], colStart[col + 1]
+            if begin == end:
+                continue
+            dateTimes[begin:end] = colDateTimes[col]
+            entryRows[begin:end] = colRows[col]
+            colValues_ = np.array(colValues[col], dtype=np.float64)
+            for i, values_ in enumerate(values):
+                values_[begin:end] = colValues_[:, i]
+        # The sort is stable, so within a datetime bars keep the instruments order.
+        order = np.argsort(entryRows, kind="mergesort")
+        rowEntries[:] = order
+        rowStart[:] = np.searchsorted(entryRows[order], np.arange(rows + 1))
+        # Views need to be released before closing the block.
+        del colStart, rowStart, rowEntries, dateTimes, values
+    except Exception:
+        shm.close()
+        shm.unlink()
+        raise
+
+    descriptor = {
+        "name": shm.name,
+        "rows": rows,
+        "entries": entries,
+        "instruments": instruments,
+        "frequency": frequency,
+        "timezone": timezoneName,
+    }
+    return SharedBarStore(shm, descriptor)
+
+
+class SharedBars(object):
+    """A read-only sequence of :class:`pyalgotrade.bar.Bars` backed by a :class:`SharedBarStore`, that can be used with
+    :class:`pyalgotrade.barfeed.OptimizerBarFeed`. Values are not copied, and bars are built when accessed.
+
+    :param descriptor: The descriptor returned by :meth:`SharedBarStore.getDescriptor`.
+    :type descriptor: dict.
+    """
+
+    def __init__(self, descriptor):
+        self.__shm = shared_memory.SharedMemory(name=descriptor["name"])
+        self.__instruments = descriptor["instruments"]
+        self.__frequency = descriptor["frequency"]
+        self.__timezone = None
+        if descriptor["timezone"]:
+            self.__timezone = pytz.timezone(descriptor["timezone"])
+        self.__rows = descriptor["rows"]
+        self.__colStart, self.__rowStart, self.__rowEntries, self.__dateTimes, self.__values = get_arrays(
+            self.__shm.buf, self.__rows, len(self.__instruments), descriptor["entries"]
+        )
+        # Bars are not cached, so memory usage doesn't grow with each strategy run. Only the last one accessed is kept
+        # since feeds usually peek the next bars before consuming them.
+        self.__last = (None, None)
+
+    def getInstruments(self):
+        return self.__instruments
+
+    def __len__(self):
+        return self.__rows
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[i] for i in range(*pos.indices(len(self)))]
+
+        if pos < 0:
+            pos += len(self)
+        if pos < 0 or pos >= len(self):
+            raise IndexError("Index out of range")
+        lastPos, ret = self.__last
+        if lastPos != pos:
+            entries = self.__rowEntries[self.__rowStart.item(pos):self.__rowStart.item(pos + 1)]
+            cols = np.searchsorted(self.__colStart, entries, side="right") - 1
+            instrumentToPos = dict(
+                (self.__instruments[col], entry) for col, entry in zip(cols.tolist(), entries.tolist())
+            )
+            dateTime = dataseries.nanoseconds_to_datetime(self.__dateTimes.item(entries.item(0)), self.__timezone)
+            values = self.__values
+            frequency = self.__frequency
+            ret = columnarbf.BarsView(
+                dateTime, instrumentToPos, lambda entry: build_bar(dateTime, values, entry, frequency)
+            )
+            self.__last = (pos, ret)
+        return ret
+
+    def close(self):
+        """Detaches from the shared memory block."""
+        if self.__shm is None:
+            return
+        self.__last = (None, None)
+        self.__colStart = self.__rowStart = self.__rowEntries = self.__dateTimes = self.__values = None
+        try:
+            self.__shm.close()
+        except BufferError:
+            # Some bars are still referenced. The block gets unmapped when the process exits.
+            pass
+        self.__shm = None
@@ -0,0 +1,88 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import socket
+
+from six.moves import socketserver
+
+import pyalgotrade.logger
+from pyalgotrade.optimizer import jobs
+from pyalgotrade.optimizer import serialization
+from pyalgotrade.optimizer import server
+
+
+logger = pyalgotrade.logger.getLogger(__name__)
+
+
+class RequestHandler(socketserver.BaseRequestHandler):
+    # Each worker keeps a single connection open, and messages are processed in order.
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                msgType, payload = serialization.recv_message(self.request)
+                if msgType is None:
+                    break
+                self.server.handleMessage(self.request, msgType, payload)
+        except Exception as e:
+            logger.error("Error handling messages from %s: %s" % (self.client_address, e))
+
+
+class Server(socketserver.ThreadingTCPServer, server.BaseServer):
+    """Same as :class:`pyalgotrade.optimizer.xmlrpcserver.Server`, but using a binary protocol over TCP.
+    Check :mod:`pyalgotrade.optimizer.serialization` for the message format."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(
+        self, paramSource, resultSinc, barFeed, address, port, autoStop=True, batchSize=200,
+        targetJobDuration=jobs.DEFAULT_TARGET_JOB_DURATION, leaseTimeout=jobs.DEFAULT_LEASE_TIMEOUT, resultCache=None
+    ):
+        socketserver.ThreadingTCPServer.__init__(self, (address, port), RequestHandler)
+        server.BaseServer.__init__(
+            self, paramSource, resultSinc, barFeed, autoStop=autoStop, batchSize=batchSize,
+            targetJobDuration=targetJobDuration, leaseTimeout=leaseTimeout, resultCache=resultCache
+        )
+
+    def handleMessage(self, sock, msgType, payload):
+        jobManager = self.getJobManager()
+        if msgType == serialization.MessageType.GET_INSTRUMENTS_AND_BARS:
+            serialization.send_message(sock, msgType, self.getSerializedInstrumentsAndBars())
+        elif msgType == serialization.MessageType.GET_DATASET_MANIFEST:
+            serialization.send_message(sock, msgType, serialization.dumps(self.getDataset().getManifest()))
+        elif msgType == serialization.MessageType.GET_DATASET_CHUNK:
+            serialization.send_message(sock, msgType, self.getDataset().getChunk(payload.decode("ascii")))
+        elif msgType == serialization.MessageType.GET_BARS_FREQUENCY:
+            serialization.send_message(sock, msgType, serialization.dumps(self.getFrequency()))
+        elif msgType == serialization.MessageType.GET_NEXT_JOB:
+            workerName = serialization.loads(payload) if payload else None
+            serialization.send_message(sock, msgType, serialization.dumps(jobManager.getNextJob(workerName)))
+        elif msgType == serialization.MessageType.PUSH_JOB_RESULTS:
+            # Results are pushed without waiting for a reply.
+            jobId, result, parameters, workerName, allResults = serialization.loads(payload)
+            jobManager.pushJobResults(jobId, result, parameters, workerName, allResults)
+        elif msgType == serialization.MessageType.REPORT_PROGRESS:
+            jobId, processedCount, workerName = serialization.loads(payload)
+            stolenCount = jobManager.reportProgress(jobId, processedCount, workerName)
+            serialization.send_message(sock, msgType, serialization.dumps(stolenCount))
+        else:
+            raise Exception("Invalid message type %s" % msgType)
@@ -18,19 +18,32 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import os
 import socket
 import multiprocessing
+import threading
+import time
+
 import retrying
 
 from six.moves import xmlrpc_client
 
 import pyalgotrade.logger
 from pyalgotrade import barfeed
+from pyalgotrade.optimizer import base
+from pyalgotrade.optimizer import dataset
+from pyalgotrade.optimizer import jobs
+from pyalgotrade.optimizer import pruning
 from pyalgotrade.optimizer import serialization
 
 wait_exponential_multiplier = 500
 wait_exponential_max = 10000
 stop_max_delay = 10000
+# Seconds between progress reports while running a job. Reports keep the job's lease alive, and let the server hand
+# out unstarted parameters to idle workers.
+progress_report_interval = 1
+# Seconds to wait before asking for a job again when the server has none available yet.
+job_wait_interval = 1
 
 
 def any_exception(exception):
@@ -42,99 +55,350 @@ def retry_on_network_error(function, *args, **kwargs):
     return function(*args, **kwargs)
 
 
-class Worker(object):
-    def __init__(self, address, port, workerName=None):
-        url = "http://%s:%s/PyAlgoTradeRPC" % (address, port)
+class BarsPrefix(object):
+    # The first bars in a sequence, without copying them.
+
+    def __init__(self, bars, count):
+        self.__bars = bars
+        self.__count = min(count, len(bars))
+
+    def __len__(self):
+        return self.__count
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return self.__bars[slice(*pos.indices(self.__count))]
+        if pos < 0:
+            pos += self.__count
+        if pos < 0 or pos >= self.__count:
+            raise IndexError("Index out of range")
+        return self.__bars[pos]
+
+
+class ProgressReporter(threading.Thread):
+    # Reports progress from a separate thread, so that the job's lease is kept alive even if running the strategy
+    # takes long.
+
+    def __init__(self, worker, jobId):
+        super(ProgressReporter, self).__init__()
+        self.daemon = True
+        self.__worker = worker
+        self.__jobId = jobId
+        self.__stopEvent = threading.Event()
+        self.processedCount = 0
+        self.stolenCount = 0  # The last value returned by the server.
+
+    def run(self):
+        while not self.__stopEvent.wait(progress_report_interval):
+            try:
+                stolenCount = self.__worker.reportProgress(self.__jobId, self.processedCount)
+            except Exception as e:
+                self.__worker.getLogger().error("Failed to report progress: %s" % (e))
+                continue
+            # Not supported by the worker.
+            if stolenCount is None:
+                break
+            self.stolenCount = stolenCount
+
+    def stop(self):
+        self.__stopEvent.set()
+        self.join()
+
+
+class BaseWorker(object):
+    # Runs jobs. Subclasses implement the transport to talk to the server.
+    # If cacheDir is set, bars are loaded from the cache and only the chunks that are missing get downloaded.
+
+    def __init__(self, workerName=None, cacheDir=None):
         self.__logger = pyalgotrade.logger.getLogger(workerName)
-        self.__server = xmlrpc_client.ServerProxy(url, allow_none=True)
         if workerName is None:
             self.__workerName = socket.gethostname()
         else:
             self.__workerName = workerName
+        self.__cacheDir = cacheDir
+        self.__pruner = None
+        self.__bestResult = None
 
     def getLogger(self):
         return self.__logger
 
+    def getWorkerName(self):
+        return self.__workerName
+
+    def setPruner(self, pruner):
+        # A pyalgotrade.optimizer.pruning.Pruner used by runAndGetResult.
+        self.__pruner = pruner
+
+    def getPruner(self):
+        return self.__pruner
+
     def getInstrumentsAndBars(self):
-        ret = retry_on_network_error(self.__server.getInstrumentsAndBars)
-        ret = serialization.loads(ret)
-        return ret
+        raise NotImplementedError()
+
+    def getDatasetManifest(self):
+        raise NotImplementedError()
+
+    def getDatasetChunk(self, chunkHash):
+        # Returns the compressed chunk.
+        raise NotImplementedError()
 
     def getBarsFrequency(self):
-        ret = retry_on_network_error(self.__server.getBarsFrequency)
-        ret = int(ret)
-        return ret
+        raise NotImplementedError()
 
     def getNextJob(self):
-        ret = retry_on_network_error(self.__server.getNextJob)
-        ret = serialization.loads(ret)
-        return ret
+        raise NotImplementedError()
 
-    def pushJobResults(self, jobId, result, parameters):
-        jobId = serialization.dumps(jobId)
-        result = serialization.dumps(result)
-        parameters = serialization.dumps(parameters)
-        workerName = serialization.dumps(self.__workerName)
-        retry_on_network_error(self.__server.pushJobResults, jobId, result, parameters, workerName)
+    def pushJobResults(self, jobId, result, parameters, allResults):
+        # result and parameters are the best ones. allResults has (parameters, result) for every strategy execution.
+        raise NotImplementedError()
 
-    def __processJob(self, job, barsFreq, instruments, bars):
+    def reportProgress(self, jobId, processedCount):
+        # Returns the number of parameters that were taken from the job by other workers, jobs.JOB_CANCELLED if the
+        # job is no longer needed, or None if not supported.
+        return None
+
+    def close(self):
+        # Called once the worker finished running.
+        pass
+
+    def runJob(self, job, barsFreq, instruments, bars):
+        # Runs the strategy with every set of parameters in the job and returns the best result and parameters, and
+        # a list with the (parameters, result) for every execution.
+        progressReporter = ProgressReporter(self, job.getId())
+        progressReporter.start()
+        try:
+            return self.__runJob(job, barsFreq, instruments, bars, progressReporter)
+        finally:
+            progressReporter.stop()
+
+    def __updateBestResult(self, result):
+        if result is not None and (self.__bestResult is None or result > self.__bestResult):
+            self.__bestResult = result
+
+    def __runJob(self, job, barsFreq, instruments, bars, progressReporter):
+        self.__updateBestResult(job.getBestResult())
         bestResult = None
         parameters = job.getNextParameters()
         bestParams = parameters
+        allResults = []
         while parameters is not None:
+            # Search drivers may limit the execution to the first bars.
+            budget, args = base.split_budget(parameters)
+            runBars = bars
+            if budget is not None:
+                runBars = BarsPrefix(bars, budget.getBarCount(len(bars)))
             # Wrap the bars into a feed.
-            feed = barfeed.OptimizerBarFeed(barsFreq, instruments, bars)
+            feed = barfeed.OptimizerBarFeed(barsFreq, instruments, runBars)
             # Run the strategy.
             self.getLogger().info("Running strategy with parameters %s" % (str(parameters)))
             result = None
             try:
-                result = self.runStrategy(feed, *parameters)
+                result = self.runStrategy(feed, *args)
             except Exception as e:
                 self.getLogger().exception("Error running strategy with parameters %s: %s" % (str(parameters), e))
             self.getLogger().info("Result %s" % result)
-            if bestResult is None or result > bestResult:
+            allResults.append((parameters, result))
+            if budget is None:
+                self.__updateBestResult(result)
+            # Failed and pruned executions have no result.
+            if result is not None and (bestResult is None or result > bestResult):
                 bestResult = result
                 bestParams = parameters
+            # Drop the parameters that other workers took, or everything if the job is no longer needed.
+            progressReporter.processedCount += 1
+            stolenCount = progressReporter.stolenCount
+            if stolenCount == jobs.JOB_CANCELLED:
+                self.getLogger().info("Job cancelled")
+                job.cancel()
+            elif stolenCount:
+                job.setStolenCount(stolenCount)
             # Run with the next set of parameters.
             parameters = job.getNextParameters()
 
         assert(bestParams is not None)
-        self.pushJobResults(job.getId(), bestResult, bestParams)
+        return bestResult, bestParams, allResults
+
+    def __processJob(self, job, barsFreq, instruments, bars):
+        bestResult, bestParams, allResults = self.runJob(job, barsFreq, instruments, bars)
+        self.pushJobResults(job.getId(), bestResult, bestParams, allResults)
 
     # Run the strategy and return the result.
     def runStrategy(self, feed, parameters):
         raise Exception("Not implemented")
 
+    def runAndGetResult(self, strat):
+        # Runs a strategy and returns its result. If there is a pruner, the strategy may be aborted at a checkpoint, and
+        # None is returned.
+        if self.__pruner is None:
+            strat.run()
+            return strat.getResult()
+
+        pruningAnalyzer = pruning.PruningAnalyzer(self.__pruner, self.__bestResult)
+        strat.attachAnalyzer(pruningAnalyzer)
+        strat.run()
+        if pruningAnalyzer.isPruned():
+            self.getLogger().info("Strategy execution pruned")
+            return None
+        return strat.getResult()
+
     def run(self):
         try:
             self.getLogger().info("Started running")
             # Get the instruments and bars.
-            instruments, bars = self.getInstrumentsAndBars()
+            if self.__cacheDir is None:
+                instruments, bars = self.getInstrumentsAndBars()
+            else:
+                cache = dataset.Cache(self.__cacheDir)
+                instruments, bars = cache.load(self.getDatasetManifest(), self.getDatasetChunk)
             barsFreq = self.getBarsFrequency()
 
             # Process jobs
             job = self.getNextJob()
             while job is not None:
-                self.__processJob(job, barsFreq, instruments, bars)
+                if job.isEmpty():
+                    time.sleep(job_wait_interval)
+                else:
+                    self.__processJob(job, barsFreq, instruments, bars)
                 job = self.getNextJob()
             self.getLogger().info("Finished running")
         except Exception as e:
             self.getLogger().exception("Finished running with errors: %s" % (e))
+        finally:
+            self.close()
 
 
-def worker_process(strategyClass, address, port, workerName):
-    class MyWorker(Worker):
+class Worker(BaseWorker):
+    # A worker that talks to a pyalgotrade.optimizer.xmlrpcserver.Server.
+
+    def __init__(self, address, port, workerName=None, cacheDir=None):
+        super(Worker, self).__init__(workerName, cacheDir)
+        url = "http://%s:%s/PyAlgoTradeRPC" % (address, port)
+        self.__server = xmlrpc_client.ServerProxy(url, allow_none=True)
+        # Progress is reported from a separate thread, and the proxy can't be shared.
+        self.__lock = threading.Lock()
+
+    def __call(self, function, *args):
+        with self.__lock:
+            return retry_on_network_error(function, *args)
+
+    def getInstrumentsAndBars(self):
+        ret = self.__call(self.__server.getInstrumentsAndBars)
+        ret = serialization.loads(ret)
+        return ret
+
+    def getDatasetManifest(self):
+        return serialization.loads(self.__call(self.__server.getDatasetManifest))
+
+    def getDatasetChunk(self, chunkHash):
+        return serialization.loads(self.__call(self.__server.getDatasetChunk, chunkHash))
+
+    def getBarsFrequency(self):
+        ret = self.__call(self.__server.getBarsFrequency)
+        ret = int(ret)
+        return ret
+
+    def getNextJob(self):
+        ret = self.__call(self.__server.getNextJob, serialization.dumps(self.getWorkerName()))
+        ret = serialization.loads(ret)
+        return ret
+
+    def pushJobResults(self, jobId, result, parameters, allResults):
+        jobId = serialization.dumps(jobId)
+        result = serialization.dumps(result)
+        parameters = serialization.dumps(parameters)
+        workerName = serialization.dumps(self.getWorkerName())
+        allResults = serialization.dumps(allResults)
+        self.__call(self.__server.pushJobResults, jobId, result, parameters, workerName, allResults)
+
+    def reportProgress(self, jobId, processedCount):
+        jobId = serialization.dumps(jobId)
+        workerName = serialization.dumps(self.getWorkerName())
+        return self.__call(self.__server.reportProgress, jobId, processedCount, workerName)
+
+
+class TCPWorker(BaseWorker):
+    # A worker that talks to a pyalgotrade.optimizer.tcpserver.Server using a single persistent connection.
+
+    def __init__(self, address, port, workerName=None, cacheDir=None):
+        super(TCPWorker, self).__init__(workerName, cacheDir)
+        self.__socket = retry_on_network_error(socket.create_connection, (address, port))
+        self.__socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Progress is reported from a separate thread, and requests and replies must not interleave.
+        self.__lock = threading.Lock()
+
+    def __request(self, msgType, payload=b""):
+        with self.__lock:
+            serialization.send_message(self.__socket, msgType, payload)
+            replyType, ret = serialization.recv_message(self.__socket)
+        if replyType is None:
+            raise Exception("Connection closed by the server")
+        assert replyType == msgType, "Unexpected reply"
+        return ret
+
+    def getInstrumentsAndBars(self):
+        return serialization.loads(self.__request(serialization.MessageType.GET_INSTRUMENTS_AND_BARS))
+
+    def getDatasetManifest(self):
+        return serialization.loads(self.__request(serialization.MessageType.GET_DATASET_MANIFEST))
+
+    def getDatasetChunk(self, chunkHash):
+        return self.__request(serialization.MessageType.GET_DATASET_CHUNK, chunkHash.encode("ascii"))
+
+    def getBarsFrequency(self):
+        return serialization.loads(self.__request(serialization.MessageType.GET_BARS_FREQUENCY))
+
+    def getNextJob(self):
+        payload = serialization.dumps(self.getWorkerName())
+        return serialization.loads(self.__request(serialization.MessageType.GET_NEXT_JOB, payload))
+
+    def pushJobResults(self, jobId, result, parameters, allResults):
+        # There is no reply, so the worker doesn't wait for the server to process the results. Since messages are
+        # processed in order, results get processed before the next job is handed out.
+        payload = serialization.dumps((jobId, result, parameters, self.getWorkerName(), allResults))
+        with self.__lock:
+            serialization.send_message(self.__socket, serialization.MessageType.PUSH_JOB_RESULTS, payload)
+
+    def reportProgress(self, jobId, processedCount):
+        payload = serialization.dumps((jobId, processedCount, self.getWorkerName()))
+        return serialization.loads(self.__request(serialization.MessageType.REPORT_PROGRESS, payload))
+
+    def close(self):
+        with self.__lock:
+            if self.__socket is not None:
+                self.__socket.close()
+                self.__socket = None
+
+
+def get_worker_class(transport):
+    ret = {
+        base.Transport.XMLRPC: Worker,
+        base.Transport.TCP: TCPWorker,
+    }.get(transport)
+    if ret is None:
+        raise Exception("Invalid transport %s" % transport)
+    return ret
+
+
+def worker_process(
+    strategyClass, address, port, workerName, transport=base.Transport.XMLRPC, cacheDir=None, pruner=None
+):
+    class MyWorker(get_worker_class(transport)):
         def runStrategy(self, barFeed, *args, **kwargs):
             strat = strategyClass(barFeed, *args, **kwargs)
-            strat.run()
-            return strat.getResult()
+            return self.runAndGetResult(strat)
 
-    # Create a worker and run it.
-    w = MyWorker(address, port, workerName)
+    # Create a worker and run it. Processes need different names since the server keeps track of each one.
+    if workerName is None:
+        workerName = socket.gethostname()
+    w = MyWorker(address, port, "%s-%s" % (workerName, os.getpid()), cacheDir)
+    w.setPruner(pruner)
     w.run()
 
 
-def run(strategyClass, address, port, workerCount=None, workerName=None):
+def run(
+    strategyClass, address, port, workerCount=None, workerName=None, transport=base.Transport.XMLRPC, cacheDir=None,
+    pruner=None
+):
     """Executes one or more worker processes that will run a strategy with the bars and parameters supplied by the server.
 
     :param strategyClass: The strategy class.
@@ -144,8 +408,17 @@ def run(strategyClass, address, port, workerCount=None, workerName=None):
     :type port: int.
     :param workerCount: The number of worker processes to run. If None then as many workers as CPUs are used.
     :type workerCount: int.
-    :param workerName: A name for the worker. A name that identifies the worker. If None, the hostname is used.
+    :param workerName: A name for the worker. A name that identifies the worker. If None, the hostname is used. The
+        process id is appended to tell worker processes apart.
     :type workerName: string.
+    :param transport: The transport used by the server. Valid values are defined in
+        :class:`pyalgotrade.optimizer.base.Transport`.
+    :param cacheDir: A directory where bars are cached. Bars are split in chunks identified by a hash of their
+        content, and only the chunks that are missing from the cache are downloaded from the server. If None, all the
+        bars are downloaded every time.
+    :type cacheDir: string.
+    :param pruner: Aborts strategy executions that are not promising at checkpoints. Each worker process gets a copy.
+    :type pruner: :class:`pyalgotrade.optimizer.pruning.Pruner`.
     """
 
     assert(workerCount is None or workerCount > 0)
@@ -155,7 +428,9 @@ def run(strategyClass, address, port, workerCount=None, workerName=None):
     workers = []
     # Build the worker processes.
     for i in range(workerCount):
-        workers.append(multiprocessing.Process(target=worker_process, args=(strategyClass, address, port, workerName)))
+        workers.append(multiprocessing.Process(
+            target=worker_process, args=(strategyClass, address, port, workerName, transport, cacheDir, pruner)
+        ))
 
     # Start workers
     for process in workers:
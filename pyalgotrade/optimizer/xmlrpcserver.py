@@ -18,45 +18,11 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
-import threading
-import time
-
 from six.moves import xmlrpc_server
 
-import pyalgotrade.logger
-from pyalgotrade.optimizer import base
+from pyalgotrade.optimizer import jobs
 from pyalgotrade.optimizer import serialization
-
-
-logger = pyalgotrade.logger.getLogger(__name__)
-
-
-class AutoStopThread(threading.Thread):
-    def __init__(self, server):
-        super(AutoStopThread, self).__init__()
-        self.__server = server
-
-    def run(self):
-        while self.__server.jobsPending():
-            time.sleep(1)
-        self.__server.stop()
-
-
-class Job(object):
-    def __init__(self, strategyParameters):
-        self.__strategyParameters = strategyParameters
-        self.__bestResult = None
-        self.__bestParameters = None
-        self.__id = id(self)
-
-    def getId(self):
-        return self.__id
-
-    def getNextParameters(self):
-        ret = None
-        if len(self.__strategyParameters):
-            ret = self.__strategyParameters.pop()
-        return ret
+from pyalgotrade.optimizer import server
 
 
 # Restrict to a particular path.
@@ -64,114 +30,57 @@ class RequestHandler(xmlrpc_server.SimpleXMLRPCRequestHandler):
     rpc_paths = ('/PyAlgoTradeRPC',)
 
 
-class Server(xmlrpc_server.SimpleXMLRPCServer):
-    def __init__(self, paramSource, resultSinc, barFeed, address, port, autoStop=True, batchSize=200):
-        assert batchSize > 0, "Invalid batch size"
-
+class Server(xmlrpc_server.SimpleXMLRPCServer, server.BaseServer):
+    def __init__(
+        self, paramSource, resultSinc, barFeed, address, port, autoStop=True, batchSize=200,
+        targetJobDuration=jobs.DEFAULT_TARGET_JOB_DURATION, leaseTimeout=jobs.DEFAULT_LEASE_TIMEOUT, resultCache=None
+    ):
         xmlrpc_server.SimpleXMLRPCServer.__init__(
             self, (address, port), requestHandler=RequestHandler, logRequests=False, allow_none=True
         )
-        # super(Server, self).__init__(
-        # (address, port), requestHandler=RequestHandler, logRequests=False, allow_none=True
-        # )
-
-        self.__batchSize = batchSize
-        self.__paramSource = paramSource
-        self.__resultSinc = resultSinc
-        self.__barFeed = barFeed
-        self.__instrumentsAndBars = None  # Serialized instruments and bars for faster retrieval.
-        self.__barsFreq = None
-        self.__activeJobs = {}
-        self.__lock = threading.Lock()
-        self.__startedServingEvent = threading.Event()
-        self.__forcedStop = False
-        self.__bestResult = None
-        if autoStop:
-            self.__autoStopThread = AutoStopThread(self)
-        else:
-            self.__autoStopThread = None
+        server.BaseServer.__init__(
+            self, paramSource, resultSinc, barFeed, autoStop=autoStop, batchSize=batchSize,
+            targetJobDuration=targetJobDuration, leaseTimeout=leaseTimeout, resultCache=resultCache
+        )
 
         self.register_introspection_functions()
         self.register_function(self.getInstrumentsAndBars, 'getInstrumentsAndBars')
         self.register_function(self.getBarsFrequency, 'getBarsFrequency')
         self.register_function(self.getNextJob, 'getNextJob')
         self.register_function(self.pushJobResults, 'pushJobResults')
+        self.register_function(self.reportProgress, 'reportProgress')
+        self.register_function(self.getDatasetManifest, 'getDatasetManifest')
+        self.register_function(self.getDatasetChunk, 'getDatasetChunk')
 
     def getInstrumentsAndBars(self):
-        return self.__instrumentsAndBars
-
-    def getBarsFrequency(self):
-        return str(self.__barsFreq)
-
-    def getNextJob(self):
-        ret = None
+        return self.getSerializedInstrumentsAndBars()
 
-        with self.__lock:
-            # Get the next set of parameters.
-            params = [p.args for p in self.__paramSource.getNext(self.__batchSize)]
+    def getDatasetManifest(self):
+        return serialization.dumps(self.getDataset().getManifest())
 
-            # Map the active job
-            if len(params):
-                ret = Job(params)
-                self.__activeJobs[ret.getId()] = ret
+    def getDatasetChunk(self, chunkHash):
+        return serialization.dumps(self.getDataset().getChunk(chunkHash))
 
-        return serialization.dumps(ret)
-
-    def jobsPending(self):
-        if self.__forcedStop:
-            return False
+    def getBarsFrequency(self):
+        return str(self.getFrequency())
 
-        with self.__lock:
-            jobsPending = not self.__paramSource.eof()
-            activeJobs = len(self.__activeJobs) > 0
+    def getNextJob(self, workerName=None):
+        # Older workers don't identify themselves.
+        if workerName is not None:
+            workerName = serialization.loads(workerName)
+        return serialization.dumps(self.getJobManager().getNextJob(workerName))
 
-        return jobsPending or activeJobs
+    def reportProgress(self, jobId, processedCount, workerName):
+        jobId = serialization.loads(jobId)
+        workerName = serialization.loads(workerName)
+        return self.getJobManager().reportProgress(jobId, processedCount, workerName)
 
-    def pushJobResults(self, jobId, result, parameters, workerName):
+    def pushJobResults(self, jobId, result, parameters, workerName, allResults=None):
         jobId = serialization.loads(jobId)
         result = serialization.loads(result)
         parameters = serialization.loads(parameters)
-
-        # Remove the job mapping.
-        with self.__lock:
-            try:
-                del self.__activeJobs[jobId]
-            except KeyError:
-                # The job's results were already submitted.
-                return
-
-            if self.__bestResult is None or result > self.__bestResult:
-                logger.info("Best result so far %s with parameters %s" % (result, parameters))
-                self.__bestResult = result
-
-        self.__resultSinc.push(result, base.Parameters(*parameters))
-
-    def waitServing(self, timeout=None):
-        return self.__startedServingEvent.wait(timeout)
-
-    def stop(self):
-        self.shutdown()
-
-    def serve(self):
-        try:
-            # Initialize instruments, bars and parameters.
-            logger.info("Loading bars")
-            loadedBars = []
-            for dateTime, bars in self.__barFeed:
-                loadedBars.append(bars)
-            instruments = self.__barFeed.getRegisteredInstruments()
-            self.__instrumentsAndBars = serialization.dumps((instruments, loadedBars))
-            self.__barsFreq = self.__barFeed.getFrequency()
-
-            if self.__autoStopThread:
-                self.__autoStopThread.start()
-
-            logger.info("Started serving")
-            self.__startedServingEvent.set()
-            self.serve_forever()
-            logger.info("Finished serving")
-
-            if self.__autoStopThread:
-                self.__autoStopThread.join()
-        finally:
-            self.__forcedStop = True
+        workerName = serialization.loads(workerName)
+        # Older workers only push the best result.
+        if allResults is not None:
+            allResults = serialization.loads(allResults)
+        self.getJobManager().pushJobResults(jobId, result, parameters, workerName, allResults)
@@ -21,10 +21,19 @@
 import talib
 import numpy
 
+from pyalgotrade import dataseries
+
 
 # Returns the last values of a dataseries as a numpy.array, or None if not enough values could be retrieved from the dataseries.
 def value_ds_to_numpy(ds, count):
     ret = None
+    # Numeric dataseries already hold the values in a numpy.array, so there is no need to copy them.
+    if isinstance(ds, dataseries.NumericDataSeries):
+        values = ds.asarray()[count*-1:]
+        if not numpy.isnan(values).any():
+            ret = values
+        return ret
+
     try:
         values = ds[count*-1:]
         ret = numpy.array([float(value) for value in values])
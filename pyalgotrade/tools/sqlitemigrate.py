@@ -0,0 +1,43 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import argparse
+
+from pyalgotrade.barfeed import sqlitechunkfeed
+import pyalgotrade.logger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copies bars from a SQLite bar database into a chunked one")
+
+    parser.add_argument("--src", required=True, help="The path to the existing database")
+    parser.add_argument("--dst", required=True, help="The path to the chunked database")
+    parser.add_argument("--chunk-size", default=sqlitechunkfeed.CHUNK_MONTH, choices=[
+                        sqlitechunkfeed.CHUNK_DAY, sqlitechunkfeed.CHUNK_MONTH], help="The time span for each chunk")
+
+    args = parser.parse_args()
+
+    logger = pyalgotrade.logger.getLogger("sqlitemigrate")
+    count = sqlitechunkfeed.migrate(args.src, args.dst, args.chunk_size)
+    logger.info("%d bars copied to %s" % (count, args.dst))
+
+
+if __name__ == "__main__":
+    main()
@@ -57,51 +57,56 @@ def intersect(values1, values2, skipNone=False):
 
 
 # Like a collections.deque but using a numpy.array.
+# Values are appended to a buffer with room for maxLen * 2 values. Once the buffer is full, the last values are copied
+# to a new one, so appending is O(1) amortized. Values in a buffer are never overwritten, so views returned by data()
+# don't change when more values are appended.
 class NumPyDeque(object):
     def __init__(self, maxLen, dtype=float):
         assert maxLen > 0, "Invalid maximum length"
 
-        self.__values = np.empty(maxLen, dtype=dtype)
+        self.__values = np.empty(maxLen * 2, dtype=dtype)
         self.__maxLen = maxLen
-        self.__nextPos = 0
+        # The values are the ones in [start, end).
+        self.__start = 0
+        self.__end = 0
 
     def getMaxLen(self):
         return self.__maxLen
 
     def append(self, value):
-        if self.__nextPos < self.__maxLen:
-            self.__values[self.__nextPos] = value
-            self.__nextPos += 1
-        else:
-            # Shift items to the left and put the last value.
-            # I'm not using np.roll to avoid creating a new array.
-            self.__values[0:-1] = self.__values[1:]
-            self.__values[self.__nextPos - 1] = value
+        if self.__end == len(self.__values):
+            # A new buffer instead of moving the values, since there may be views on this one.
+            count = self.__maxLen - 1
+            values = np.empty(self.__maxLen * 2, dtype=self.__values.dtype)
+            values[0:count] = self.__values[self.__end - count:self.__end]
+            self.__values = values
+            self.__start = 0
+            self.__end = count
+
+        self.__values[self.__end] = value
+        self.__end += 1
+        if self.__end - self.__start > self.__maxLen:
+            self.__start += 1
 
     def data(self):
-        # If all values are not initialized, return a portion of the array.
-        if self.__nextPos < self.__maxLen:
-            ret = self.__values[0:self.__nextPos]
-        else:
-            ret = self.__values
-        return ret
+        return self.__values[self.__start:self.__end]
 
     def resize(self, maxLen):
         assert maxLen > 0, "Invalid maximum length"
 
         # Create empty, copy last values and swap.
-        values = np.empty(maxLen, dtype=self.__values.dtype)
-        lastValues = self.__values[0:self.__nextPos]
-        values[0:min(maxLen, len(lastValues))] = lastValues[-1 *
-                                                            min(maxLen, len(lastValues)):]
+        values = np.empty(maxLen * 2, dtype=self.__values.dtype)
+        lastValues = self.data()
+        count = min(maxLen, len(lastValues))
+        values[0:count] = lastValues[len(lastValues) - count:]
         self.__values = values
 
         self.__maxLen = maxLen
-        if self.__nextPos >= self.__maxLen:
-            self.__nextPos = self.__maxLen
+        self.__start = 0
+        self.__end = count
 
     def __len__(self):
-        return self.__nextPos
+        return self.__end - self.__start
 
     def __getitem__(self, key):
         return self.data()[key]
@@ -110,36 +115,82 @@ class NumPyDeque(object):
 # I'm not using collections.deque because:
 # 1: Random access is slower.
 # 2: Slicing is not supported.
+# Values are appended to a list until it gets full. From then on it works as a circular buffer with every value stored
+# twice, at pos and pos + maxLen, so that slices never need to wrap around.
 class ListDeque(object):
     def __init__(self, maxLen):
         assert maxLen > 0, "Invalid maximum length"
 
         self.__values = []
         self.__maxLen = maxLen
+        # Position of the oldest value once the buffer wrapped around.
+        self.__start = 0
+        self.__wrapped = False
+        # A copy of the values in order, returned by data() until the next append.
+        self.__data = None
 
     def getMaxLen(self):
         return self.__maxLen
 
     def append(self, value):
-        self.__values.append(value)
-        # Check bounds
-        if len(self.__values) > self.__maxLen:
-            self.__values.pop(0)
+        values = self.__values
+        maxLen = self.__maxLen
+        self.__data = None
+        if not self.__wrapped:
+            if len(values) < maxLen:
+                values.append(value)
+                return
+            # Mirror the values before overwriting the oldest one for the first time.
+            values.extend(values)
+            self.__wrapped = True
+
+        # Overwrite the oldest value.
+        start = self.__start
+        values[start] = value
+        values[start + maxLen] = value
+        start += 1
+        if start == maxLen:
+            start = 0
+        self.__start = start
 
     def data(self):
-        return self.__values
+        # Returns a list with the values that doesn't change when more values are appended.
+        if self.__data is None:
+            if self.__wrapped:
+                self.__data = self.__values[self.__start:self.__start + self.__maxLen]
+            else:
+                self.__data = list(self.__values)
+        return self.__data
 
     def resize(self, maxLen):
         assert maxLen > 0, "Invalid maximum length"
 
+        self.__values = self.data()[-1 * maxLen:]
         self.__maxLen = maxLen
-        self.__values = self.__values[-1 * maxLen:]
+        self.__start = 0
+        self.__wrapped = False
+        self.__data = None
 
     def __len__(self):
+        if self.__wrapped:
+            return self.__maxLen
         return len(self.__values)
 
     def __getitem__(self, key):
-        return self.__values[key]
+        if not self.__wrapped:
+            return self.__values[key]
+
+        if isinstance(key, slice):
+            begin, end, step = key.indices(self.__maxLen)
+            if step > 0:
+                return self.__values[self.__start + begin:self.__start + end:step]
+            return self.data()[key]
+
+        if key < 0:
+            key += self.__maxLen
+        if key < 0 or key >= self.__maxLen:
+            raise IndexError("Index out of range")
+        return self.__values[self.__start + key]
 
 
 def get(object, key):
@@ -0,0 +1,213 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+import shutil
+
+from . import common
+
+from pyalgotrade import bar
+from pyalgotrade import marketsession
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import ninjatraderfeed
+from pyalgotrade.barfeed import quandlfeed
+from pyalgotrade.barfeed import yahoofeed
+
+
+def load_bars(barFeed, instrument="orcl"):
+    return [bars[instrument] for dateTime, bars in barFeed]
+
+
+class CustomBar(bar.BasicBar):
+    pass
+
+
+class BarCacheTestCase(common.TestCase):
+    def assertSameBars(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        for expectedBar, actualBar in zip(expected, actual):
+            self.assertEqual(expectedBar.getDateTime(), actualBar.getDateTime())
+            self.assertEqual(expectedBar.getDateTime().tzinfo, actualBar.getDateTime().tzinfo)
+            self.assertEqual(expectedBar.getOpen(), actualBar.getOpen())
+            self.assertEqual(expectedBar.getHigh(), actualBar.getHigh())
+            self.assertEqual(expectedBar.getLow(), actualBar.getLow())
+            self.assertEqual(expectedBar.getClose(), actualBar.getClose())
+            self.assertEqual(expectedBar.getVolume(), actualBar.getVolume())
+            self.assertEqual(expectedBar.getAdjClose(), actualBar.getAdjClose())
+            self.assertEqual(expectedBar.getFrequency(), actualBar.getFrequency())
+            self.assertEqual(expectedBar.getExtraColumns(), actualBar.getExtraColumns())
+
+    def __testCachedBars(self, fileName, buildFeed):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, fileName)
+            shutil.copy2(common.get_data_file_path(fileName), path)
+            cachePath = barcache.get_cache_path(path)
+
+            barFeed = buildFeed()
+            barFeed.addBarsFromCSV("orcl", path)
+            expected = load_bars(barFeed)
+            self.assertFalse(os.path.exists(cachePath))
+
+            barFeed = buildFeed()
+            barFeed.setUseCache(True)
+            barFeed.addBarsFromCSV("orcl", path)
+            self.assertTrue(os.path.exists(cachePath))
+            self.assertSameBars(expected, load_bars(barFeed))
+
+            # Overwrite the cache file with a different bar to check that it actually gets used.
+            self.assertTrue(barcache.save_bars(cachePath, barcache.load_header(cachePath), expected[:1]))
+            barFeed = buildFeed()
+            barFeed.setUseCache(True)
+            barFeed.addBarsFromCSV("orcl", path)
+            self.assertSameBars(expected[:1], load_bars(barFeed))
+
+            # The cache file should be ignored if the CSV file changes.
+            stat = os.stat(path)
+            os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+            barFeed = buildFeed()
+            barFeed.setUseCache(True)
+            barFeed.addBarsFromCSV("orcl", path)
+            self.assertSameBars(expected, load_bars(barFeed))
+        return expected
+
+    def testYahoo(self):
+        bars = self.__testCachedBars(
+            "orcl-2000-yahoofinance.csv", lambda: yahoofeed.Feed(timezone=marketsession.USEquities.getTimezone())
+        )
+        self.assertEqual(len(bars), 252)
+
+    def testNinjaTrader(self):
+        bars = self.__testCachedBars(
+            "nt-spy-minute-2011-03.csv", lambda: ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE)
+        )
+        self.assertEqual(bars[0].getAdjClose(), None)
+
+    def testQuandl(self):
+        bars = self.__testCachedBars("WIKI-ORCL-2000-quandl.csv", lambda: quandlfeed.Feed())
+        self.assertEqual(bars[-1].getExtraColumns()["Split Ratio"], 1.0)
+
+    def testSettingsChange(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "orcl-2000-yahoofinance.csv")
+            shutil.copy2(common.get_data_file_path("orcl-2000-yahoofinance.csv"), path)
+
+            barFeed = yahoofeed.Feed()
+            barFeed.setUseCache(True)
+            barFeed.addBarsFromCSV("orcl", path)
+            self.assertEqual(load_bars(barFeed)[0].getDateTime(), datetime.datetime(2000, 1, 3))
+
+            barFeed = yahoofeed.Feed()
+            barFeed.setUseCache(True)
+            barFeed.setDailyBarTime(datetime.time(16))
+            barFeed.addBarsFromCSV("orcl", path)
+            self.assertEqual(load_bars(barFeed)[0].getDateTime(), datetime.datetime(2000, 1, 3, 16))
+
+    def testCorruptCache(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "orcl-2000-yahoofinance.csv")
+            shutil.copy2(common.get_data_file_path("orcl-2000-yahoofinance.csv"), path)
+            cachePath = barcache.get_cache_path(path)
+
+            barFeed = yahoofeed.Feed()
+            barFeed.addBarsFromCSV("orcl", path)
+            expected = load_bars(barFeed)
+
+            barFeed = yahoofeed.Feed()
+            barFeed.setUseCache(True)
+            barFeed.addBarsFromCSV("orcl", path)
+            with open(cachePath, "rb") as f:
+                cacheContent = f.read()
+
+            # Garbage, and a cache file that got truncated while being written.
+            for content in [b"garbage" * 100, cacheContent[:len(cacheContent) // 2]]:
+                with open(cachePath, "wb") as f:
+                    f.write(content)
+                barFeed = yahoofeed.Feed()
+                barFeed.setUseCache(True)
+                barFeed.addBarsFromCSV("orcl", path)
+                self.assertSameBars(expected, load_bars(barFeed))
+
+    def testFilterAppliedToCachedBars(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "orcl-2000-yahoofinance.csv")
+            shutil.copy2(common.get_data_file_path("orcl-2000-yahoofinance.csv"), path)
+
+            for i in range(2):
+                barFeed = yahoofeed.Feed()
+                barFeed.setUseCache(True)
+                barFeed.setBarFilter(csvfeed.DateRangeFilter(datetime.datetime(2000, 3, 1), datetime.datetime(2000, 3, 31)))
+                barFeed.addBarsFromCSV("orcl", path)
+                bars = load_bars(barFeed)
+                self.assertEqual(bars[0].getDateTime(), datetime.datetime(2000, 3, 1))
+                self.assertEqual(bars[-1].getDateTime(), datetime.datetime(2000, 3, 31))
+
+    def testGenericAdjClose(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.csv")
+            with open(path, "w") as f:
+                f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+                f.write("2000-01-03 00:00:00,10,12,9,11,100,\n")
+
+            for i in range(2):
+                barFeed = csvfeed.GenericBarFeed(bar.Frequency.DAY)
+                barFeed.setUseCache(True)
+                with self.assertRaisesRegexp(Exception, "Previous bars had adjusted close and these ones don't have.*"):
+                    barFeed.addBarsFromCSV("orcl", path)
+                self.assertTrue(os.path.exists(barcache.get_cache_path(path)))
+
+    def testParallelLoading(self):
+        with common.TmpDir() as tmpPath:
+            instrumentToPath = {}
+            for instrument in ["orcl", "orcl-2"]:
+                instrumentToPath[instrument] = os.path.join(tmpPath, "%s.csv" % instrument)
+                shutil.copy2(common.get_data_file_path("WIKI-ORCL-2000-quandl.csv"), instrumentToPath[instrument])
+
+            expected = quandlfeed.Feed()
+            expected.addBarsFromCSV("orcl", instrumentToPath["orcl"])
+            expected = load_bars(expected)
+
+            # The first time the cache files get written by the workers, and the second time they get loaded.
+            for i in range(2):
+                barFeed = quandlfeed.Feed()
+                barFeed.setUseCache(True)
+                barFeed.addBarsFromCSVFiles(instrumentToPath, processes=2)
+                self.assertTrue(barFeed.barsHaveAdjClose())
+                for path in instrumentToPath.values():
+                    self.assertTrue(os.path.exists(barcache.get_cache_path(path)))
+                bars = [(bars["orcl"], bars["orcl-2"]) for dateTime, bars in barFeed]
+                self.assertSameBars(expected, [bar1 for bar1, bar2 in bars])
+                self.assertSameBars(expected, [bar2 for bar1, bar2 in bars])
+
+    def testParallelLoadingWithBarClass(self):
+        instrumentToPath = {
+            "orcl": common.get_data_file_path("WIKI-ORCL-2000-quandl.csv"),
+            "orcl-2": common.get_data_file_path("WIKI-ORCL-2000-quandl.csv"),
+        }
+        barFeed = quandlfeed.Feed()
+        barFeed.setBarClass(CustomBar)
+        barFeed.addBarsFromCSVFiles(instrumentToPath, processes=2)
+        barCount = 0
+        for dateTime, bars in barFeed:
+            for instrument in bars.getInstruments():
+                self.assertIsInstance(bars[instrument], CustomBar)
+                barCount += 1
+        self.assertGreater(barCount, 0)
@@ -24,6 +24,7 @@ from . import common
 
 from pyalgotrade import barfeed
 from pyalgotrade.barfeed import common as bfcommon
+from pyalgotrade.barfeed import membf
 from pyalgotrade import bar
 from pyalgotrade import dispatcher
 
@@ -81,6 +82,71 @@ class OptimizerBarFeedTestCase(common.TestCase):
         self.assertEquals(barFeed.barsHaveAdjClose(), False)
 
 
+class MemBarFeed(membf.BarFeed):
+    def barsHaveAdjClose(self):
+        return True
+
+
+def build_bar(dateTime):
+    return bar.BasicBar(dateTime, 1, 1, 1, 1, 1, 1, bar.Frequency.DAY)
+
+
+class MemBarFeedTestCase(common.TestCase):
+    def testMerge(self):
+        barFeed = MemBarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromSequence("orcl", [build_bar(datetime.datetime(2001, 1, day)) for day in [1, 3, 4]])
+        barFeed.addBarsFromSequence("ibm", [build_bar(datetime.datetime(2001, 1, day)) for day in [2, 3]])
+        barFeed.addBarsFromSequence("aapl", [build_bar(datetime.datetime(2001, 1, day)) for day in [3, 5]])
+
+        self.assertEqual(barFeed.peekDateTime(), datetime.datetime(2001, 1, 1))
+        values = []
+        for dateTime, bars in barFeed:
+            values.append((dateTime.day, bars.getInstruments()))
+        self.assertEqual(values, [
+            (1, ["orcl"]),
+            (2, ["ibm"]),
+            (3, ["orcl", "ibm", "aapl"]),
+            (4, ["orcl"]),
+            (5, ["aapl"]),
+        ])
+        self.assertTrue(barFeed.eof())
+        self.assertEqual(barFeed.peekDateTime(), None)
+
+        barFeed.reset()
+        self.assertFalse(barFeed.eof())
+        self.assertEqual(len([dateTime for dateTime, bars in barFeed]), 5)
+
+    def testDuplicateBars(self):
+        barFeed = MemBarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromSequence("orcl", [build_bar(datetime.datetime(2001, 1, day)) for day in [1, 2, 2]])
+        barFeed.addBarsFromSequence("ibm", [build_bar(datetime.datetime(2001, 1, day)) for day in [1, 2, 3]])
+        with self.assertRaisesRegexp(Exception, "Duplicate bars found for \\['orcl'\\].*"):
+            for dateTime, bars in barFeed:
+                pass
+
+    def testAddInChunks(self):
+        barFeed = MemBarFeed(bar.Frequency.DAY)
+        # In order, after the existing ones, before the existing ones, interleaved and unsorted.
+        barFeed.addBarsFromSequence("orcl", [build_bar(datetime.datetime(2001, 1, day)) for day in [10, 11]])
+        barFeed.addBarsFromSequence("orcl", [build_bar(datetime.datetime(2001, 1, day)) for day in [12, 14]])
+        barFeed.addBarsFromSequence("orcl", [build_bar(datetime.datetime(2001, 1, day)) for day in [1, 2]])
+        barFeed.addBarsFromSequence("orcl", [build_bar(datetime.datetime(2001, 1, day)) for day in [3, 13, 20]])
+        barFeed.addBarsFromSequence("orcl", [build_bar(datetime.datetime(2001, 1, day)) for day in [5, 4]])
+        barFeed.addBarsFromSequence("orcl", [])
+        self.assertEqual([dateTime.day for dateTime, bars in barFeed], [1, 2, 3, 4, 5, 10, 11, 12, 13, 14, 20])
+
+    def testMergeSorted(self):
+        bars1 = [build_bar(datetime.datetime(2001, 1, day)) for day in [1, 2, 4]]
+        bars2 = [build_bar(datetime.datetime(2001, 1, day)) for day in [2, 3, 5]]
+        merged = membf.merge_sorted(bars1, bars2)
+        self.assertEqual([bar_.getDateTime().day for bar_ in merged], [1, 2, 2, 3, 4, 5])
+        # On ties, bars that were there first go first.
+        self.assertTrue(merged[1] is bars1[1])
+        self.assertTrue(merged[2] is bars2[0])
+        self.assertTrue(membf.is_sorted(merged))
+        self.assertFalse(membf.is_sorted(list(reversed(merged))))
+
+
 class CommonTestCase(common.TestCase):
     def testSanitize(self):
         self.assertEqual(bfcommon.sanitize_ohlc(10, 12, 9, 10), (10, 12, 9, 10))
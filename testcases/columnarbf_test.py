@@ -0,0 +1,351 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+
+import numpy as np
+
+from . import common
+from . import barfeed_test
+from . import feed_test
+from . import smacrossover_strategy_test
+
+from pyalgotrade import bar
+from pyalgotrade import dataseries
+from pyalgotrade.barfeed import columnarbf
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.technical import atr
+from pyalgotrade.utils import dt
+from pyalgotrade import marketsession
+
+
+def load_yahoo_bars(fileName, instrument="orcl"):
+    barFeed = yahoofeed.Feed()
+    barFeed.addBarsFromCSV(instrument, common.get_data_file_path(fileName))
+    return [bars[instrument] for dateTime, bars in barFeed]
+
+
+class ColumnarBarFeedTestCase(common.TestCase):
+    def testBaseBarFeed(self):
+        barFeed = columnarbf.BarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromSequence("orcl", load_yahoo_bars("orcl-2000-yahoofinance.csv"))
+        barfeed_test.check_base_barfeed(self, barFeed, True)
+
+    def testBaseFeedInterface(self):
+        barFeed = columnarbf.BarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromSequence("orcl", load_yahoo_bars("orcl-2000-yahoofinance.csv"))
+        feed_test.tstBaseFeedInterface(self, barFeed)
+
+    def testSameBarsAsMemFeed(self):
+        expected = load_yahoo_bars("orcl-2000-yahoofinance.csv")
+        barFeed = columnarbf.BarFeed(bar.Frequency.DAY)
+        # Add the bars in two chunks, out of order.
+        barFeed.addBarsFromSequence("orcl", expected[100:])
+        barFeed.addBarsFromSequence("orcl", expected[:100])
+
+        count = 0
+        for dateTime, bars in barFeed:
+            expectedBar = expected[count]
+            bar_ = bars["orcl"]
+            self.assertEqual(dateTime, expectedBar.getDateTime())
+            self.assertEqual(bar_.getDateTime(), expectedBar.getDateTime())
+            self.assertEqual(
+                [bar_.getOpen(), bar_.getHigh(), bar_.getLow(), bar_.getClose(), bar_.getVolume(), bar_.getAdjClose()],
+                [
+                    expectedBar.getOpen(), expectedBar.getHigh(), expectedBar.getLow(), expectedBar.getClose(),
+                    expectedBar.getVolume(), expectedBar.getAdjClose()
+                ]
+            )
+            self.assertTrue(bars.getBar("orcl") is bar_)
+            count += 1
+        self.assertEqual(count, len(expected))
+        self.assertEqual(barFeed["orcl"].getCloseDataSeries()[-1], expected[-1].getClose())
+
+    def testStrategy(self):
+        barFeed = columnarbf.BarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromSequence("orcl", load_yahoo_bars("orcl-2001-yahoofinance.csv"))
+        strat = smacrossover_strategy_test.MarketOrderStrategy(barFeed, 10, 25)
+        strat.run()
+        self.assertEqual(round(strat.getFinalValue(), 2), 1000 - 22.7)
+
+    def testMultipleInstruments(self):
+        barFeed = columnarbf.BarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromArrays(
+            "orcl",
+            [datetime.datetime(2001, 1, day) for day in [1, 3]],
+            [1, 3], [1, 3], [1, 3], [1, 3], [10, 30]
+        )
+        barFeed.addBarsFromArrays(
+            "ibm",
+            np.array(["2001-01-02", "2001-01-03"], dtype="datetime64[ns]"),
+            [2, 3], [2, 3], [2, 3], [2, 3], [20, 30], [2, 3]
+        )
+        self.assertFalse(barFeed.barsHaveAdjClose())
+        self.assertEqual(len(barFeed.getDateTimesAsArray()), 3)
+        self.assertEqual(barFeed.peekDateTimes(), [datetime.datetime(2001, 1, day) for day in [1, 2, 3]])
+
+        values = []
+        for dateTime, bars in barFeed:
+            values.append((dateTime.day, bars.getInstruments(), [bars[instrument].getVolume() for instrument in bars.getInstruments()]))
+            self.assertEqual(bars.getBar("msft"), None)
+            self.assertFalse("msft" in bars)
+        self.assertEqual(values, [
+            (1, ["orcl"], [10]),
+            (2, ["ibm"], [20]),
+            (3, ["orcl", "ibm"], [30, 30]),
+        ])
+        self.assertEqual(barFeed.getLastBar("ibm").getAdjClose(), 3)
+        self.assertEqual(barFeed.getLastBar("orcl").getAdjClose(), None)
+
+    def testBarsAreOnlyBuiltWhenAccessed(self):
+        built = []
+
+        def build_bar(*args, **kwargs):
+            ret = buildBar(*args, **kwargs)
+            built.append(ret)
+            return ret
+
+        bars = load_yahoo_bars("orcl-2000-yahoofinance.csv")
+        barFeed = columnarbf.BarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromSequence("orcl", bars)
+        barFeed.addBarsFromSequence("ibm", bars[::2])
+        buildBar = columnarbf.build_bar
+        columnarbf.build_bar = build_bar
+        try:
+            closes = barFeed["orcl"].getCloseDataSeries()
+            atr_ = atr.ATR(barFeed["ibm"], 14)
+            for dateTime, currentBars in barFeed:
+                pass
+            # Only the ibm bars are built, for the ATR.
+            self.assertEqual(len(built), len(bars[::2]))
+            self.assertEqual(closes[:], [bar_.getClose() for bar_ in bars[-len(closes):]])
+            self.assertEqual(len(built), len(bars[::2]))
+            self.assertIsNotNone(atr_[-1])
+
+            del built[:]
+            lastBar = barFeed.getLastBar("orcl")
+            self.assertTrue(lastBar is currentBars["orcl"])
+            self.assertTrue(barFeed["orcl"][-1] is lastBar)
+            self.assertEqual(barFeed["orcl"][-2].getClose(), bars[-2].getClose())
+            self.assertEqual(len(built), 2)
+        finally:
+            columnarbf.build_bar = buildBar
+
+    def testSparseInstruments(self):
+        barFeed = columnarbf.BarFeed(bar.Frequency.DAY)
+        # Instruments with bars on different dates.
+        for instrument, month, prices in [("orcl", 1, [1, 2]), ("ibm", 2, [3, 4])]:
+            dateTimes = [datetime.datetime(2001, month, day) for day in [1, 2]]
+            barFeed.addBarsFromArrays(instrument, dateTimes, prices, prices, prices, prices, prices)
+        values = []
+        for dateTime, bars in barFeed:
+            values.append((dateTime, [bars[instrument].getClose() for instrument in bars.getInstruments()]))
+        self.assertEqual(values, [
+            (datetime.datetime(2001, 1, 1), [1]),
+            (datetime.datetime(2001, 1, 2), [2]),
+            (datetime.datetime(2001, 2, 1), [3]),
+            (datetime.datetime(2001, 2, 2), [4]),
+        ])
+        self.assertEqual(barFeed.getLastBar("orcl").getClose(), 2)
+        self.assertEqual(barFeed["orcl"].getDateTimes(), [datetime.datetime(2001, 1, day) for day in [1, 2]])
+        self.assertEqual(barFeed["ibm"].getCloseDataSeries()[:], [3, 4])
+
+    def testLocalizedDateTimes(self):
+        timezone = marketsession.USEquities.getTimezone()
+        barFeed = columnarbf.BarFeed(bar.Frequency.DAY, timezone)
+        barFeed.addBarsFromArrays("orcl", [datetime.datetime(2001, 1, 2, 16)], [1], [1], [1], [1], [1])
+        dateTime = barFeed.peekDateTime()
+        self.assertEqual(dateTime, dt.localize(datetime.datetime(2001, 1, 2, 16), timezone))
+        self.assertEqual(dt.unlocalize(dateTime), datetime.datetime(2001, 1, 2, 16))
+
+    def testInvalidOHLC(self):
+        barFeed = columnarbf.BarFeed(bar.Frequency.DAY)
+        with self.assertRaisesRegexp(Exception, "high < low on 2001-01-02 00:00:00"):
+            barFeed.addBarsFromArrays(
+                "orcl",
+                [datetime.datetime(2001, 1, 1), datetime.datetime(2001, 1, 2)],
+                [1, 1], [1, 1], [1, 2], [1, 1], [1, 1]
+            )
+        with self.assertRaisesRegexp(Exception, "low > close on 2001-01-01 00:00:00"):
+            barFeed.addBarsFromArrays("orcl", [datetime.datetime(2001, 1, 1)], [2], [2], [2], [1], [1])
+
+    def testDuplicateBars(self):
+        barFeed = columnarbf.BarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromArrays("orcl", [datetime.datetime(2001, 1, 1)], [1], [1], [1], [1], [1])
+        barFeed.addBarsFromArrays("orcl", [datetime.datetime(2001, 1, 1)], [1], [1], [1], [1], [1])
+        with self.assertRaisesRegexp(Exception, "Duplicate bars found for.*"):
+            barFeed.loadAll()
+
+    def testAddAfterStart(self):
+        barFeed = columnarbf.BarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromArrays("orcl", [datetime.datetime(2001, 1, 1)], [1], [1], [1], [1], [1])
+        barFeed.loadAll()
+        with self.assertRaisesRegexp(Exception, "Can't add more bars once you started consuming bars"):
+            barFeed.addBarsFromArrays("orcl", [datetime.datetime(2001, 1, 2)], [1], [1], [1], [1], [1])
+
+
+def load_generic_bars(barFeed, fileName, instrument="orcl", timezone=None, skipMalformedBars=False):
+    barFeed.setColumnName("datetime", "Date")
+    barFeed.setDateTimeFormat("%Y-%m-%d")
+    barFeed.addBarsFromCSV(instrument, fileName, timezone=timezone, skipMalformedBars=skipMalformedBars)
+    return [(dateTime, bars[instrument]) for dateTime, bars in barFeed]
+
+
+def write_csv(path, rows):
+    with open(path, "w") as f:
+        f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+        for row in rows:
+            f.write(row + "\n")
+
+
+class GenericColumnarBarFeedTestCase(common.TestCase):
+    def assertSameBars(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        for (expectedDateTime, expectedBar), (actualDateTime, actualBar) in zip(expected, actual):
+            self.assertEqual(expectedDateTime, actualDateTime)
+            self.assertEqual(expectedBar.getDateTime(), actualBar.getDateTime())
+            self.assertEqual(expectedBar.getOpen(), actualBar.getOpen())
+            self.assertEqual(expectedBar.getHigh(), actualBar.getHigh())
+            self.assertEqual(expectedBar.getLow(), actualBar.getLow())
+            self.assertEqual(expectedBar.getClose(), actualBar.getClose())
+            self.assertEqual(expectedBar.getVolume(), actualBar.getVolume())
+            self.assertEqual(expectedBar.getAdjClose(), actualBar.getAdjClose())
+
+    def testSameBarsAsGenericBarFeed(self):
+        path = common.get_data_file_path("orcl-2000-yahoofinance.csv")
+        expected = load_generic_bars(csvfeed.GenericBarFeed(bar.Frequency.DAY), path)
+        actual = load_generic_bars(csvfeed.GenericColumnarBarFeed(bar.Frequency.DAY), path)
+        self.assertEqual(len(actual), 252)
+        self.assertSameBars(expected, actual)
+
+    def testWithTimezoneAndDailyBarTime(self):
+        path = common.get_data_file_path("orcl-2000-yahoofinance.csv")
+        timezone = marketsession.USEquities.getTimezone()
+        expected = csvfeed.GenericBarFeed(bar.Frequency.DAY)
+        expected.setDailyBarTime(datetime.time(16, 30))
+        expected = load_generic_bars(expected, path, timezone=timezone)
+        actual = csvfeed.GenericColumnarBarFeed(bar.Frequency.DAY)
+        actual.setDailyBarTime(datetime.time(16, 30))
+        actual = load_generic_bars(actual, path, timezone=timezone)
+        self.assertEqual(actual[0][0], dt.localize(datetime.datetime(2000, 1, 3, 16, 30), timezone))
+        self.assertSameBars(expected, actual)
+
+    def testSlowDateTimeFormat(self):
+        with common.TmpDir() as tmpPath:
+            # Rewrite the datetimes using a format that is not supported by the fast path.
+            path = os.path.join(tmpPath, "bars.csv")
+            with open(common.get_data_file_path("orcl-2000-yahoofinance.csv")) as f:
+                lines = f.read().splitlines()
+            write_csv(path, [
+                datetime.datetime.strptime(line[:10], "%Y-%m-%d").strftime("%d-%b-%y") + line[10:]
+                for line in lines[1:]
+            ])
+
+            expected = csvfeed.GenericBarFeed(bar.Frequency.DAY)
+            actual = csvfeed.GenericColumnarBarFeed(bar.Frequency.DAY)
+            for barFeed in [expected, actual]:
+                barFeed.setDateTimeFormat("%d-%b-%y")
+                barFeed.addBarsFromCSV("orcl", path)
+            self.assertSameBars(
+                [(dateTime, bars["orcl"]) for dateTime, bars in expected],
+                [(dateTime, bars["orcl"]) for dateTime, bars in actual]
+            )
+
+    def testBarFilters(self):
+        path = common.get_data_file_path("orcl-2000-yahoofinance.csv")
+        filters = [
+            csvfeed.DateRangeFilter(datetime.datetime(2000, 3, 1), datetime.datetime(2000, 3, 31)),
+            # USEquitiesRTH doesn't implement includeBars.
+            csvfeed.USEquitiesRTH(datetime.datetime(2000, 3, 1), datetime.datetime(2000, 3, 31)),
+        ]
+        for barFilter in filters:
+            expected = csvfeed.GenericBarFeed(bar.Frequency.DAY)
+            expected.setBarFilter(barFilter)
+            expected = load_generic_bars(expected, path)
+            actual = csvfeed.GenericColumnarBarFeed(bar.Frequency.DAY)
+            actual.setBarFilter(barFilter)
+            actual = load_generic_bars(actual, path)
+            self.assertSameBars(expected, actual)
+
+    def testEmptyAdjClose(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.csv")
+            write_csv(path, [
+                "2000-01-03 00:00:00,10,12,9,11,100,",
+                "2000-01-04 00:00:00,11,13,10,12,200,",
+            ])
+            barFeed = csvfeed.GenericColumnarBarFeed(bar.Frequency.DAY)
+            barFeed.addBarsFromCSV("orcl", path)
+            bars = [bars["orcl"] for dateTime, bars in barFeed]
+        self.assertFalse(barFeed.barsHaveAdjClose())
+        self.assertEqual(len(bars), 2)
+        self.assertEqual(bars[1].getDateTime(), datetime.datetime(2000, 1, 4))
+        self.assertEqual(bars[1].getAdjClose(), None)
+
+    def testMalformedBars(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.csv")
+            write_csv(path, [
+                "2000-01-03 00:00:00,10,12,9,11,100,11",
+                "2000-01-04 00:00:00,-,13,10,12,200,12",
+                "2000-01-05 00:00:00,11,10,13,12,200,12",
+                "2000-01-06,11,13,10,12,200,12",
+                "2000-01-07 00:00:00,11,13,10,12,200",
+                "2000-01-10 00:00:00,11,13,10,12,300,12",
+            ])
+            barFeed = csvfeed.GenericColumnarBarFeed(bar.Frequency.DAY)
+            barFeed.addBarsFromCSV("orcl", path, skipMalformedBars=True)
+            dateTimes = [dateTime for dateTime, bars in barFeed]
+            self.assertEqual(dateTimes, [datetime.datetime(2000, 1, 3), datetime.datetime(2000, 1, 10)])
+
+            barFeed = csvfeed.GenericColumnarBarFeed(bar.Frequency.DAY)
+            with self.assertRaisesRegexp(Exception, "Expected columns.*"):
+                barFeed.addBarsFromCSV("orcl", path)
+
+    def testInvalidOHLC(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.csv")
+            write_csv(path, [
+                "2000-01-03 00:00:00,10,12,9,11,100,11",
+                "2000-01-05 00:00:00,11,10,13,12,200,12",
+            ])
+            barFeed = csvfeed.GenericColumnarBarFeed(bar.Frequency.DAY)
+            with self.assertRaisesRegexp(Exception, "high < low on 2000-01-05 00:00:00"):
+                barFeed.addBarsFromCSV("orcl", path)
+
+    def testParseFixedLayoutDateTimes(self):
+        dateTimes = csvfeed.parse_fixed_layout_datetimes(["2000-02-29 12:30:15", "1969-12-31 23:59:59"], "%Y-%m-%d %H:%M:%S")
+        self.assertEqual(
+            [dataseries.nanoseconds_to_datetime(value) for value in dateTimes],
+            [datetime.datetime(2000, 2, 29, 12, 30, 15), datetime.datetime(1969, 12, 31, 23, 59, 59)]
+        )
+        self.assertEqual(
+            dataseries.nanoseconds_to_datetime(csvfeed.parse_fixed_layout_datetimes(["20000229"], "%Y%m%d")[0]),
+            datetime.datetime(2000, 2, 29)
+        )
+        # Unsupported formats or values.
+        self.assertIsNone(csvfeed.parse_fixed_layout_datetimes(["31-Dec-10"], "%d-%b-%y"))
+        self.assertIsNone(csvfeed.parse_fixed_layout_datetimes(["2001-02-29"], "%Y-%m-%d"))
+        self.assertIsNone(csvfeed.parse_fixed_layout_datetimes(["2001-2-28"], "%Y-%m-%d"))
+        self.assertIsNone(csvfeed.parse_fixed_layout_datetimes(["2001/02/28"], "%Y-%m-%d"))
+        self.assertIsNone(csvfeed.parse_fixed_layout_datetimes(["2001-02-28", "2001-02-281"], "%Y-%m-%d"))
+        self.assertIsNone(csvfeed.parse_fixed_layout_datetimes(["2001-02-28 10:00:00"], "%Y-%m-%d"))
@@ -0,0 +1,152 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+
+from . import common
+from . import barfeed_test
+from . import feed_test
+
+from pyalgotrade import bar
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import ninjatraderfeed
+from pyalgotrade.barfeed import yahoofeed
+
+
+def write_sorted_copy(srcFileName, dstPath):
+    # Yahoo! Finance files are sorted in descending order.
+    with open(common.get_data_file_path(srcFileName)) as f:
+        lines = f.read().splitlines()
+    with open(dstPath, "w") as f:
+        f.write("\n".join([lines[0]] + sorted(lines[1:])) + "\n")
+    return dstPath
+
+
+def build_yahoo_row_parser():
+    return yahoofeed.RowParser(datetime.time(0, 0), bar.Frequency.DAY)
+
+
+class StreamingBarFeedTestCase(common.TestCase):
+    def testBaseBarFeed(self):
+        with common.TmpDir() as tmpPath:
+            barFeed = csvfeed.StreamingBarFeed(bar.Frequency.DAY)
+            path = write_sorted_copy("orcl-2000-yahoofinance.csv", os.path.join(tmpPath, "orcl.csv"))
+            barFeed.addBarsFromCSV("orcl", path, build_yahoo_row_parser())
+            barfeed_test.check_base_barfeed(self, barFeed, True)
+
+    def testBaseFeedInterface(self):
+        with common.TmpDir() as tmpPath:
+            barFeed = csvfeed.StreamingBarFeed(bar.Frequency.DAY)
+            path = write_sorted_copy("orcl-2000-yahoofinance.csv", os.path.join(tmpPath, "orcl.csv"))
+            barFeed.addBarsFromCSV("orcl", path, build_yahoo_row_parser())
+            feed_test.tstBaseFeedInterface(self, barFeed)
+
+    def testSameBarsAsMemFeed(self):
+        fileNames = {
+            "spy": "spy-2011-yahoofinance.csv",
+            "nikkei": "nikkei-2011-yahoofinance.csv",
+            "goog": "goog-2011-yahoofinance.csv",
+        }
+        expectedFeed = yahoofeed.Feed()
+        for instrument, fileName in fileNames.items():
+            expectedFeed.addBarsFromCSV(instrument, common.get_data_file_path(fileName))
+        expected = [(dateTime, bars) for dateTime, bars in expectedFeed]
+
+        with common.TmpDir() as tmpPath:
+            barFeed = csvfeed.StreamingBarFeed(bar.Frequency.DAY)
+            for instrument, fileName in fileNames.items():
+                path = write_sorted_copy(fileName, os.path.join(tmpPath, fileName))
+                barFeed.addBarsFromCSV(instrument, path, build_yahoo_row_parser())
+
+            for i in range(2):
+                actual = [(dateTime, bars) for dateTime, bars in barFeed]
+                self.assertEqual(len(actual), len(expected))
+                for (expectedDateTime, expectedBars), (actualDateTime, actualBars) in zip(expected, actual):
+                    self.assertEqual(expectedDateTime, actualDateTime)
+                    self.assertEqual(sorted(expectedBars.getInstruments()), sorted(actualBars.getInstruments()))
+                    for instrument in expectedBars.getInstruments():
+                        self.assertEqual(expectedBars[instrument].getClose(), actualBars[instrument].getClose())
+                        self.assertEqual(expectedBars[instrument].getAdjClose(), actualBars[instrument].getAdjClose())
+                barFeed.reset()
+
+    def testBarFilterAndNinjaTraderParser(self):
+        barFeed = csvfeed.StreamingBarFeed(bar.Frequency.MINUTE)
+        barFeed.setBarFilter(csvfeed.USEquitiesRTH())
+        barFeed.addBarsFromCSV(
+            "spy", common.get_data_file_path("nt-spy-minute-2011.csv"),
+            ninjatraderfeed.RowParser(bar.Frequency.MINUTE, None)
+        )
+        self.assertFalse(barFeed.barsHaveAdjClose())
+
+        expected = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE)
+        expected.setBarFilter(csvfeed.USEquitiesRTH())
+        expected.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011.csv"))
+
+        self.assertEqual(
+            [(dateTime, bars["spy"].getClose()) for dateTime, bars in barFeed],
+            [(dateTime, bars["spy"].getClose()) for dateTime, bars in expected]
+        )
+
+    def testNotInOrder(self):
+        barFeed = csvfeed.StreamingBarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromCSV(
+            "orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"), build_yahoo_row_parser()
+        )
+        with self.assertRaisesRegexp(Exception, "Bar date times are not in order in .*orcl-2000-yahoofinance.csv.*"):
+            barFeed.loadAll()
+
+    def testDuplicateBars(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "orcl.csv")
+            with open(path, "w") as f:
+                f.write("Date,Open,High,Low,Close,Volume,Adj Close\n")
+                f.write("2000-01-03,1,1,1,1,1,1\n")
+                f.write("2000-01-03,1,1,1,1,1,1\n")
+            barFeed = csvfeed.StreamingBarFeed(bar.Frequency.DAY)
+            barFeed.addBarsFromCSV("orcl", path, build_yahoo_row_parser())
+            with self.assertRaisesRegexp(Exception, "Duplicate bars found for \\['orcl'\\] on 2000-01-03.*"):
+                barFeed.loadAll()
+
+    def testSkipMalformedBars(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "orcl.csv")
+            with open(path, "w") as f:
+                f.write("Date,Open,High,Low,Close,Volume,Adj Close\n")
+                f.write("2000-01-03,1,1,1,1,1,1\n")
+                f.write("2000-01-04,-,1,1,1,1,1\n")
+                f.write("2000-01-05,1,1,1,1,1,1\n")
+
+            barFeed = csvfeed.StreamingBarFeed(bar.Frequency.DAY)
+            barFeed.addBarsFromCSV("orcl", path, build_yahoo_row_parser(), skipMalformedBars=True)
+            self.assertEqual([dateTime.day for dateTime, bars in barFeed], [3, 5])
+
+            barFeed = csvfeed.StreamingBarFeed(bar.Frequency.DAY)
+            barFeed.addBarsFromCSV("orcl", path, build_yahoo_row_parser())
+            with self.assertRaises(ValueError):
+                barFeed.loadAll()
+
+    def testAddAfterStart(self):
+        barFeed = csvfeed.StreamingBarFeed(bar.Frequency.DAY)
+        barFeed.start()
+        with self.assertRaisesRegexp(Exception, "Can't add more bars once you started consuming bars"):
+            barFeed.addBarsFromCSV(
+                "orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"), build_yahoo_row_parser()
+            )
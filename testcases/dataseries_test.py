@@ -20,6 +20,8 @@
 
 import datetime
 
+import numpy
+import pytz
 from six.moves import xrange
 
 from . import common
@@ -28,6 +30,7 @@ from pyalgotrade import dataseries
 from pyalgotrade.dataseries import bards
 from pyalgotrade.dataseries import aligned
 from pyalgotrade import bar
+from pyalgotrade.utils import dt
 
 
 class TestSequenceDataSeries(common.TestCase):
@@ -143,6 +146,82 @@ class TestSequenceDataSeries(common.TestCase):
         self.assertEqual(ds[-1], 99)
 
 
+class TestNumericDataSeries(common.TestCase):
+    def testEmpty(self):
+        ds = dataseries.NumericDataSeries()
+        self.assertEqual(len(ds), 0)
+        self.assertEqual(len(ds.asarray()), 0)
+        with self.assertRaises(IndexError):
+            ds[-1]
+        with self.assertRaises(IndexError):
+            ds[0]
+        with self.assertRaises(TypeError):
+            ds["a"]
+
+    def testSeqLikeOps(self):
+        seq = list(xrange(10))
+        ds = dataseries.NumericDataSeries()
+        for value in seq:
+            ds.append(value)
+
+        self.assertEqual(len(ds), len(seq))
+        for i in xrange(-len(seq), len(seq)):
+            self.assertEqual(ds[i], seq[i])
+        for step in xrange(1, 10):
+            for i in xrange(-100, 100):
+                self.assertEqual(list(ds[i::step]), seq[i::step])
+        # numpy integers are valid keys.
+        self.assertEqual(ds[numpy.int64(3)], 3)
+        self.assertEqual(ds[ds.asarray().argmax()], 9)
+
+    def testNoneValues(self):
+        ds = dataseries.NumericDataSeries()
+        ds.append(1)
+        ds.append(None)
+        self.assertEqual(ds[-1], None)
+        self.assertEqual(ds.getValueAbsolute(1), None)
+        self.assertEqual(ds.getValueAbsolute(2), None)
+        self.assertEqual(ds[0], 1)
+
+    def testBoundedViews(self):
+        ds = dataseries.NumericDataSeries(maxLen=3)
+        for i in xrange(10):
+            ds.appendWithDateTime(datetime.datetime(2000, 1, 1) + datetime.timedelta(days=i), i)
+        self.assertEqual(len(ds), 3)
+        self.assertEqual(ds.asarray().dtype, numpy.float64)
+        self.assertEqual(ds.asarray().tolist(), [7, 8, 9])
+        self.assertEqual(ds.datetimesAsArray().dtype, numpy.int64)
+        self.assertEqual(
+            ds.datetimesAsArray().view("datetime64[ns]").astype("datetime64[us]").astype(object).tolist(),
+            [datetime.datetime(2000, 1, day) for day in [8, 9, 10]]
+        )
+        self.assertEqual(ds.getDateTimes(), [datetime.datetime(2000, 1, day) for day in [8, 9, 10]])
+
+    def testLocalizedDateTimes(self):
+        ds = dataseries.NumericDataSeries()
+        dateTime = dt.localize(datetime.datetime(2000, 1, 1, 9, 30), pytz.timezone("US/Eastern"))
+        ds.appendWithDateTime(dateTime, 1)
+        self.assertEqual(ds.datetimesAsArray()[0], dataseries.datetime_to_nanoseconds(dt.as_utc(dateTime)))
+        self.assertEqual(ds.getDateTimes(), [dateTime])
+        self.assertEqual(ds.getDateTimes()[0].tzinfo.zone, "US/Eastern")
+
+    def testAppendInvalidDatetime(self):
+        ds = dataseries.NumericDataSeries()
+        ds.appendWithDateTime(datetime.datetime(2000, 1, 2), 1)
+        with self.assertRaisesRegexp(Exception, "Invalid datetime. It must be bigger than that last one"):
+            ds.appendWithDateTime(datetime.datetime(2000, 1, 1), 1)
+
+    def testResize(self):
+        ds = dataseries.NumericDataSeries(100)
+        for i in xrange(100):
+            ds.append(i)
+        ds.setMaxLen(2)
+        self.assertEqual(len(ds), 2)
+        self.assertEqual(len(ds.getDateTimes()), 2)
+        self.assertEqual(ds[0], 98)
+        self.assertEqual(ds[1], 99)
+
+
 class TestBarDataSeries(common.TestCase):
     def testEmpty(self):
         ds = bards.BarDataSeries()
@@ -214,6 +293,30 @@ class TestBarDataSeries(common.TestCase):
             self.assertEqual(ds[i].getDateTime(), ds.getDateTimes()[i])
             self.assertEqual(ds.getDateTimes()[i], firstDt + datetime.timedelta(seconds=i))
 
+    def testLazyNestedDataSeries(self):
+        ds = bards.BarDataSeries(maxLen=5)
+        firstDt = datetime.datetime.now()
+        for i in xrange(10):
+            extra = {"spread": i} if i % 2 == 0 else {}
+            ds.append(bar.BasicBar(firstDt + datetime.timedelta(seconds=i), i, i, i, i, i*10, i, bar.Frequency.SECOND, extra))
+
+        # Columns requested after bars were added get filled using the bars being held.
+        closeDS = ds.getCloseDataSeries()
+        self.assertEqual(closeDS[:], [5, 6, 7, 8, 9])
+        self.assertEqual(closeDS.getDateTimes(), ds.getDateTimes())
+        self.assertEqual(ds.getVolumeDataSeries()[:], [50, 60, 70, 80, 90])
+        self.assertEqual(ds.getExtraDataSeries("spread")[:], [6, 8])
+        self.assertTrue(ds.getCloseDataSeries() is closeDS)
+        self.assertTrue(ds.getPriceDataSeries() is closeDS)
+
+        values = []
+        closeDS.getNewValueEvent().subscribe(lambda ds_, dateTime, value: values.append(value))
+        ds.append(bar.BasicBar(firstDt + datetime.timedelta(seconds=10), 10, 10, 10, 10, 100, 10, bar.Frequency.SECOND, {"spread": 10}))
+        self.assertEqual(values, [10])
+        self.assertEqual(closeDS[:], [6, 7, 8, 9, 10])
+        self.assertEqual(ds.getExtraDataSeries("spread")[:], [6, 8, 10])
+        self.assertEqual(ds.getOpenDataSeries()[:], [6, 7, 8, 9, 10])
+
 
 class TestDateAlignedDataSeries(common.TestCase):
     def testNotAligned(self):
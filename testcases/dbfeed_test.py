@@ -18,17 +18,23 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import datetime
 import os
+import sqlite3
+
+import pytz
 
 from six.moves import xrange
 
 from . import common
+from . import barfeed_test
 from . import feed_test
 
 from pyalgotrade.barfeed import yahoofeed
 from pyalgotrade.barfeed import sqlitefeed
 from pyalgotrade import bar
 from pyalgotrade import marketsession
+from pyalgotrade.utils import dt
 
 
 class TemporarySQLiteFeed:
@@ -127,3 +133,143 @@ class SQLiteFeedTestCase(common.TestCase):
             self.assertEqual(len(barDS.getHighDataSeries()), 2)
             self.assertEqual(len(barDS.getLowDataSeries()), 2)
             self.assertEqual(len(barDS.getAdjCloseDataSeries()), 2)
+
+    def testBulkImport(self):
+        tmpFeed = TemporarySQLiteFeed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY)
+        with tmpFeed:
+            yahooFeed = yahoofeed.Feed()
+            yahooFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            yahooFeed.addBarsFromCSV("ibm", common.get_data_file_path("orcl-2001-yahoofinance.csv"))
+            expected = [(instrument, bar_) for dateTime, bars in yahooFeed for instrument, bar_ in bars.items()]
+            yahooFeed.reset()
+
+            sqliteFeed = tmpFeed.getFeed()
+            db = sqliteFeed.getDatabase()
+            self.assertEqual(db.addBarsFromFeed(yahooFeed, batchSize=100, journalMode="MEMORY", synchronous="OFF"), len(expected))
+
+            # Writing the same bars again updates them.
+            updated = [
+                (instrument, bar.BasicBar(
+                    bar_.getDateTime(), bar_.getOpen(), bar_.getHigh(), bar_.getLow(), bar_.getClose(),
+                    bar_.getVolume() + 1, None, bar.Frequency.DAY
+                ))
+                for instrument, bar_ in expected if instrument == "ibm"
+            ]
+            self.assertEqual(db.addBarSequence(iter(updated), bar.Frequency.DAY, batchSize=7), len(updated))
+
+            orclBars = db.getBars("orcl", bar.Frequency.DAY)
+            ibmBars = db.getBars("ibm", bar.Frequency.DAY)
+            self.assertEqual(len(orclBars), 252)
+            self.assertEqual(len(ibmBars), len(updated))
+            self.assertEqual(orclBars[0].getAdjClose(), expected[0][1].getAdjClose())
+            self.assertEqual(ibmBars[-1].getVolume(), updated[-1][1].getVolume())
+            self.assertEqual(ibmBars[-1].getAdjClose(), None)
+
+            with self.assertRaisesRegexp(Exception, "Invalid batch size"):
+                db.addBarSequence([], bar.Frequency.DAY, batchSize=0)
+
+    def testBulkImportRollback(self):
+        tmpFeed = TemporarySQLiteFeed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY)
+        with tmpFeed:
+            db = tmpFeed.getFeed().getDatabase()
+            bars = [
+                ("orcl", bar.BasicBar(datetime.datetime(2001, 1, 1), 1, 1, 1, 1, 1, 1, bar.Frequency.DAY)),
+                ("orcl", bar.BasicBar(datetime.datetime(2001, 1, 2), 1, 1, 1, 1, 1, 1, bar.Frequency.DAY)),
+                # Volume can't be null, so this batch fails.
+                ("ibm", bar.BasicBar(datetime.datetime(2001, 1, 3), 1, 1, 1, 1, None, 1, bar.Frequency.DAY)),
+            ]
+            with self.assertRaises(sqlite3.IntegrityError):
+                db.addBarSequence(bars, bar.Frequency.DAY, batchSize=2)
+            self.assertEqual(len(db.getBars("orcl", bar.Frequency.DAY)), 2)
+            self.assertEqual(len(db.getBars("ibm", bar.Frequency.DAY)), 0)
+            # The instrument was added in the batch that failed.
+            connection = sqlite3.connect(SQLiteFeedTestCase.dbName)
+            try:
+                self.assertIsNone(connection.execute("select * from instrument where name = 'IBM'").fetchone())
+            finally:
+                connection.close()
+
+            # The instrument id cache shouldn't point to rolled back instruments.
+            db.addBar("ibm", bars[0][1], bar.Frequency.DAY)
+            self.assertEqual(len(db.getBars("ibm", bar.Frequency.DAY)), 1)
+
+
+class SQLiteStreamingFeedTestCase(common.TestCase):
+    def __buildDatabase(self, dbFilePath):
+        yahooFeed = yahoofeed.Feed()
+        yahooFeed.addBarsFromCSV("spy", common.get_data_file_path("spy-2011-yahoofinance.csv"))
+        yahooFeed.addBarsFromCSV("nikkei", common.get_data_file_path("nikkei-2011-yahoofinance.csv"))
+        db = sqlitefeed.Database(dbFilePath)
+        db.addBarsFromFeed(yahooFeed)
+        db.disconnect()
+
+    def testBaseFeedInterface(self):
+        with common.TmpDir() as tmpPath:
+            dbFilePath = os.path.join(tmpPath, "bars.sqlite")
+            self.__buildDatabase(dbFilePath)
+            feed = sqlitefeed.StreamingFeed(dbFilePath, bar.Frequency.DAY, ["spy"])
+            feed_test.tstBaseFeedInterface(self, feed)
+            feed.getDatabase().disconnect()
+
+    def testBaseBarFeed(self):
+        with common.TmpDir() as tmpPath:
+            dbFilePath = os.path.join(tmpPath, "bars.sqlite")
+            self.__buildDatabase(dbFilePath)
+            feed = sqlitefeed.StreamingFeed(dbFilePath, bar.Frequency.DAY, ["spy", "nikkei"])
+            barfeed_test.check_base_barfeed(self, feed, True)
+            feed.getDatabase().disconnect()
+
+    def testSameBarsAsMemFeed(self):
+        with common.TmpDir() as tmpPath:
+            dbFilePath = os.path.join(tmpPath, "bars.sqlite")
+            self.__buildDatabase(dbFilePath)
+            fromDateTime = datetime.datetime(2011, 3, 1)
+            toDateTime = datetime.datetime(2011, 6, 30)
+            timezone = marketsession.USEquities.timezone
+
+            expected = sqlitefeed.Feed(dbFilePath, bar.Frequency.DAY)
+            expected.loadBars("spy", timezone, fromDateTime, toDateTime)
+            expected.loadBars("nikkei", timezone, fromDateTime, toDateTime)
+            expected = [(dateTime, bars) for dateTime, bars in expected]
+            self.assertTrue(len(expected) > 0)
+
+            feed = sqlitefeed.StreamingFeed(
+                dbFilePath, bar.Frequency.DAY, ["spy", "nikkei"], timezone, fromDateTime, toDateTime
+            )
+            feed.setFetchSize(7)
+            for i in xrange(2):
+                actual = [(dateTime, bars) for dateTime, bars in feed]
+                self.assertEqual(len(actual), len(expected))
+                for (expectedDateTime, expectedBars), (actualDateTime, actualBars) in zip(expected, actual):
+                    self.assertEqual(expectedDateTime, actualDateTime)
+                    self.assertEqual(sorted(expectedBars.getInstruments()), sorted(actualBars.getInstruments()))
+                    for instrument in expectedBars.getInstruments():
+                        self.assertEqual(expectedBars[instrument].getClose(), actualBars[instrument].getClose())
+                        self.assertEqual(expectedBars[instrument].getAdjClose(), actualBars[instrument].getAdjClose())
+                feed.reset()
+            feed.getDatabase().disconnect()
+
+    def testStop(self):
+        with common.TmpDir() as tmpPath:
+            dbFilePath = os.path.join(tmpPath, "bars.sqlite")
+            self.__buildDatabase(dbFilePath)
+            feed = sqlitefeed.StreamingFeed(dbFilePath, bar.Frequency.DAY, ["spy"])
+            self.assertEqual(feed.peekDateTime(), dt.localize(datetime.datetime(2011, 1, 3), pytz.utc))
+            self.assertFalse(feed.eof())
+            feed.stop()
+            self.assertTrue(feed.eof())
+            self.assertEqual(feed.peekDateTime(), None)
+            feed.reset()
+            self.assertFalse(feed.eof())
+
+            with self.assertRaisesRegexp(Exception, "Invalid fetch size"):
+                feed.setFetchSize(0)
+            feed.getDatabase().disconnect()
+
+    def testNoInstruments(self):
+        with common.TmpDir() as tmpPath:
+            dbFilePath = os.path.join(tmpPath, "bars.sqlite")
+            self.__buildDatabase(dbFilePath)
+            feed = sqlitefeed.StreamingFeed(dbFilePath, bar.Frequency.DAY, [])
+            self.assertTrue(feed.eof())
+            feed.getDatabase().disconnect()
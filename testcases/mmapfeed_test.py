@@ -0,0 +1,180 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+
+import numpy as np
+
+from . import common
+from . import barfeed_test
+from . import feed_test
+from . import smacrossover_strategy_test
+from .columnarbf_test import load_yahoo_bars
+
+from pyalgotrade import bar
+from pyalgotrade import dataseries
+from pyalgotrade import marketsession
+from pyalgotrade.barfeed import mmapfeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.utils import dt
+
+
+def to_nanoseconds(dateTimes):
+    return [dataseries.datetime_to_nanoseconds(dateTime) for dateTime in dateTimes]
+
+
+class MMapFeedTestCase(common.TestCase):
+    def __buildFeed(self, tmpPath, fileName="orcl-2000-yahoofinance.csv", timezone=None):
+        path = os.path.join(tmpPath, "orcl")
+        mmapfeed.write_bars(path, load_yahoo_bars(fileName), timezone)
+        barFeed = mmapfeed.Feed(bar.Frequency.DAY)
+        barFeed.addBarsFromPath("orcl", path)
+        return barFeed
+
+    def testBaseBarFeed(self):
+        with common.TmpDir() as tmpPath:
+            barfeed_test.check_base_barfeed(self, self.__buildFeed(tmpPath), True)
+
+    def testBaseFeedInterface(self):
+        with common.TmpDir() as tmpPath:
+            feed_test.tstBaseFeedInterface(self, self.__buildFeed(tmpPath))
+
+    def testSameBarsAsMemFeed(self):
+        expected = load_yahoo_bars("orcl-2000-yahoofinance.csv")
+        with common.TmpDir() as tmpPath:
+            barFeed = self.__buildFeed(tmpPath)
+            count = 0
+            for dateTime, bars in barFeed:
+                expectedBar = expected[count]
+                bar_ = bars["orcl"]
+                self.assertEqual(dateTime, expectedBar.getDateTime())
+                self.assertEqual(bar_.getDateTime(), expectedBar.getDateTime())
+                self.assertEqual(
+                    [bar_.getOpen(), bar_.getHigh(), bar_.getLow(), bar_.getClose(), bar_.getVolume(), bar_.getAdjClose()],
+                    [
+                        expectedBar.getOpen(), expectedBar.getHigh(), expectedBar.getLow(), expectedBar.getClose(),
+                        expectedBar.getVolume(), expectedBar.getAdjClose()
+                    ]
+                )
+                count += 1
+            self.assertEqual(count, len(expected))
+
+            # Check that it can be reset and loaded again.
+            barFeed.reset()
+            self.assertEqual(barFeed.peekDateTime(), expected[0].getDateTime())
+            barFeed.loadAll()
+            self.assertEqual(barFeed["orcl"][-1].getDateTime(), expected[-1].getDateTime())
+
+    def testStrategy(self):
+        with common.TmpDir() as tmpPath:
+            barFeed = self.__buildFeed(tmpPath, "orcl-2001-yahoofinance.csv")
+            strat = smacrossover_strategy_test.MarketOrderStrategy(barFeed, 10, 25)
+            strat.run()
+            self.assertEqual(round(strat.getFinalValue(), 2), 1000 - 22.7)
+
+    def testMultipleInstruments(self):
+        with common.TmpDir() as tmpPath:
+            mmapfeed.write_arrays(
+                os.path.join(tmpPath, "orcl"), bar.Frequency.DAY,
+                to_nanoseconds([datetime.datetime(2001, 1, day) for day in [1, 3]]),
+                [1, 3], [1, 3], [1, 3], [1, 3], [10, 30]
+            )
+            mmapfeed.write_arrays(
+                os.path.join(tmpPath, "ibm"), bar.Frequency.DAY,
+                to_nanoseconds([datetime.datetime(2001, 1, day) for day in [2, 3]]),
+                [2, 3], [2, 3], [2, 3], [2, 3], [20, 30], [2, 3]
+            )
+            barFeed = mmapfeed.Feed(bar.Frequency.DAY)
+            barFeed.addBarsFromPath("orcl", os.path.join(tmpPath, "orcl"))
+            barFeed.addBarsFromPath("ibm", os.path.join(tmpPath, "ibm"))
+            self.assertFalse(barFeed.barsHaveAdjClose())
+
+            values = []
+            for dateTime, bars in barFeed:
+                values.append((dateTime.day, sorted([(instrument, bars[instrument].getVolume()) for instrument in bars.getInstruments()])))
+            self.assertEqual(values, [
+                (1, [("orcl", 10)]),
+                (2, [("ibm", 20)]),
+                (3, [("ibm", 30), ("orcl", 30)]),
+            ])
+            self.assertEqual(barFeed.getLastBar("ibm").getAdjClose(), 3)
+            self.assertEqual(barFeed.getLastBar("orcl").getAdjClose(), None)
+
+    def testTimezone(self):
+        timezone = marketsession.USEquities.getTimezone()
+        yahooFeed = yahoofeed.Feed(timezone=timezone)
+        yahooFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        bars = [bars["orcl"] for dateTime, bars in yahooFeed]
+
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "orcl")
+            mmapfeed.write_bars(path, bars, timezone)
+            barFeed = mmapfeed.Feed(bar.Frequency.DAY)
+            barFeed.addBarsFromPath("orcl", path)
+            self.assertEqual(barFeed.getTimezone(), timezone)
+            dateTime = barFeed.peekDateTime()
+            self.assertEqual(dateTime, dt.localize(datetime.datetime(2000, 1, 3), timezone))
+            self.assertEqual(dt.unlocalize(dateTime), datetime.datetime(2000, 1, 3))
+
+            # Without a timezone, datetimes are naive UTC.
+            mmapfeed.write_bars(path, bars)
+            barFeed = mmapfeed.Feed(bar.Frequency.DAY)
+            barFeed.addBarsFromPath("orcl", path)
+            self.assertEqual(barFeed.peekDateTime(), datetime.datetime(2000, 1, 3, 5))
+
+    def testInvalidFiles(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "orcl")
+            with self.assertRaisesRegexp(Exception, "Bar date times are not in order"):
+                mmapfeed.write_arrays(path, bar.Frequency.DAY, [2, 1], [1, 1], [1, 1], [1, 1], [1, 1], [1, 1])
+            with self.assertRaisesRegexp(Exception, "high < low on.*"):
+                mmapfeed.write_arrays(path, bar.Frequency.DAY, [1, 2], [1, 1], [1, 1], [1, 2], [1, 1], [1, 1])
+
+            # Files not written with write_arrays are checked as bars get dispatched.
+            mmapfeed.write_arrays(
+                path, bar.Frequency.DAY, to_nanoseconds([datetime.datetime(2001, 1, day) for day in [1, 2, 3]]),
+                [1, 1, 1], [1, 1, 1], [1, 1, 1], [1, 1, 1], [1, 1, 1]
+            )
+            np.save(mmapfeed.get_column_path(path, "datetime"), to_nanoseconds([
+                datetime.datetime(2001, 1, 1), datetime.datetime(2001, 1, 1), datetime.datetime(2001, 1, 3)
+            ]))
+            barFeed = mmapfeed.Feed(bar.Frequency.DAY)
+            barFeed.addBarsFromPath("orcl", path)
+            with self.assertRaisesRegexp(Exception, "Duplicate bars found for \\['orcl'\\] on 2001-01-01.*"):
+                barFeed.loadAll()
+
+            np.save(mmapfeed.get_column_path(path, "datetime"), to_nanoseconds([
+                datetime.datetime(2001, 1, 2), datetime.datetime(2001, 1, 1), datetime.datetime(2001, 1, 3)
+            ]))
+            barFeed = mmapfeed.Feed(bar.Frequency.DAY)
+            barFeed.addBarsFromPath("orcl", path)
+            with self.assertRaisesRegexp(Exception, "Bar date times are not in order for orcl.*"):
+                barFeed.loadAll()
+
+            with self.assertRaisesRegexp(Exception, "Invalid frequency.*"):
+                mmapfeed.Feed(bar.Frequency.MINUTE).addBarsFromPath("orcl", path)
+
+    def testAddAfterStart(self):
+        with common.TmpDir() as tmpPath:
+            barFeed = self.__buildFeed(tmpPath)
+            barFeed.loadAll()
+            with self.assertRaisesRegexp(Exception, "Can't add more bars once you started consuming bars"):
+                barFeed.addBarsFromPath("ibm", os.path.join(tmpPath, "orcl"))
@@ -18,6 +18,8 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+from dateutil import tz
+
 from . import common
 
 from pyalgotrade import bar
@@ -92,6 +94,31 @@ class TestCase(common.TestCase):
         feed.loadBars("spy")
         self.__testDifferentTimezonesImpl(feed)
 
+    def testDifferentTimezones_DBFeed_Parallel(self):
+        feed = sqlitefeed.Feed(common.get_data_file_path("multiinstrument.sqlite"), bar.Frequency.DAY)
+        feed.loadBarsForInstruments(["^n225", "spy"], processes=2)
+        self.__testDifferentTimezonesImpl(feed)
+
+    def testNonPytzTimezone_DBFeed_Parallel(self):
+        timezone = tz.tzoffset(None, -5 * 3600)
+        feed = sqlitefeed.Feed(common.get_data_file_path("multiinstrument.sqlite"), bar.Frequency.DAY)
+        feed.loadBarsForInstruments(["^n225", "spy"], timezone, processes=2)
+        expectedFeed = sqlitefeed.Feed(common.get_data_file_path("multiinstrument.sqlite"), bar.Frequency.DAY)
+        expectedFeed.loadBars("^n225", timezone)
+        expectedFeed.loadBars("spy", timezone)
+        for expected, actual in zip(expectedFeed, feed):
+            self.assertEqual(expected[0], actual[0])
+            self.assertEqual(expected[0].utcoffset(), actual[0].utcoffset())
+            self.assertEqual(sorted(expected[1].getInstruments()), sorted(actual[1].getInstruments()))
+        self.assertTrue(feed.eof())
+
+    def testDifferentTimezones_DBStreamingFeed(self):
+        feed = sqlitefeed.StreamingFeed(
+            common.get_data_file_path("multiinstrument.sqlite"), bar.Frequency.DAY, ["^n225", "spy"]
+        )
+        feed.setFetchSize(10)
+        self.__testDifferentTimezonesImpl(feed)
+
     def testDifferentTimezones_DBFeed_LocalizedBars(self):
         feed = sqlitefeed.Feed(common.get_data_file_path("multiinstrument.sqlite"), bar.Frequency.DAY)
         feed.loadBars("^n225", marketsession.TSE.getTimezone())
@@ -24,6 +24,7 @@ from . import common
 from . import barfeed_test
 from . import feed_test
 
+from pyalgotrade.barfeed import csvfeed
 from pyalgotrade.barfeed import ninjatraderfeed
 from pyalgotrade import marketsession
 from pyalgotrade import bar
@@ -92,6 +93,24 @@ class NinjaTraderTestCase(common.TestCase):
             if price is not None:
                 self.assertTrue(price == bars.getBar("spy").getClose())
 
+    def testAddBarsFromCSVFiles(self):
+        timezone = marketsession.USEquities.getTimezone()
+        barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, timezone)
+        barFeed.setBarFilter(csvfeed.USEquitiesRTH())
+        barFeed.addBarsFromCSVFiles({
+            "spy": common.get_data_file_path("nt-spy-minute-2011-03.csv"),
+            "spy-2": common.get_data_file_path("nt-spy-minute-2011-03.csv"),
+        }, processes=2)
+
+        expected = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, timezone)
+        expected.setBarFilter(csvfeed.USEquitiesRTH())
+        expected.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011-03.csv"))
+
+        expectedValues = [(dateTime, bars["spy"].getClose()) for dateTime, bars in expected]
+        values = [(dateTime, bars["spy"].getClose(), bars["spy-2"].getClose()) for dateTime, bars in barFeed]
+        self.assertEqual([(dateTime, close) for dateTime, close, _ in values], expectedValues)
+        self.assertTrue(all(close == close2 for _, close, close2 in values))
+
     def testBounded(self):
         barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, maxLen=2)
         barFeed.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011-03.csv"))
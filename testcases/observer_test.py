@@ -59,6 +59,9 @@ class NonRealtimeFeed(observer.Subject):
     def peekDateTime(self):
         return self.__datetimes[0]
 
+    def peekDateTimes(self):
+        return list(self.__datetimes)
+
     def getDispatchPriority(self):
         return self.__priority
 
@@ -225,6 +228,131 @@ class DispatcherTestCase(common.TestCase):
         self.assertTrue(values[0] < values[1])
 
 
+class HeapDispatcherTestCase(common.TestCase):
+    def testInvalidScheduling(self):
+        with self.assertRaisesRegexp(Exception, "Invalid scheduling mode"):
+            dispatcher.Dispatcher(0)
+
+    def test2NrtFeedsInterleaved(self):
+        values = []
+        now = datetime.datetime.now()
+        datetimes1 = [now + datetime.timedelta(seconds=i*2) for i in xrange(10)]
+        datetimes2 = [now + datetime.timedelta(seconds=i*2+1) for i in xrange(10)]
+        nrtFeed1 = NonRealtimeFeed(copy.copy(datetimes1))
+        nrtFeed1.getEvent().subscribe(lambda x: values.append(x))
+        nrtFeed2 = NonRealtimeFeed(copy.copy(datetimes2))
+        nrtFeed2.getEvent().subscribe(lambda x: values.append(x))
+
+        disp = dispatcher.Dispatcher(dispatcher.Scheduling.HEAP)
+        disp.addSubject(nrtFeed1)
+        disp.addSubject(nrtFeed2)
+        disp.run()
+
+        self.assertEqual(values, sorted(datetimes1 + datetimes2))
+
+    def test2Combined(self):
+        values = []
+        now = datetime.datetime.now()
+        datetimes1 = [now + datetime.timedelta(seconds=i) for i in xrange(10)]
+        datetimes2 = [now + datetime.timedelta(seconds=i+len(datetimes1)) for i in xrange(10)]
+        nrtFeed1 = RealtimeFeed(copy.copy(datetimes1))
+        nrtFeed1.getEvent().subscribe(lambda x: values.append(x))
+        nrtFeed2 = NonRealtimeFeed(copy.copy(datetimes2))
+        nrtFeed2.getEvent().subscribe(lambda x: values.append(x))
+
+        disp = dispatcher.Dispatcher()
+        disp.setScheduling(dispatcher.Scheduling.HEAP)
+        disp.addSubject(nrtFeed1)
+        disp.addSubject(nrtFeed2)
+        disp.run()
+
+        self.assertEqual(len(values), len(datetimes1) + len(datetimes2))
+        for i in xrange(len(datetimes1)):
+            self.assertEqual(values[i*2], datetimes1[i])
+            self.assertEqual(values[i*2+1], datetimes2[i])
+
+    def testPriorityWithinDateTime(self):
+        values = []
+        now = datetime.datetime.now()
+        feed1 = NonRealtimeFeed([now, now + datetime.timedelta(seconds=1)], 0)
+        feed2 = RealtimeFeed([now, now], 1)
+        feed3 = NonRealtimeFeed([now, now + datetime.timedelta(seconds=1)], 2)
+        feed1.getEvent().subscribe(lambda x: values.append(1))
+        feed2.getEvent().subscribe(lambda x: values.append(2))
+        feed3.getEvent().subscribe(lambda x: values.append(3))
+
+        disp = dispatcher.Dispatcher(dispatcher.Scheduling.HEAP)
+        disp.addSubject(feed3)
+        disp.addSubject(feed2)
+        disp.addSubject(feed1)
+        disp.run()
+        self.assertEqual(values, [1, 2, 3, 1, 2, 3])
+
+
+class TimelineDispatcherTestCase(common.TestCase):
+    def test2NrtFeedsWithDuplicates(self):
+        values = []
+        now = datetime.datetime.now()
+        datetimes1 = [now, now, now + datetime.timedelta(seconds=2)]
+        datetimes2 = [now, now + datetime.timedelta(seconds=1), now + datetime.timedelta(seconds=2)]
+        nrtFeed1 = NonRealtimeFeed(copy.copy(datetimes1), 1)
+        nrtFeed1.getEvent().subscribe(lambda x: values.append((1, x)))
+        nrtFeed2 = NonRealtimeFeed(copy.copy(datetimes2), 2)
+        nrtFeed2.getEvent().subscribe(lambda x: values.append((2, x)))
+
+        currDateTimes = []
+        disp = dispatcher.Dispatcher(dispatcher.Scheduling.TIMELINE)
+        nrtFeed2.getEvent().subscribe(lambda x: currDateTimes.append(disp.getCurrentDateTime()))
+        disp.addSubject(nrtFeed2)
+        disp.addSubject(nrtFeed1)
+        disp.run()
+
+        self.assertEqual(values, [
+            (1, datetimes1[0]), (2, datetimes2[0]),
+            (1, datetimes1[1]),
+            (2, datetimes2[1]),
+            (1, datetimes1[2]), (2, datetimes2[2]),
+        ])
+        self.assertEqual(currDateTimes, datetimes2)
+
+    def testStop(self):
+        values = []
+        now = datetime.datetime.now()
+        datetimes = [now + datetime.timedelta(seconds=i) for i in xrange(10)]
+        nrtFeed = NonRealtimeFeed(copy.copy(datetimes))
+
+        disp = dispatcher.Dispatcher(dispatcher.Scheduling.TIMELINE)
+
+        def onEvent(dateTime):
+            values.append(dateTime)
+            if len(values) == 3:
+                disp.stop()
+        nrtFeed.getEvent().subscribe(onEvent)
+        disp.addSubject(nrtFeed)
+        disp.run()
+        self.assertEqual(values, datetimes[:3])
+
+    def testFallbackWithRealtimeFeed(self):
+        values = []
+        now = datetime.datetime.now()
+        datetimes1 = [now + datetime.timedelta(seconds=i) for i in xrange(10)]
+        datetimes2 = [now + datetime.timedelta(seconds=i+len(datetimes1)) for i in xrange(10)]
+        nrtFeed1 = RealtimeFeed(copy.copy(datetimes1))
+        nrtFeed1.getEvent().subscribe(lambda x: values.append(x))
+        nrtFeed2 = NonRealtimeFeed(copy.copy(datetimes2))
+        nrtFeed2.getEvent().subscribe(lambda x: values.append(x))
+
+        disp = dispatcher.Dispatcher(dispatcher.Scheduling.TIMELINE)
+        disp.addSubject(nrtFeed1)
+        disp.addSubject(nrtFeed2)
+        disp.run()
+
+        self.assertEqual(len(values), len(datetimes1) + len(datetimes2))
+        for i in xrange(len(datetimes1)):
+            self.assertEqual(values[i*2], datetimes1[i])
+            self.assertEqual(values[i*2+1], datetimes2[i])
+
+
 class EventTestCase(common.TestCase):
     def testEmitOrder(self):
         handlersData = []
@@ -18,12 +18,31 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import datetime
+import os
+import random
 import sys
 import logging
+import threading
+import time
+import unittest
+import zlib
 
 from . import common
 
+from pyalgotrade.optimizer import base
+from pyalgotrade.optimizer import dataset
+from pyalgotrade.optimizer import jobs
 from pyalgotrade.optimizer import local
+from pyalgotrade.optimizer import pruning
+from pyalgotrade.optimizer import resultcache
+from pyalgotrade.optimizer import search
+from pyalgotrade.optimizer import server
+from pyalgotrade.optimizer import sharedbars
+from pyalgotrade.optimizer import worker
+from pyalgotrade import bar
+from pyalgotrade import barfeed
+from pyalgotrade import marketsession
 from pyalgotrade import strategy
 from pyalgotrade.barfeed import yahoofeed
 
@@ -44,6 +63,25 @@ class FailingStrategy(strategy.BacktestingStrategy):
         raise Exception("oh no!")
 
 
+class RecordingPruner(pruning.Pruner):
+    def __init__(self, checkpoints, pruneAt=None):
+        super(RecordingPruner, self).__init__(checkpoints)
+        self.__pruneAt = pruneAt
+        self.calls = []
+
+    def prune(self, checkpoint, metrics, bestResult):
+        self.calls.append((checkpoint, metrics.getBarCount(), metrics.getDateTime(), bestResult))
+        return checkpoint == self.__pruneAt
+
+
+class FakeMetrics(object):
+    def __init__(self, result):
+        self.__result = result
+
+    def getResult(self):
+        return self.__result
+
+
 class OptimizerTestCase(common.TestCase):
     def testLocal(self):
         barFeed = yahoofeed.Feed()
@@ -56,9 +94,669 @@ class OptimizerTestCase(common.TestCase):
         self.assertEquals(round(res.getResult(), 2), 1295462.6)
         self.assertEquals(res.getParameters()[1], 20)
 
+    def testLocalWithoutSharedMemory(self):
+        for transport in [base.Transport.XMLRPC, base.Transport.TCP]:
+            barFeed = yahoofeed.Feed()
+            instrument = "orcl"
+            barFeed.addBarsFromCSV(instrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            res = local.run(
+                sma_crossover.SMACrossOver, barFeed, parameters_generator(instrument, 5, 30),
+                logLevel=logging.DEBUG, batchSize=10, useSharedMemory=False, transport=transport
+            )
+            self.assertEquals(round(res.getResult(), 2), 1295462.6)
+            self.assertEquals(res.getParameters()[1], 20)
+
+    @unittest.skipIf(not local.fork_supported(), "fork is not available")
+    def testLocalForked(self):
+        barFeed = yahoofeed.Feed()
+        instrument = "orcl"
+        barFeed.addBarsFromCSV(instrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        res = local.run(
+            sma_crossover.SMACrossOver, barFeed, parameters_generator(instrument, 5, 100),
+            workerCount=2, logLevel=logging.DEBUG, batchSize=7, useFork=True
+        )
+        self.assertEquals(round(res.getResult(), 2), 1295462.6)
+        self.assertEquals(res.getParameters()[1], 20)
+        self.assertEquals(local.forked_state, {})
+
+    @unittest.skipIf(not local.fork_supported(), "fork is not available")
+    def testFailingStrategyForked(self):
+        barFeed = yahoofeed.Feed()
+        instrument = "orcl"
+        barFeed.addBarsFromCSV(instrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        res = local.run(
+            FailingStrategy, barFeed, parameters_generator(instrument, 5, 20), logLevel=logging.DEBUG, useFork=True
+        )
+        self.assertIsNone(res)
+
+    def testServerAndWorkers(self):
+        built = []
+
+        def build_dataset(*args, **kwargs):
+            built.append(True)
+            return buildDataset(*args, **kwargs)
+
+        buildDataset = dataset.Dataset
+        dataset.Dataset = build_dataset
+        try:
+            for transport in [base.Transport.XMLRPC, base.Transport.TCP]:
+                barFeed = yahoofeed.Feed()
+                instrument = "orcl"
+                barFeed.addBarsFromCSV(instrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+                port = local.find_port()
+                results = []
+                serverThread = threading.Thread(target=lambda: results.append(server.serve(
+                    barFeed, parameters_generator(instrument, 15, 25), "localhost", port, batchSize=3,
+                    transport=transport
+                )))
+                serverThread.start()
+                worker.run(sma_crossover.SMACrossOver, "localhost", port, workerCount=2, transport=transport)
+                serverThread.join()
+                self.assertEquals(round(results[0].getResult(), 2), 1295462.6)
+                self.assertEquals(results[0].getParameters()[1], 20)
+        finally:
+            dataset.Dataset = buildDataset
+        # Workers without a cache don't need the dataset.
+        self.assertEqual(built, [])
+
+    def testServerAndWorkersWithCache(self):
+        with common.TmpDir() as tmpPath:
+            cacheDir = os.path.join(tmpPath, "cache")
+            for transport in [base.Transport.XMLRPC, base.Transport.TCP]:
+                barFeed = yahoofeed.Feed()
+                instrument = "orcl"
+                barFeed.addBarsFromCSV(instrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+                port = local.find_port()
+                results = []
+                serverThread = threading.Thread(target=lambda: results.append(server.serve(
+                    barFeed, parameters_generator(instrument, 18, 22), "localhost", port, batchSize=3,
+                    transport=transport
+                )))
+                serverThread.start()
+                worker.run(
+                    sma_crossover.SMACrossOver, "localhost", port, workerCount=2, transport=transport,
+                    cacheDir=cacheDir
+                )
+                serverThread.join()
+                self.assertEquals(round(results[0].getResult(), 2), 1295462.6)
+                self.assertEquals(results[0].getParameters()[1], 20)
+                self.assertEqual(len(os.listdir(cacheDir)), 1)
+
+    def testInvalidTransport(self):
+        with self.assertRaisesRegexp(Exception, "Invalid transport carrier pigeon"):
+            server.get_server_class("carrier pigeon")
+        with self.assertRaisesRegexp(Exception, "Invalid transport carrier pigeon"):
+            worker.get_worker_class("carrier pigeon")
+
     def testFailingStrategy(self):
         barFeed = yahoofeed.Feed()
         instrument = "orcl"
         barFeed.addBarsFromCSV(instrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
         res = local.run(FailingStrategy, barFeed, parameters_generator(instrument, 5, 100), logLevel=logging.DEBUG)
         self.assertIsNone(res)
+
+
+class DatasetTestCase(common.TestCase):
+    def __loadBars(self):
+        barFeed = yahoofeed.Feed()
+        barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        return jobs.load_bars(barFeed)
+
+    def testLoadFromCache(self):
+        instruments, bars = self.__loadBars()
+        ds = dataset.Dataset(instruments, bars, chunkSize=100)
+        manifest = ds.getManifest()
+        self.assertEqual(len(manifest["chunks"]), 3)
+        fetched = []
+
+        def fetchChunk(chunkHash):
+            fetched.append(chunkHash)
+            return ds.getChunk(chunkHash)
+
+        with common.TmpDir() as tmpPath:
+            cache = dataset.Cache(os.path.join(tmpPath, "cache"))
+            loadedInstruments, loadedBars = cache.load(manifest, fetchChunk)
+            self.assertEqual(loadedInstruments, instruments)
+            self.assertEqual(len(loadedBars), len(bars))
+            self.assertEqual(loadedBars[-1].getDateTime(), bars[-1].getDateTime())
+            self.assertEqual(loadedBars[-1]["orcl"].getClose(), bars[-1]["orcl"].getClose())
+            self.assertEqual(fetched, manifest["chunks"])
+
+            # Everything is loaded from the cache the second time.
+            del fetched[:]
+            loadedInstruments, loadedBars = cache.load(manifest, fetchChunk)
+            self.assertEqual(len(loadedBars), len(bars))
+            self.assertEqual(fetched, [])
+
+            # Appending bars only changes the last chunk.
+            ds2 = dataset.Dataset(instruments, bars + bars[-1:], chunkSize=100)
+            self.assertNotEqual(ds2.getManifest()["hash"], manifest["hash"])
+            loadedInstruments, loadedBars = cache.load(ds2.getManifest(), lambda chunkHash: ds2.getChunk(chunkHash))
+            self.assertEqual(len(loadedBars), len(bars) + 1)
+            self.assertEqual(len(os.listdir(os.path.join(tmpPath, "cache"))), 4)
+
+    def testCorruptChunk(self):
+        instruments, bars = self.__loadBars()
+        ds = dataset.Dataset(instruments, bars)
+        chunkHash = ds.getManifest()["chunks"][0]
+        with common.TmpDir() as tmpPath:
+            cache = dataset.Cache(tmpPath)
+            cache.putChunk(chunkHash, zlib.compress(b"garbage"))
+            # The chunk in the cache is replaced.
+            loadedInstruments, loadedBars = cache.load(ds.getManifest(), ds.getChunk)
+            self.assertEqual(len(loadedBars), len(bars))
+            self.assertEqual(cache.getChunk(chunkHash), ds.getChunk(chunkHash))
+
+            # Chunks received from the server are checked too.
+            with self.assertRaisesRegexp(Exception, "doesn't match its hash"):
+                manifest = {"hash": "", "instruments": [], "chunks": ["0" * 64]}
+                cache.load(manifest, lambda unused: ds.getChunk(chunkHash))
+            with self.assertRaisesRegexp(Exception, "Invalid chunk hash"):
+                cache.getChunk("../chunk")
+
+
+class ResultCacheTestCase(common.TestCase):
+    def testAddAndGet(self):
+        with common.TmpDir() as tmpPath:
+            dbFilePath = os.path.join(tmpPath, "results.sqlite")
+            cache = resultcache.ResultCache(dbFilePath, "strat1")
+            cache.addResults("data1", [((1, "a"), 10.5), ((2, "a"), None), ((3, "a"), 7)])
+            self.assertEqual(cache.getResults("data1", [(1, "a"), (2, "a"), (3, "a")]), {(1, "a"): 10.5, (3, "a"): 7})
+            self.assertEqual(cache.getResults("data2", [(1, "a")]), {})
+            cache.close()
+
+            # Results are persisted, and they're kept apart by strategy.
+            cache = resultcache.ResultCache(dbFilePath, "strat1")
+            self.assertEqual(cache.getResults("data1", [(1, "a")]), {(1, "a"): 10.5})
+            cache.close()
+            cache = resultcache.ResultCache(dbFilePath, "strat2")
+            self.assertEqual(cache.getResults("data1", [(1, "a")]), {})
+            cache.close()
+
+    def testJobManagerSkipsCachedParameters(self):
+        with common.TmpDir() as tmpPath:
+            cache = resultcache.ResultCache(os.path.join(tmpPath, "results.sqlite"), "strat")
+            cache.addResults("data", [((1,), 100), ((3,), 50)])
+            resultSinc = base.ResultSinc()
+            jobManager = jobs.JobManager(
+                base.ParameterSource([(i,) for i in range(5)]), resultSinc, 10, resultCache=cache
+            )
+            jobManager.setDatasetHash("data")
+            job = jobManager.getNextJob("w1")
+            parameters = []
+            parameters_ = job.getNextParameters()
+            while parameters_ is not None:
+                parameters.append(parameters_)
+                parameters_ = job.getNextParameters()
+            self.assertEqual(sorted(parameters), [(0,), (2,), (4,)])
+            self.assertEqual(resultSinc.getBest()[0], 100)
+
+            # Every result pushed is stored.
+            jobManager.pushJobResults(job.getId(), 3, (2,), "w1", [((0,), 1), ((2,), 3), ((4,), 2)])
+            self.assertFalse(jobManager.jobsPending())
+            self.assertEqual(len(cache.getResults("data", [(i,) for i in range(5)])), 5)
+            cache.close()
+
+    def __testLocal(self, useFork):
+        def build_feed():
+            barFeed = yahoofeed.Feed()
+            barFeed.addBarsFromCSV(instrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            return barFeed
+
+        instrument = "orcl"
+        with common.TmpDir() as tmpPath:
+            cache = resultcache.ResultCache(
+                os.path.join(tmpPath, "results.sqlite"), resultcache.get_strategy_id(sma_crossover.SMACrossOver)
+            )
+            res = local.run(
+                sma_crossover.SMACrossOver, build_feed(), parameters_generator(instrument, 15, 25), workerCount=2,
+                useFork=useFork, resultCache=cache
+            )
+            self.assertEquals(round(res.getResult(), 2), 1295462.6)
+            self.assertEquals(res.getParameters()[1], 20)
+
+            # Results come from the cache, so the strategy doesn't run again.
+            res = local.run(
+                FailingStrategy, build_feed(), parameters_generator(instrument, 18, 22), workerCount=2, useFork=useFork,
+                resultCache=cache
+            )
+            self.assertEquals(round(res.getResult(), 2), 1295462.6)
+            self.assertEquals(res.getParameters()[1], 20)
+            cache.close()
+
+    def testLocal(self):
+        self.__testLocal(False)
+
+    @unittest.skipIf(not local.fork_supported(), "fork is not available")
+    def testLocalForked(self):
+        self.__testLocal(True)
+
+
+class PruningTestCase(common.TestCase):
+    instrument = "orcl"
+
+    def __buildFeed(self):
+        barFeed = yahoofeed.Feed()
+        barFeed.addBarsFromCSV(PruningTestCase.instrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        return barFeed
+
+    def __runStrategy(self, pruner, bestResult=None):
+        strat = sma_crossover.SMACrossOver(self.__buildFeed(), PruningTestCase.instrument, 20)
+        pruningAnalyzer = pruning.PruningAnalyzer(pruner, bestResult)
+        strat.attachAnalyzer(pruningAnalyzer)
+        strat.run()
+        return strat, pruningAnalyzer.isPruned()
+
+    def testBarCountCheckpoints(self):
+        pruner = RecordingPruner([10, 50, 100], pruneAt=1)
+        strat, pruned = self.__runStrategy(pruner, 1000)
+        self.assertTrue(pruned)
+        self.assertEqual([call[:2] for call in pruner.calls], [(0, 10), (1, 50)])
+        self.assertEqual(pruner.calls[0][3], 1000)
+        self.assertEqual(strat.getFeed().getCurrentBars().getDateTime(), pruner.calls[1][2])
+
+    def testDateTimeCheckpoints(self):
+        # A weekend, and a date after the last bar.
+        checkpoints = [datetime.datetime(2000, 3, 4), datetime.datetime(2000, 3, 5), datetime.datetime(2010, 1, 1)]
+        pruner = RecordingPruner(checkpoints)
+        strat, pruned = self.__runStrategy(pruner)
+        self.assertFalse(pruned)
+        # Both weekend checkpoints are reached with the bars for the following monday.
+        self.assertEqual(len(pruner.calls), 2)
+        self.assertEqual(pruner.calls[0][2], pruner.calls[1][2])
+        self.assertEqual(pruner.calls[0][2], datetime.datetime(2000, 3, 6))
+
+    def testDrawDownPruner(self):
+        strat, pruned = self.__runStrategy(pruning.DrawDownPruner([100], 1))
+        self.assertFalse(pruned)
+        strat, pruned = self.__runStrategy(pruning.DrawDownPruner([100], 0))
+        self.assertTrue(pruned)
+
+    def testMedianPruner(self):
+        pruner = pruning.MedianPruner([10, 20], minExecutions=2)
+        self.assertFalse(pruner.prune(0, FakeMetrics(1), None))
+        self.assertFalse(pruner.prune(0, FakeMetrics(3), None))
+        self.assertTrue(pruner.prune(0, FakeMetrics(1.5), None))
+        self.assertFalse(pruner.prune(0, FakeMetrics(2), None))
+        # Each checkpoint keeps its own results.
+        self.assertFalse(pruner.prune(1, FakeMetrics(0), None))
+
+    def __testLocal(self, useFork):
+        # Nothing gets pruned.
+        res = local.run(
+            sma_crossover.SMACrossOver, self.__buildFeed(), parameters_generator(PruningTestCase.instrument, 15, 25),
+            workerCount=2, useFork=useFork, pruner=pruning.DrawDownPruner([100], 1)
+        )
+        self.assertEquals(round(res.getResult(), 2), 1295462.6)
+        self.assertEquals(res.getParameters()[1], 20)
+
+        # Everything gets pruned.
+        res = local.run(
+            sma_crossover.SMACrossOver, self.__buildFeed(), parameters_generator(PruningTestCase.instrument, 15, 25),
+            workerCount=2, useFork=useFork, pruner=RecordingPruner([10], pruneAt=0)
+        )
+        self.assertIsNone(res)
+
+    def testLocal(self):
+        self.__testLocal(False)
+
+    @unittest.skipIf(not local.fork_supported(), "fork is not available")
+    def testLocalForked(self):
+        self.__testLocal(True)
+
+
+class SearchTestCase(common.TestCase):
+    def __minimize(self, searchDriver, objective):
+        # Runs the search sequentially and returns the best parameters.
+        parameters = searchDriver.getNext(1)
+        while len(parameters):
+            searchDriver.onNewResult(-objective(*parameters[0].args), parameters[0])
+            parameters = searchDriver.getNext(1)
+        return max(searchDriver.getResults(), key=lambda item: item[1])[0]
+
+    def testDimensions(self):
+        rnd = random.Random(0)
+        for _ in range(100):
+            self.assertIn(search.Choice(["a", "b"]).sample(rnd), ["a", "b"])
+            self.assertIn(search.Choice(["a", "b"]).sampleNear(rnd, ["a"]), ["a", "b"])
+            self.assertIn(search.Integer(1, 3).sample(rnd), [1, 2, 3])
+            self.assertIn(search.Integer(1, 3).sampleNear(rnd, [1, 3]), [1, 2, 3])
+            self.assertTrue(0.5 <= search.Float(0.5, 1).sampleNear(rnd, [0.5, 0.9]) <= 1)
+        choice = search.Choice(["a", "b"])
+        self.assertGreater(choice.getLogDensity("a", ["a", "a"]), choice.getLogDensity("b", ["a", "a"]))
+        integer = search.Integer(1, 100)
+        self.assertGreater(integer.getLogDensity(10, [10, 11]), integer.getLogDensity(90, [10, 11]))
+
+    def testRandomSearch(self):
+        searchDriver = search.RandomSearch([search.Choice(["orcl"]), search.Integer(10, 30)], 10, seed=1)
+        parameters = searchDriver.getNext(4) + searchDriver.getNext(10)
+        self.assertTrue(searchDriver.eof())
+        self.assertEqual(searchDriver.getNext(1), [])
+        parameters = [p.args for p in parameters]
+        self.assertEqual(len(parameters), 10)
+        self.assertEqual(len(set(parameters)), 10)
+        for instrument, period in parameters:
+            self.assertEqual(instrument, "orcl")
+            self.assertTrue(10 <= period <= 30)
+
+    def testSearchRunsOutOfParameters(self):
+        searchDriver = search.RandomSearch([search.Integer(1, 3)], 10)
+        self.assertEqual(sorted(p.args for p in searchDriver.getNext(10)), [(1,), (2,), (3,)])
+        self.assertTrue(searchDriver.eof())
+
+    def testTPESearch(self):
+        def objective(instrument, fastPeriod, slowPeriod):
+            return ((fastPeriod - 37) / 10.0) ** 2 + ((slowPeriod - 120) / 20.0) ** 2
+
+        # 60 executions out of more than 50000 combinations.
+        space = [search.Choice(["orcl"]), search.Integer(5, 200), search.Integer(5, 300)]
+        best = self.__minimize(search.TPESearch(space, 60, seed=0), objective)
+        self.assertLess(objective(*best), 0.5)
+
+    def testTPESearchWithoutResults(self):
+        # Failed executions don't have results.
+        searchDriver = search.TPESearch([search.Integer(0, 100)], 20, startupTrials=2, seed=0)
+        for parameters in searchDriver.getNext(10):
+            searchDriver.onNewResult(None, parameters)
+        self.assertEqual(len(searchDriver.getNext(10)), 10)
+
+    def testJobManagerDoesntReadAhead(self):
+        searchDriver = search.TPESearch([search.Integer(0, 1000)], 100, startupTrials=2, seed=0)
+        resultSinc = base.ResultSinc()
+        jobManager = jobs.JobManager(searchDriver, resultSinc, 200)
+        for i in range(3):
+            job = jobManager.getNextJob("w1")
+            parameters = job.getNextParameters()
+            self.assertIsNone(job.getNextParameters())
+            jobManager.pushJobResults(job.getId(), i, parameters, "w1", [(parameters, i)])
+        self.assertFalse(searchDriver.eof())
+        self.assertEqual(len(searchDriver.getResults()), 3)
+
+    def testSuccessiveHalvingSearch(self):
+        searchDriver = search.SuccessiveHalvingSearch([search.Integer(0, 100)], 9, 1 / 9., seed=0)
+        self.assertEqual(len(searchDriver.getBudgets()), 3)
+        self.__minimize(searchDriver, lambda *args: 0)
+        self.assertTrue(searchDriver.eof())
+        # 9 parameters on 1/9 of the bars, 3 on 1/3 and 1 on the whole dataset.
+        budgets = [base.split_budget(parameters)[0] for parameters, _ in searchDriver.getResults()]
+        self.assertEqual(budgets.count(base.Budget(1 / 9.)), 9)
+        self.assertEqual(budgets.count(base.Budget(1 / 3.)), 3)
+        self.assertEqual(budgets.count(None), 1)
+
+    def testSuccessiveHalvingSearchPromotesTheBest(self):
+        searchDriver = search.SuccessiveHalvingSearch([search.Integer(0, 100)], 3, 0.5, reductionFactor=3, seed=0)
+        parameters = searchDriver.getNext(3)
+        self.assertEqual(len(parameters), 3)
+        # Waiting for results.
+        self.assertEqual(searchDriver.getNext(1), [])
+        self.assertFalse(searchDriver.eof())
+        for p in parameters:
+            self.assertEqual(p.args[0], base.Budget(0.5))
+            searchDriver.onNewResult(p.args[1], p)
+        best = max(p.args[1] for p in parameters)
+        parameters = searchDriver.getNext(1)
+        self.assertEqual(parameters[0].args, (best,))
+        searchDriver.onNewResult(best, parameters[0])
+        self.assertTrue(searchDriver.eof())
+
+    def testBarsPrefix(self):
+        bars = worker.BarsPrefix(list(range(10)), 3)
+        self.assertEqual(len(bars), 3)
+        self.assertEqual(bars[-1], 2)
+        self.assertEqual(bars[1:], [1, 2])
+        with self.assertRaises(IndexError):
+            bars[3]
+
+    def testJobManagerWaitsForResults(self):
+        searchDriver = search.SuccessiveHalvingSearch([search.Integer(0, 100)], 1, 0.5, seed=0)
+        jobManager = jobs.JobManager(searchDriver, base.ResultSinc(), 200)
+        job = jobManager.getNextJob("w1")
+        parameters = job.getNextParameters()
+        self.assertEqual(parameters[0], base.Budget(0.5))
+        # Nothing to hand out until the result is in, but the search is not done.
+        job = jobManager.getNextJob("w1")
+        self.assertTrue(job.isEmpty())
+        self.assertTrue(jobManager.jobsPending())
+
+    def __testLocal(self, useFork):
+        instrument = "orcl"
+        barFeed = yahoofeed.Feed()
+        barFeed.addBarsFromCSV(instrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        searchDriver = search.TPESearch(
+            [search.Choice([instrument]), search.Integer(15, 25)], 6, startupTrials=3, seed=0
+        )
+        res = local.run(sma_crossover.SMACrossOver, barFeed, searchDriver, workerCount=2, useFork=useFork)
+        # Every result gets to the search driver.
+        results = searchDriver.getResults()
+        self.assertEqual(len(set(parameters for parameters, _ in results)), 6)
+        self.assertEqual(res.getResult(), max(result for _, result in results))
+
+        # Only results on the whole dataset compete for the best result.
+        barFeed = yahoofeed.Feed()
+        barFeed.addBarsFromCSV(instrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        searchDriver = search.SuccessiveHalvingSearch(
+            [search.Choice([instrument]), search.Integer(15, 25)], 6, 1 / 3., seed=0
+        )
+        res = local.run(sma_crossover.SMACrossOver, barFeed, searchDriver, workerCount=2, useFork=useFork)
+        self.assertTrue(searchDriver.eof())
+        fullResults = [result for parameters, result in searchDriver.getResults() if len(parameters) == 2]
+        self.assertEqual(len(fullResults), 2)
+        self.assertEqual(res.getResult(), max(fullResults))
+
+    def testLocal(self):
+        self.__testLocal(False)
+
+    @unittest.skipIf(not local.fork_supported(), "fork is not available")
+    def testLocalForked(self):
+        self.__testLocal(True)
+
+
+class JobManagerTestCase(common.TestCase):
+    def __getJobParameters(self, job):
+        ret = []
+        parameters = job.getNextParameters()
+        while parameters is not None:
+            ret.append(parameters)
+            parameters = job.getNextParameters()
+        return ret
+
+    def testBatchesShrink(self):
+        paramSource = base.ParameterSource([(i,) for i in range(30)])
+        jobManager = jobs.JobManager(paramSource, base.ResultSinc(), 10)
+        sizes = []
+        for name in ["w1", "w2", "w3", "w1", "w2", "w3", "w1"]:
+            job = jobManager.getNextJob(name)
+            parameters = self.__getJobParameters(job)
+            sizes.append(len(parameters))
+            jobManager.pushJobResults(job.getId(), 1, parameters[0], name)
+        self.assertEqual(sizes, [10, 10, 4, 2, 2, 1, 1])
+        self.assertIsNone(jobManager.getNextJob("w2"))
+        self.assertFalse(jobManager.jobsPending())
+
+    def testFirstAdaptiveBatch(self):
+        paramSource = base.ParameterSource([(i,) for i in range(30)])
+        jobManager = jobs.JobManager(paramSource, base.ResultSinc(), 10, targetJobDuration=5)
+        job = jobManager.getNextJob("w1")
+        self.assertEqual(self.__getJobParameters(job), [(0,)])
+
+    def testStealing(self):
+        resultSinc = base.ResultSinc()
+        jobManager = jobs.JobManager(base.ParameterSource([(i,) for i in range(10)]), resultSinc, 10)
+        job1 = jobManager.getNextJob("w1")
+        self.assertEqual(job1.getNextParameters(), (9,))
+        self.assertEqual(jobManager.reportProgress(job1.getId(), 1, "w1"), 0)
+
+        # 8 parameters not started. Half of them get stolen from the ones w1 would run last.
+        job2 = jobManager.getNextJob("w2")
+        self.assertEqual(self.__getJobParameters(job2), [(3,), (2,), (1,), (0,)])
+        stolenCount = jobManager.reportProgress(job1.getId(), 2, "w1")
+        self.assertEqual(stolenCount, 4)
+        job1.setStolenCount(stolenCount)
+        self.assertEqual(self.__getJobParameters(job1), [(8,), (7,), (6,), (5,), (4,)])
+
+        self.assertTrue(jobManager.jobsPending())
+        jobManager.pushJobResults(job1.getId(), 1, (9,), "w1")
+        self.assertTrue(jobManager.jobsPending())
+        jobManager.pushJobResults(job2.getId(), 2, (1,), "w2")
+        self.assertFalse(jobManager.jobsPending())
+        self.assertEqual(resultSinc.getBest()[1].args, (1,))
+
+    def testVictimRunsStolenParameters(self):
+        class RecordingResultSinc(base.ResultSinc):
+            def __init__(self):
+                super(RecordingResultSinc, self).__init__()
+                self.parameters = []
+
+            def onNewResult(self, result, parameters):
+                self.parameters.append(parameters.args)
+
+        resultSinc = RecordingResultSinc()
+        jobManager = jobs.JobManager(base.ParameterSource([(i,) for i in range(10)]), resultSinc, 10)
+        job1 = jobManager.getNextJob("w1")
+        jobManager.reportProgress(job1.getId(), 1, "w1")
+        job2 = jobManager.getNextJob("w2")
+        stolen = self.__getJobParameters(job2)
+        self.assertEqual(len(stolen), 4)
+        # w1 finishes everything before finding out that some parameters were stolen.
+        allParameters = self.__getJobParameters(job1)
+        self.assertEqual(len(allParameters), 10)
+        jobManager.pushJobResults(job1.getId(), 1, allParameters[0], "w1", [(p, 1) for p in allParameters])
+        jobManager.pushJobResults(job2.getId(), 1, stolen[0], "w2", [(p, 1) for p in stolen])
+        self.assertEqual(sorted(resultSinc.parameters), [(i,) for i in range(10)])
+        self.assertFalse(jobManager.jobsPending())
+
+    def testExpiredJobsAreHandedOutAgain(self):
+        paramSource = base.ParameterSource([(i,) for i in range(4)])
+        jobManager = jobs.JobManager(paramSource, base.ResultSinc(), 10, leaseTimeout=0.1)
+        job1 = jobManager.getNextJob("w1")
+        self.assertEqual(len(self.__getJobParameters(job1)), 4)
+        time.sleep(0.2)
+        self.assertTrue(jobManager.jobsPending())
+        # w1 stopped reporting, so the job goes back to the queue and its results are ignored.
+        self.assertEqual(jobManager.reportProgress(job1.getId(), 1, "w1"), jobs.JOB_CANCELLED)
+        jobManager.pushJobResults(job1.getId(), 1, (3,), "w1")
+        self.assertTrue(jobManager.jobsPending())
+
+        parameters = []
+        job = jobManager.getNextJob("w2")
+        while job is not None:
+            jobParameters = self.__getJobParameters(job)
+            parameters.extend(jobParameters)
+            jobManager.pushJobResults(job.getId(), 1, jobParameters[0], "w2")
+            job = jobManager.getNextJob("w2")
+        self.assertEqual(sorted(parameters), [(0,), (1,), (2,), (3,)])
+        self.assertFalse(jobManager.jobsPending())
+
+    def testStalledJobsExpire(self):
+        paramSource = base.ParameterSource([(i,) for i in range(20)])
+        jobManager = jobs.JobManager(paramSource, base.ResultSinc(), 10, leaseTimeout=0.2)
+        job1 = jobManager.getNextJob("w1")
+        job2 = jobManager.getNextJob("w2")
+        # Both workers report, but only w2 makes progress.
+        for i in range(4):
+            time.sleep(0.1)
+            self.assertEqual(jobManager.reportProgress(job1.getId(), 0, "w1"), 0)
+            jobManager.reportProgress(job2.getId(), i + 1, "w2")
+        self.assertTrue(jobManager.jobsPending())
+        self.assertEqual(jobManager.reportProgress(job1.getId(), 0, "w1"), jobs.JOB_CANCELLED)
+        self.assertEqual(jobManager.reportProgress(job2.getId(), 5, "w2"), 0)
+
+    def testStragglersAreCopied(self):
+        resultSinc = base.ResultSinc()
+        jobManager = jobs.JobManager(base.ParameterSource([(i,) for i in range(2)]), resultSinc, 1)
+        job1 = jobManager.getNextJob("w1")
+        job2 = jobManager.getNextJob("w2")
+        # Nothing left to hand out or steal, so w2 gets a copy of the job w1 is running.
+        job3 = jobManager.getNextJob("w2")
+        self.assertEqual(self.__getJobParameters(job3), self.__getJobParameters(job1))
+        # Then w1 gets a copy of the job w2 is running, and jobs are copied once at most.
+        job4 = jobManager.getNextJob("w1")
+        self.assertEqual(self.__getJobParameters(job4), self.__getJobParameters(job2))
+        self.assertIsNone(jobManager.getNextJob("w3"))
+
+        # The first copy to finish wins.
+        jobManager.pushJobResults(job3.getId(), 3, (0,), "w2")
+        self.assertEqual(jobManager.reportProgress(job1.getId(), 1, "w1"), jobs.JOB_CANCELLED)
+        jobManager.pushJobResults(job1.getId(), 1, (0,), "w1")
+        self.assertEqual(resultSinc.getBest()[0], 3)
+        self.assertTrue(jobManager.jobsPending())
+        jobManager.pushJobResults(job4.getId(), 2, (1,), "w1")
+        self.assertFalse(jobManager.jobsPending())
+
+    def testCancelledJob(self):
+        job = jobs.Job([(i,) for i in range(5)])
+        self.assertEqual(job.getNextParameters(), (4,))
+        job.cancel()
+        self.assertIsNone(job.getNextParameters())
+
+
+@unittest.skipIf(not sharedbars.is_supported(), "multiprocessing.shared_memory is not available")
+class SharedBarsTestCase(common.TestCase):
+    def __loadBars(self, timezone=None):
+        barFeed = yahoofeed.Feed(timezone=timezone)
+        barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        barFeed.addBarsFromCSV("spy", common.get_data_file_path("spy-2011-yahoofinance.csv"))
+        return jobs.load_bars(barFeed)
+
+    def testSameBars(self):
+        for timezone in [None, marketsession.USEquities.getTimezone()]:
+            instruments, loadedBars = self.__loadBars(timezone)
+            store = sharedbars.publish(bar.Frequency.DAY, instruments, loadedBars)
+            try:
+                sharedBars = sharedbars.SharedBars(store.getDescriptor())
+                self.assertEqual(len(sharedBars), len(loadedBars))
+                self.assertEqual(sharedBars.getInstruments(), instruments)
+                for expected, actual in zip(loadedBars, sharedBars):
+                    self.assertEqual(expected.getDateTime(), actual.getDateTime())
+                    self.assertEqual(expected.getDateTime().tzinfo, actual.getDateTime().tzinfo)
+                    self.assertEqual(sorted(expected.getInstruments()), sorted(actual.getInstruments()))
+                    for instrument in expected.getInstruments():
+                        self.assertEqual(expected[instrument].getClose(), actual[instrument].getClose())
+                        self.assertEqual(expected[instrument].getVolume(), actual[instrument].getVolume())
+                        self.assertEqual(expected[instrument].getAdjClose(), actual[instrument].getAdjClose())
+                self.assertEqual(sharedBars[-1].getDateTime(), loadedBars[-1].getDateTime())
+                self.assertEqual(len(sharedBars[10:20]), 10)
+                with self.assertRaises(IndexError):
+                    sharedBars[len(loadedBars)]
+                sharedBars.close()
+            finally:
+                store.close()
+
+    def testStrategy(self):
+        instruments, loadedBars = self.__loadBars()
+        store = sharedbars.publish(bar.Frequency.DAY, instruments, loadedBars)
+        try:
+            sharedBars = sharedbars.SharedBars(store.getDescriptor())
+            for bars in [loadedBars, sharedBars]:
+                barFeed = barfeed.OptimizerBarFeed(bar.Frequency.DAY, instruments, bars)
+                strat = sma_crossover.SMACrossOver(barFeed, "orcl", 20)
+                strat.run()
+                self.assertEquals(round(strat.getResult(), 2), 1295462.6)
+            sharedBars.close()
+        finally:
+            store.close()
+
+    def testSparseBars(self):
+        # orcl and spy bars don't overlap, so memory usage should depend on the number of bars only.
+        instruments, loadedBars = self.__loadBars()
+        bars = sum(len(bars.getInstruments()) for bars in loadedBars)
+        self.assertEqual(bars, len(loadedBars))
+        self.assertEqual(
+            sharedbars.get_size(len(loadedBars), len(instruments), bars),
+            (len(instruments) + 1 + len(loadedBars) + 1) * 8 + bars * 8 * 8
+        )
+        store = sharedbars.publish(bar.Frequency.DAY, instruments, loadedBars)
+        try:
+            sharedBars = sharedbars.SharedBars(store.getDescriptor())
+            self.assertEqual(sharedBars[0].getInstruments(), ["orcl"])
+            self.assertEqual(sharedBars[-1].getInstruments(), ["spy"])
+            self.assertEqual(sharedBars[-1]["spy"].getClose(), loadedBars[-1]["spy"].getClose())
+            sharedBars.close()
+        finally:
+            store.close()
+
+    def testUnsupportedBars(self):
+        bars = [bar.Bars({"orcl": bar.BasicBar(
+            datetime.datetime(2001, 1, 1), 1, 1, 1, 1, 1, 1, bar.Frequency.DAY, extra={"x": 1}
+        )})]
+        self.assertIsNone(sharedbars.publish(bar.Frequency.DAY, ["orcl"], bars))
@@ -21,6 +21,7 @@
 from . import common
 
 from pyalgotrade import strategy
+from pyalgotrade import dispatcher
 from pyalgotrade.barfeed import yahoofeed
 from pyalgotrade.technical import ma
 from pyalgotrade.technical import cross
@@ -145,10 +146,11 @@ class LimitOrderStrategy(SMACrossOverStrategy):
 
 
 class TestSMACrossOver(common.TestCase):
-    def __test(self, strategyClass, finalValue):
+    def __test(self, strategyClass, finalValue, scheduling=dispatcher.Scheduling.LINEAR):
         feed = yahoofeed.Feed()
         feed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv"))
         myStrategy = strategyClass(feed, 10, 25)
+        myStrategy.getDispatcher().setScheduling(scheduling)
         myStrategy.run()
         myStrategy.printDebug("Final result:", round(myStrategy.getFinalValue(), 2))
         self.assertTrue(round(myStrategy.getFinalValue(), 2) == finalValue)
@@ -160,3 +162,9 @@ class TestSMACrossOver(common.TestCase):
     def testWithLimitOrder(self):
         # The result is different than the one we get using NinjaTrader. NinjaTrader processes Limit orders in a different way.
         self.__test(LimitOrderStrategy, 1000 + 32.7)
+
+    def testWithMarketOrderUsingHeap(self):
+        self.__test(MarketOrderStrategy, 1000 - 22.7, dispatcher.Scheduling.HEAP)
+
+    def testWithLimitOrderUsingTimeline(self):
+        self.__test(LimitOrderStrategy, 1000 + 32.7, dispatcher.Scheduling.TIMELINE)
@@ -0,0 +1,166 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+
+import numpy as np
+
+from . import common
+from . import barfeed_test
+from . import feed_test
+
+from pyalgotrade import bar
+from pyalgotrade import marketsession
+from pyalgotrade.barfeed import sqlitechunkfeed
+from pyalgotrade.barfeed import sqlitefeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.utils import dt
+
+
+def build_bar(dateTime, close, adjClose=None):
+    return bar.BasicBar(dateTime, close, close, close, close, 10, adjClose, bar.Frequency.DAY)
+
+
+class ChunkTestCase(common.TestCase):
+    def testEncodeDecode(self):
+        columns = {
+            "datetime": np.array([1, 5, 1000, 10 ** 18], dtype=np.int64),
+            "open": np.array([1.5, 2, 3, 4]),
+            "high": np.array([2, 3, 4, 5.25]),
+            "low": np.array([1, 1, 2, 3]),
+            "close": np.array([1.5, 2.5, 3.5, 4.5]),
+            "volume": np.array([100, 0, 1e9, 7]),
+            "adj_close": np.array([np.nan, 1, 2, np.nan]),
+        }
+        decoded = sqlitechunkfeed.decode_chunk(sqlitechunkfeed.encode_chunk(columns), 4)
+        self.assertEqual(sorted(decoded.keys()), sorted(columns.keys()))
+        for name in columns:
+            np.testing.assert_array_equal(decoded[name], columns[name])
+        self.assertEqual(decoded["datetime"].dtype, np.int64)
+
+    def testMergeColumns(self):
+        columns1 = sqlitechunkfeed.bars_to_columns([build_bar(datetime.datetime(2001, 1, day), day) for day in [1, 3]])
+        columns2 = sqlitechunkfeed.bars_to_columns(
+            [build_bar(datetime.datetime(2001, 1, day), day * 10) for day in [3, 2]]
+        )
+        merged = sqlitechunkfeed.merge_columns(columns1, columns2)
+        self.assertEqual(merged["close"].tolist(), [1, 20, 30])
+
+    def testChunkKeys(self):
+        dateTimes = [
+            datetime.datetime(1970, 1, 1), datetime.datetime(1970, 1, 1, 23, 59), datetime.datetime(1970, 1, 2),
+            datetime.datetime(1970, 2, 1)
+        ]
+        nanoseconds = [sqlitechunkfeed.dataseries.datetime_to_nanoseconds(dateTime) for dateTime in dateTimes]
+        self.assertEqual(
+            sqlitechunkfeed.get_chunk_keys(nanoseconds, sqlitechunkfeed.CHUNK_DAY).tolist(), [0, 0, 1, 31]
+        )
+        self.assertEqual(
+            sqlitechunkfeed.get_chunk_keys(nanoseconds, sqlitechunkfeed.CHUNK_MONTH).tolist(), [0, 0, 0, 1]
+        )
+        with self.assertRaisesRegexp(Exception, "Invalid chunk size year"):
+            sqlitechunkfeed.get_chunk_keys(nanoseconds, "year")
+
+
+class DatabaseTestCase(common.TestCase):
+    def testAddAndGetBars(self):
+        for chunkSize in [sqlitechunkfeed.CHUNK_DAY, sqlitechunkfeed.CHUNK_MONTH]:
+            with common.TmpDir() as tmpPath:
+                db = sqlitechunkfeed.Database(os.path.join(tmpPath, "bars.sqlite"), chunkSize)
+                self.assertEqual(db.getChunkSize(), chunkSize)
+                bars = [("orcl", build_bar(datetime.datetime(2001, month, day), month * 100 + day, 1))
+                        for month in [1, 2, 3] for day in [1, 15, 28]]
+                self.assertEqual(db.addBarSequence(bars, bar.Frequency.DAY, batchSize=4), 9)
+                # Update a bar and add one in between.
+                db.addBar("orcl", build_bar(datetime.datetime(2001, 2, 15), 1), bar.Frequency.DAY)
+                db.addBar("orcl", build_bar(datetime.datetime(2001, 2, 16), 2), bar.Frequency.DAY)
+
+                ret = db.getBars("orcl", bar.Frequency.DAY)
+                self.assertEqual(len(ret), 10)
+                self.assertEqual(ret[0].getDateTime(), dt.as_utc(datetime.datetime(2001, 1, 1)))
+                self.assertEqual([bar_.getClose() for bar_ in ret[3:6]], [201, 1, 2])
+                self.assertEqual(ret[3].getAdjClose(), 1)
+                self.assertEqual(ret[4].getAdjClose(), None)
+
+                ret = db.getBarColumns(
+                    "orcl", bar.Frequency.DAY, datetime.datetime(2001, 1, 15), datetime.datetime(2001, 2, 16)
+                )
+                self.assertEqual(ret["close"].tolist(), [115, 128, 201, 1, 2])
+
+                self.assertEqual(len(db.getBars("orcl", bar.Frequency.MINUTE)), 0)
+                self.assertEqual(len(db.getBars("ibm", bar.Frequency.DAY)), 0)
+                db.disconnect()
+
+    def testInvalidDatabase(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.sqlite")
+            sqlitefeed.Database(path).disconnect()
+            with self.assertRaisesRegexp(Exception, ".*is not a chunked bar database"):
+                sqlitechunkfeed.Database(path)
+            with self.assertRaisesRegexp(Exception, "Invalid chunk size year"):
+                sqlitechunkfeed.Database(os.path.join(tmpPath, "other.sqlite"), "year")
+
+
+class FeedTestCase(common.TestCase):
+    def __migrate(self, tmpPath):
+        yahooFeed = yahoofeed.Feed()
+        yahooFeed.addBarsFromCSV("^n225", common.get_data_file_path("nikkei-2011-yahoofinance.csv"))
+        yahooFeed.addBarsFromCSV("spy", common.get_data_file_path("spy-2011-yahoofinance.csv"))
+        srcPath = os.path.join(tmpPath, "src.sqlite")
+        db = sqlitefeed.Database(srcPath)
+        db.addBarsFromFeed(yahooFeed)
+        db.disconnect()
+
+        dstPath = os.path.join(tmpPath, "dst.sqlite")
+        self.assertEqual(sqlitechunkfeed.migrate(srcPath, dstPath), 496)
+        return srcPath, dstPath
+
+    def testMigrate(self):
+        with common.TmpDir() as tmpPath:
+            srcPath, dstPath = self.__migrate(tmpPath)
+            timezone = marketsession.USEquities.getTimezone()
+            expected = sqlitefeed.Database(srcPath).getBars("spy", bar.Frequency.DAY, timezone)
+            actual = sqlitechunkfeed.Database(dstPath).getBars("spy", bar.Frequency.DAY, timezone)
+            self.assertEqual(len(expected), len(actual))
+            for expectedBar, actualBar in zip(expected, actual):
+                self.assertEqual(expectedBar.getDateTime(), actualBar.getDateTime())
+                self.assertEqual(expectedBar.getClose(), actualBar.getClose())
+                self.assertEqual(expectedBar.getVolume(), actualBar.getVolume())
+                self.assertEqual(expectedBar.getAdjClose(), actualBar.getAdjClose())
+
+            with self.assertRaisesRegexp(Exception, ".*doesn't exist"):
+                sqlitechunkfeed.migrate(os.path.join(tmpPath, "missing.sqlite"), dstPath)
+
+    def testFeed(self):
+        with common.TmpDir() as tmpPath:
+            srcPath, dstPath = self.__migrate(tmpPath)
+
+            feed = sqlitechunkfeed.Feed(dstPath, bar.Frequency.DAY)
+            feed.loadBars("spy")
+            feed_test.tstBaseFeedInterface(self, feed)
+
+            feed = sqlitechunkfeed.Feed(dstPath, bar.Frequency.DAY, marketsession.USEquities.getTimezone())
+            feed.loadBars("spy", datetime.datetime(2011, 2, 1), datetime.datetime(2011, 2, 28))
+            feed.loadBars("^n225", datetime.datetime(2011, 2, 1), datetime.datetime(2011, 2, 28))
+            barfeed_test.check_base_barfeed(self, feed, True)
+            # Bars were stored without a timezone, so they are at midnight UTC.
+            self.assertEqual(feed["spy"][0].getDateTime(), dt.as_utc(datetime.datetime(2011, 2, 1)))
+            self.assertEqual(feed["spy"][-1].getDateTime(), dt.as_utc(datetime.datetime(2011, 2, 28)))
@@ -496,6 +496,16 @@ class TestCase(common.TestCase):
         self.assertAmountsAreEqual(indicator.SMA(barDs.getCloseDataSeries(), 252, 2)[3], 94.73, precision=1)
         self.assertAmountsAreEqual(indicator.SMA(barDs.getCloseDataSeries(), 252, 2)[-1], 108.31)
 
+    def testSMAWithNumericDataSeries(self):
+        ds = dataseries.NumericDataSeries()
+        for value in CLOSE_VALUES:
+            ds.append(value)
+        self.assertAmountsAreEqual(indicator.SMA(ds, 252, 2)[1], 93.16)
+        self.assertAmountsAreEqual(indicator.SMA(ds, 252, 2)[-1], 108.31)
+
+        ds.append(None)
+        self.assertEqual(indicator.SMA(ds, 252, 2), None)
+
     def testSTDDEV(self):
         barDs = self.__loadBarDS()
         self.assertAmountsAreEqual(indicator.STDDEV(barDs.getCloseDataSeries(), 252, 5.0, 1)[4], 1.2856)
@@ -280,6 +280,51 @@ class CollectionTestCaseBase(common.TestCase):
         self.assertEqual(d[0], 20)
         self.assertEqual(d[-1], 20)
 
+    def _testDataIsASnapshotImpl(self):
+        d = self.buildCollection(3)
+        d.append(0)
+        d.append(1)
+        # Before the buffer is full.
+        data = d.data()
+        d.append(2)
+        self.assertEqual(list(data), [0, 1])
+        self.assertEqual(list(d.data()), [0, 1, 2])
+        # Once it wrapped around.
+        for i in range(3, 10):
+            data = d.data()
+            d.append(i)
+            self.assertEqual(list(data), [i - 3, i - 2, i - 1])
+            self.assertEqual(list(d.data()), [i - 2, i - 1, i])
+
+    def _testWrapAroundImpl(self):
+        maxLen = 7
+        d = self.buildCollection(maxLen)
+        expected = []
+        for i in xrange(maxLen * 3 + 2):
+            d.append(i)
+            expected = (expected + [i])[-maxLen:]
+
+            self.assertEqual(len(d), len(expected))
+            self.assertEqual(list(d.data()), expected)
+            for j in xrange(-len(expected), len(expected)):
+                self.assertEqual(d[j], expected[j])
+            for key in [slice(None), slice(2, None), slice(-3, None), slice(1, -1), slice(None, None, 2), slice(None, None, -1)]:
+                self.assertEqual(list(d[key]), expected[key])
+
+        with self.assertRaises(IndexError):
+            d[maxLen]
+        with self.assertRaises(IndexError):
+            d[-maxLen - 1]
+
+        # Shrink the array after wrapping around.
+        d.resize(3)
+        self.assertEqual(list(d.data()), expected[-3:])
+        d.append(100)
+        d.append(101)
+        self.assertEqual(list(d.data()), expected[-1:] + [100, 101])
+        self.assertEqual(d[0], expected[-1])
+        self.assertEqual(d[-1], 101)
+
 
 class NumPyDequeTestCase(CollectionTestCaseBase):
     def buildCollection(self, maxLen):
@@ -294,6 +339,12 @@ class NumPyDequeTestCase(CollectionTestCaseBase):
     def testResizeEmpty(self):
         CollectionTestCaseBase._testResizeEmptyImpl(self)
 
+    def testDataIsASnapshot(self):
+        CollectionTestCaseBase._testDataIsASnapshotImpl(self)
+
+    def testWrapAround(self):
+        CollectionTestCaseBase._testWrapAroundImpl(self)
+
     def testSum(self):
         d = collections.NumPyDeque(10)
 
@@ -301,6 +352,12 @@ class NumPyDequeTestCase(CollectionTestCaseBase):
             d.append(i)
         self.assertEqual(d[0:3].sum(), 3)
 
+        # Values are still contiguous after wrapping around.
+        for i in xrange(10, 15):
+            d.append(i)
+        self.assertTrue(d.data().flags["C_CONTIGUOUS"])
+        self.assertEqual(d.data().sum(), sum(range(5, 15)))
+
 
 class ListDequeTestCase(CollectionTestCaseBase):
     def buildCollection(self, maxLen):
@@ -315,6 +372,23 @@ class ListDequeTestCase(CollectionTestCaseBase):
     def testResizeEmpty(self):
         CollectionTestCaseBase._testResizeEmptyImpl(self)
 
+    def testDataIsASnapshot(self):
+        CollectionTestCaseBase._testDataIsASnapshotImpl(self)
+
+    def testWrapAround(self):
+        CollectionTestCaseBase._testWrapAroundImpl(self)
+
+    def testDataIsNotCopiedUntilAppend(self):
+        d = self.buildCollection(3)
+        for i in range(5):
+            d.append(i)
+        data = d.data()
+        self.assertIs(d.data(), data)
+        self.assertEqual(data, [2, 3, 4])
+        d.append(5)
+        self.assertEqual(d.data(), [3, 4, 5])
+        self.assertEqual(data, [2, 3, 4])
+
 
 class DateTimeTestCase(common.TestCase):
     def testTimeStampConversions(self):
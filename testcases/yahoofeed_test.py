@@ -122,6 +122,34 @@ class FeedTestCase(common.TestCase):
         barFeed.addBarsFromCSV(FeedTestCase.TestInstrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
         feed_test.tstBaseFeedInterface(self, barFeed)
 
+    def testAddBarsFromCSVFiles(self):
+        instrumentToPath = {
+            "spy": common.get_data_file_path("spy-2011-yahoofinance.csv"),
+            "^n225": common.get_data_file_path("nikkei-2011-yahoofinance.csv"),
+            "goog": common.get_data_file_path("goog-2011-yahoofinance.csv"),
+        }
+        expected = yahoofeed.Feed()
+        for instrument, path in instrumentToPath.items():
+            expected.addBarsFromCSV(instrument, path, marketsession.USEquities.getTimezone())
+        expected = [(dateTime, bars) for dateTime, bars in expected]
+
+        for processes in [1, 2]:
+            barFeed = yahoofeed.Feed()
+            barFeed.addBarsFromCSVFiles(instrumentToPath, marketsession.USEquities.getTimezone(), processes=processes)
+            self.assertEqual(sorted(barFeed.getRegisteredInstruments()), sorted(instrumentToPath.keys()))
+            actual = [(dateTime, bars) for dateTime, bars in barFeed]
+            self.assertEqual(len(actual), len(expected))
+            for (expectedDateTime, expectedBars), (actualDateTime, actualBars) in zip(expected, actual):
+                self.assertEqual(expectedDateTime, actualDateTime)
+                self.assertEqual(sorted(expectedBars.getInstruments()), sorted(actualBars.getInstruments()))
+                for instrument in expectedBars.getInstruments():
+                    expectedBar = expectedBars[instrument]
+                    actualBar = actualBars[instrument]
+                    self.assertEqual(expectedBar.getDateTime().tzinfo, actualBar.getDateTime().tzinfo)
+                    self.assertEqual(expectedBar.getOpen(), actualBar.getOpen())
+                    self.assertEqual(expectedBar.getClose(), actualBar.getClose())
+                    self.assertEqual(expectedBar.getAdjClose(), actualBar.getAdjClose())
+
     def testParseDate_1(self):
         date = self.__parseDate("1950-01-01")
         self.assertTrue(date.day == 1)